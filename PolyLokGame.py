@@ -11,34 +11,125 @@
 分数计算方法目前非常不严谨，有待进一步研究，可能需要涉及到更本质的数学
 """
 
+import time
+STARTUP_TIME = time.perf_counter()  # 启动计时起点，用于报告冷启动到第一帧的耗时
+
 import pygame
 import sys
 from pygame.locals import *
-import random
 import os
+import threading
+import functools
+import math
+
+from polylok.integrity import DIRECTIONS, DIRECTION_TEXTS
+from polylok.board import Board, BoardError
+from polylok.solution import load_solution
+from polylok.autosave import AUTOSAVE_FILENAME, Autosaver, save_solution_atomic, user_data_dir
+from polylok.journal import JOURNAL_FILENAME, Journal, replay
+from polylok.placement import PlacementCache, PlacementHeatmap
+from polylok.polyomino import compose_symmetries
 
 GAME_NAME = "PolyLok"
 
-# 初始化pygame
-pygame.init()
-
-# 初始化pygame音频系统
-pygame.mixer.init()
-
 # 获取绝对工作目录（这样打包后也能正常运行）
 work_folder = os.path.dirname(os.path.abspath(sys.argv[0]))
 
-# 加载音效
-SOUNDS = {
-    'put_down': pygame.mixer.Sound(os.path.join(work_folder, 'sounds', 'putDown.wav')),
-    'delete': pygame.mixer.Sound(os.path.join(work_folder, 'sounds', 'delete.wav')),
-    'pick_up': pygame.mixer.Sound(os.path.join(work_folder, 'sounds', 'pickUp.wav')),
-    'click_big': pygame.mixer.Sound(os.path.join(work_folder, 'sounds', 'clickBig.wav')),
-    'click_flip': pygame.mixer.Sound(os.path.join(work_folder, 'sounds', 'clickFlip.wav')),
-    'success': pygame.mixer.Sound(os.path.join(work_folder, 'sounds', 'success.wav')),
-    'fail': pygame.mixer.Sound(os.path.join(work_folder, 'sounds', 'failDrop.mp3'))
+# 存档路径：命令行参数指定的文件（启动时读取它），否则为存档目录下的board.plk
+# 扩展名为.json时保存为JSON，否则为二进制格式（见polylok.solution）
+save_path = os.path.abspath(sys.argv[1]) if len(sys.argv) > 1 else os.path.join(user_data_dir(), 'board.plk')
+autosave_path = os.path.join(user_data_dir(), AUTOSAVE_FILENAME)
+journal_path = os.path.join(user_data_dir(), JOURNAL_FILENAME)  # 编辑日志，启动时据此恢复上次的盘面
+
+# 音效文件（在init_game中加载）
+SOUND_FILES = {
+    'put_down': 'putDown.wav',
+    'delete': 'delete.wav',
+    'pick_up': 'pickUp.wav',
+    'click_big': 'clickBig.wav',
+    'click_flip': 'clickFlip.wav',
+    'success': 'success.wav',
+    'fail': 'failDrop.mp3'
 }
 
+# 规则说明中的封面图片
+RULES_COVER_PATH = os.path.join(work_folder, 'pictures', 'rules_cover.png')
+
+# 资源管理器：在后台线程中解码音效和图片，第一帧不必等待资源加载
+# 如果某个资源在后台加载完成前就要使用，则在当前线程立即加载（按需回退）
+class AssetManager:
+    def __init__(self):
+        self.sounds = {}     # 已加载的音效 {名称: Sound}，加载失败时为None
+        self.images = {}     # 已加载并缩放的图片 {(路径, 最大宽度): Surface}，加载失败时为None
+        self.lock = threading.Lock()
+        self.thread = None   # 后台加载线程
+    
+    # 启动后台加载线程，images为需要预加载的 [(路径, 最大宽度), ...]
+    def start(self, images=()):
+        self.thread = threading.Thread(target=self._preload, args=(list(images),), daemon=True)
+        self.thread.start()
+    
+    # 后台线程：先加载图片（规则说明最先用到），再加载音效
+    def _preload(self, images):
+        for path, max_width in images:
+            self.get_image(path, max_width)
+        for name in SOUND_FILES:
+            self.get_sound(name)
+    
+    # 后台线程是否还在加载
+    def is_loading(self):
+        return self.thread is not None and self.thread.is_alive()
+    
+    # 获取音效，尚未加载时立即加载
+    def get_sound(self, name):
+        if name not in self.sounds:
+            with self.lock:
+                if name not in self.sounds:
+                    path = os.path.join(work_folder, 'sounds', SOUND_FILES[name])
+                    try:
+                        self.sounds[name] = pygame.mixer.Sound(path)
+                    except pygame.error:
+                        print(f"Warning: Could not load sound {path}")
+                        self.sounds[name] = None
+        return self.sounds[name]
+    
+    # 获取缩放后的图片（宽度不超过max_width），缩放结果会被缓存
+    # wait为False时，若后台线程还没有加载完这张图片，直接返回None而不等待
+    def get_image(self, path, max_width, wait=True):
+        key = (path, max_width)
+        if key not in self.images:
+            if not wait and self.is_loading():
+                return None
+            with self.lock:
+                if key not in self.images:
+                    try:
+                        img = pygame.image.load(path)
+                        if img.get_width() > max_width:
+                            ratio = max_width / img.get_width()
+                            new_size = (max_width, int(img.get_height() * ratio))
+                            img = pygame.transform.scale(img, new_size)
+                        self.images[key] = img
+                    except pygame.error:
+                        print(f"Warning: Could not load image {path}")
+                        self.images[key] = None
+        return self.images[key]
+
+assets = AssetManager()  # 全局资源管理器
+
+# 播放音效
+def play_sound(name):
+    sound = assets.get_sound(name)
+    if sound is not None:
+        sound.play()
+
+# 第一帧显示后报告冷启动耗时
+first_frame_reported = False
+def report_first_frame():
+    global first_frame_reported
+    if not first_frame_reported:
+        first_frame_reported = True
+        print(f"First frame shown {(time.perf_counter() - STARTUP_TIME) * 1000:.1f} ms after start")
+
 # 游戏常量
 SCREEN_WIDTH = 1600                     # 屏幕宽度
 SCREEN_HEIGHT = 900                     # 屏幕高度
@@ -88,6 +179,7 @@ RULES_BUTTON_HEIGHT = 40                    # 规则确定按钮高度
 RULES_SCROLL_SPEED = 20                     # 规则滚动速度
 RULES_WIDTH = 500                           # 规则窗口宽度
 RULES_HEIGHT = 900                          # 规则窗口高度
+RULES_IMAGE_MAX_WIDTH = int(RULES_WIDTH * 0.8) - 2 * RULES_PADDING  # 规则图片最大宽度（不超过对话框宽度的80%）
 
 # 拼图块常量
 CELL_COLORS = [
@@ -102,12 +194,23 @@ CELL_BORDER_COLOR = (0, 0, 0, 255)                  # 拼图块边框颜色
 CELL_BORDER_WIDTH = 3                               # 拼图块边框宽度
 CELL_SELECTED_BORDER_COLOR = (255, 165, 0, 255)     # 选中拼图块边框颜色
 CELL_SELECTED_OVERLAY_COLOR = (255, 255, 255, 130)  # 选中拼图块高亮颜色
+CELL_ERROR_OVERLAY_COLOR = (255, 0, 0, 130)         # 会脱离的拼图块高亮颜色（红色）
+PLACEMENT_OVERLAY_COLOR = (0, 200, 255, 70)         # 选中拼图块可放置位置的覆盖颜色（半透明青色）
+SELECTION_BOX_COLOR = (255, 165, 0, 255)            # 框选矩形的颜色
+CELL_WARNING_OVERLAY_COLOR = (255, 140, 0, 90)      # 编辑时会脱离的拼图块高亮颜色（半透明橙色）
 CREATE_BUTTON_COLOR = (100, 180, 100, 255)          # 创建拼图按钮颜色
 CREATE_BUTTON_HOVER_COLOR = (120, 200, 120, 255)    # 创建拼图按钮悬停颜色
 CREATE_BUTTON_TEXT_COLOR = (255, 255, 255, 255)     # 创建拼图按钮文本颜色
 DELETE_BUTTON_COLOR = (200, 100, 100, 255)          # 删除拼图按钮颜色
 DELETE_BUTTON_HOVER_COLOR = (220, 120, 120, 255)    # 删除拼图按钮悬停颜色
 
+# 实时完整性指示常量（完成按钮左侧，每个方向一个箭头）
+INTEGRITY_ARROW_SIZE = 24                   # 箭头大小
+INTEGRITY_ARROW_SPACING = 8                 # 箭头间距
+INTEGRITY_PASS_COLOR = (0, 170, 0)          # 该方向通过（绿色）
+INTEGRITY_FAIL_COLOR = (220, 0, 0)          # 该方向有拼图块会脱离（红色）
+INTEGRITY_IDLE_COLOR = (120, 120, 120)      # 不到两块拼图块，无需判定（灰色）
+
 # 提示信息常量
 NOTIFICATION_DURATION = 2000                    # 提示显示时间(毫秒)
 NOTIFICATION_SUCCESS_COLOR = (0, 200, 0, 180)   # 成功提示颜色(半透明绿色)
@@ -141,10 +244,8 @@ SLIDER_Y = UI_TOP_MARGIN + UI_BUTTON_SIZE + UI_BUTTON_SPACING
 BUTTON_SIZE = UI_BUTTON_SIZE
 FIT_VIEW_BUTTON_Y_OFFSET = UI_BUTTON_SPACING * 2  # 与减号按钮的距离
 
-# 创建游戏窗口
-#screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.RESIZABLE)
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption(GAME_NAME)
+# 游戏窗口（在init_game中创建）
+screen = None
 
 # 网格状态
 grid_size = DEFAULT_GRID_SIZE           # 当前网格大小
@@ -162,13 +263,10 @@ complete_button_rect = None        # 完成拼图按钮矩形区域
 undo_hover = False                 # 撤销按钮悬停状态
 restart_hover = False              # 重新开始按钮悬停状态
 complete_hover = False             # 完成拼图按钮悬停状态
+integrity_indicator_rect = None    # 实时完整性指示区域（隐藏时为None）
 
 # 游戏状态
-cells = {}                              # 格子状态 {(x, y): color}
-puzzle_pieces = []                      # 拼图块列表 [[(x1, y1), (x2, y2), ...], [...], ...]
-available_colors = CELL_COLORS.copy()   # 可用颜色列表
-current_color_index = 0                 # 当前使用的颜色索引
-game_states = []                        # 游戏状态历史，用于撤销
+board = Board(CELL_COLORS, use_bitboard=True)  # 盘面模型：填色格子、拼图块、占用索引与撤销历史（见polylok.board）
 create_button_rect = None               # 创建拼图块按钮矩形区域
 create_button_hover = False             # 创建按钮悬停状态
 notification = None                     # 当前显示的提示信息 (text, color, end_time)
@@ -179,21 +277,23 @@ plus_button_hover = False    # 加号按钮悬停状态
 minus_button_hover = False   # 减号按钮悬停状态
 
 # 拼图块选择状态
-selected_piece_index = None  # 当前选中的拼图块索引
+selected_piece_index = None  # 当前选中的拼图块索引（多选时为最后点击的一块，拖动以它为参考）
+selected_group = set()       # 多选时所有选中拼图块的索引（包括selected_piece_index），见get_selected_indices
+selection_box_start = None   # 按住Shift框选时，起点的屏幕坐标
 delete_button_rect = None    # 删除拼图块按钮
 delete_button_hover = False  # 删除按钮悬停状态
 
 # 添加拼图拖动相关变量
 dragging_piece = False        # 是否正在拖动拼图
 dragging_piece_offset = None  # 拖动拼图的偏移量（网格单位）
-
-# 添加完整性判定相关变量
-DIRECTIONS = [
-    (0, -1),  # 上
-    (1, 0),   # 右
-    (0, 1),   # 下
-    (-1, 0)   # 左
-]
+drag_placement = None         # 本次拖动的放置缓存（见polylok.placement）
+drag_symmetry = 0             # 拖动中对拼图块做的旋转翻转（polylok.polyomino.SYMMETRIES中的序号），放下时一起提交
+placement_heatmap = PlacementHeatmap(board)  # 选中拼图块在视口内的可放置位置（见polylok.placement）
+show_placement_overlay = True                # 是否显示可放置位置
+integrity_monitor = board.integrity_monitor  # 编辑时的实时完整性检测（见polylok.monitor）
+show_live_integrity = True                   # 是否显示实时完整性指示和会脱离的拼图块
+
+# 添加完整性判定相关变量（方向定义见polylok.integrity.DIRECTIONS）
 DIRECTION_NAMES = ['上', '右', '下', '左']
 
 """
@@ -208,14 +308,32 @@ DIRECTION_NAMES = ['上', '右', '下', '左']
 # 添加快捷键映射字典
 KEYBOARD_SHORTCUTS = {
     'undo': pygame.K_z,           # Z键 - 撤销
+    'redo': pygame.K_y,           # Y键 - 重做
     'restart': pygame.K_r,        # R键 - 重新开始
     'create': pygame.K_SPACE,     # 空格键 - 创建拼图
     'create2': pygame.K_RETURN,  # 回车键 - 创建拼图（快捷键2）
+    'create_all': pygame.K_b,     # B键 - 每组相连的格子各创建一个拼图
     'delete': pygame.K_DELETE,    # Delete键 - 删除拼图
     'complete': pygame.K_c,       # C键 - 完成拼图
     'zoom_in': pygame.K_EQUALS,     # =键 - 放大
     'zoom_out': pygame.K_MINUS,   # -键 - 缩小
     'fit_view': pygame.K_o,       # O键 - 适应视图
+    'save': pygame.K_s,           # Ctrl+S - 保存盘面
+    'load': pygame.K_l,           # Ctrl+L - 读取盘面，Ctrl+Shift+L - 读取自动存档
+    'placement': pygame.K_h,      # H键 - 显示/隐藏可放置位置
+    'rotate_cw': pygame.K_e,      # E键 - 顺时针旋转拼图
+    'rotate_ccw': pygame.K_q,     # Q键 - 逆时针旋转拼图
+    'flip_h': pygame.K_f,         # F键 - 左右翻转拼图
+    'flip_v': pygame.K_v,         # V键 - 上下翻转拼图
+    'live_check': pygame.K_i,     # I键 - 显示/隐藏实时完整性指示
+}
+
+# 旋转翻转快捷键对应的对称变换（polylok.polyomino.SYMMETRIES中的序号）
+TRANSFORM_SHORTCUTS = {
+    KEYBOARD_SHORTCUTS['rotate_cw']: 1,   # 顺时针旋转90°
+    KEYBOARD_SHORTCUTS['rotate_ccw']: 3,  # 逆时针旋转90°
+    KEYBOARD_SHORTCUTS['flip_h']: 4,      # 左右翻转
+    KEYBOARD_SHORTCUTS['flip_v']: 6,      # 上下翻转
 }
 
 # 添加判定状态变量
@@ -238,6 +356,8 @@ RESULT_BUTTON_TEXT_SIZE = 28                 # 结果按钮文字大小
 # 添加判定结果相关变量
 check_result = None  # 判定结果：None=未判定，True=成功，False=失败
 failure_reason = ""  # 失败原因
+failed_pieces = []   # 判定失败时可以整体脱离的拼图块索引
+result_score = None  # 判定成功时的分数（判定时计算一次）
 result_button_rect = None  # 结果按钮区域
 result_button_hover = False  # 结果按钮悬停状态
 
@@ -247,19 +367,230 @@ success_sound_played = False  # 是否已经播放过成功音效
 # 添加失败音效播放状态变量
 fail_sound_played = False  # 是否已经播放过失败音效
 
+# 文字渲染缓存大小（按 文本、字号、颜色 区分）
+TEXT_CACHE_SIZE = 256
+
+# 帧率相关常量
+ACTIVE_FPS = 120   # 有操作时的帧率
+IDLE_FPS = 15      # 空闲时的帧率（没有任何变化时也不会重绘）
+IDLE_DELAY = 1000  # 最后一次输入后多久进入空闲帧率(毫秒)
+DIRTY_MARGIN = CELL_BORDER_WIDTH + 2  # 脏矩形外扩的像素，覆盖拼图块边框
+AUTOSAVE_INTERVAL = 10000  # 自动保存的间隔(毫秒)，盘面没有变化时不保存
+PIECE_LAYER_COLORKEY = (1, 2, 3)      # 拼图块图层中表示透明的颜色（不与任何拼图块颜色相同）
+
+# 脏矩形重绘状态：只有变化过的区域才会重绘并提交到屏幕
+dirty_rects = []    # 本帧需要重绘的屏幕区域
+full_redraw = True  # 本帧是否需要整屏重绘
+
+# 静态图层缓存：网格和未选中的拼图块预先画到离屏表面上，只在缩放、平移或拼图块变化时重建
+grid_layer = None       # 背景和网格线
+grid_layer_key = None
+piece_layer = None      # 未选中的拼图块（其余部分为透明色）
+piece_layer_key = None
+placement_layer = None  # 选中拼图块的可放置位置（每个位置一个格子，其余部分透明）
+placement_layer_key = None
+
+# 字体注册表：每个字号只查找一次系统字体
+@functools.lru_cache(maxsize=None)
+def get_font(size):
+    return pygame.font.SysFont(None, size)
+
+# 渲染文字，结果按 (文本, 字号, 颜色) 做LRU缓存，静态文字每帧不必重新光栅化
+# 返回的表面是共享的，调用方不要修改它
+@functools.lru_cache(maxsize=TEXT_CACHE_SIZE)
+def render_text(text, size, color):
+    return get_font(size).render(text, True, color)
+
+# 标记需要重绘的屏幕区域，不传参数表示整屏重绘
+def mark_dirty(rect=None):
+    global full_redraw
+    if rect is None:
+        full_redraw = True
+    else:
+        dirty_rects.append(pygame.Rect(rect).inflate(DIRTY_MARGIN * 2, DIRTY_MARGIN * 2))
+
+# 格子包围盒 (min_x, min_y, max_x, max_y) 在屏幕上占据的矩形区域
+def bbox_screen_rect(bbox):
+    min_x, min_y, max_x, max_y = bbox
+    left = int(min_x * grid_size + grid_offset_x)
+    top = int(min_y * grid_size + grid_offset_y)
+    right = int((max_x + 1) * grid_size + grid_offset_x)
+    bottom = int((max_y + 1) * grid_size + grid_offset_y)
+    return pygame.Rect(left, top, right - left, bottom - top)
+
+# 左侧缩放控件（加减号按钮、滑动条、适应视图按钮）占据的区域
+def slider_panel_rect():
+    bottom = SLIDER_Y + UI_SLIDER_HEIGHT + UI_BUTTON_SPACING + UI_BUTTON_SIZE * 2 + FIT_VIEW_BUTTON_Y_OFFSET
+    return pygame.Rect(0, 0, UI_LEFT_MARGIN * 2 + UI_BUTTON_SIZE, bottom + UI_SLIDER_HANDLE_HEIGHT)
+
+# 鼠标移动时，标记悬停状态发生变化的按钮
+def mark_hover_changes(old_pos, new_pos):
+    # 缩放控件里有多个按钮，鼠标在其中移动时整体重绘
+    panel_rect = slider_panel_rect()
+    if panel_rect.collidepoint(old_pos) or panel_rect.collidepoint(new_pos):
+        mark_dirty(panel_rect)
+    
+    rects = [undo_button_rect, restart_button_rect, complete_button_rect,
+             create_button_rect, delete_button_rect, result_button_rect]
+    for rect in rects:
+        if rect is not None and rect.collidepoint(old_pos) != rect.collidepoint(new_pos):
+            mark_dirty(rect)
+
+# 计算拖动拼图块时预览的偏移量（网格单位）
+def get_drag_offset(mouse_pos):
+    # 计算当前鼠标位置对应的网格坐标
+    grid_x = (mouse_pos[0] - grid_offset_x) / grid_size
+    grid_y = (mouse_pos[1] - grid_offset_y) / grid_size
+    
+    # 计算拼图块应该移动的网格单位数（四舍五入到整数）
+    first_cell = board.pieces[selected_piece_index].anchor
+    offset_x = round(grid_x - dragging_piece_offset[0] - first_cell[0])
+    offset_y = round(grid_y - dragging_piece_offset[1] - first_cell[1])
+    return offset_x, offset_y
+
+# 绘制整个画面；调用方负责设置裁剪区域
+def draw_scene():
+    # 绘制背景和网格（缓存的图层）
+    screen.blit(get_grid_layer(), (0, 0))
+    
+    # 绘制格子和拼图块
+    draw_all_cells()
+    
+    # 如果正在拖动拼图块，绘制预览（多选时整组一起预览）
+    if not is_judging and dragging_piece and selected_piece_index is not None:
+        offset_x, offset_y = get_drag_offset(pygame.mouse.get_pos())
+        
+        # 检查是否可以放置，同时取得平移后的拼图块（按偏移缓存，鼠标在同一格内移动时不重复计算）
+        can_place, new_pieces = get_drag_placement().lookup(offset_x, offset_y)
+        
+        for new_piece in new_pieces:
+            # 根据是否可以放置设置不同的颜色
+            if can_place:
+                preview_color = new_piece.color[:3] + (120,)
+                new_piece_border_color = CELL_SELECTED_BORDER_COLOR
+            else:
+                # 如果不能放置，使用红色
+                preview_color = (255, 0, 0, 120)
+                new_piece_border_color = (255, 0, 0, 255)
+            
+            # 预览用的拼图块是缓存的副本，只需要换上预览颜色
+            new_piece.color = preview_color
+            
+            # 绘制预览
+            draw_single_piece(new_piece, border_color=new_piece_border_color)
+    
+    # 框选时绘制选择框
+    if selection_box_start is not None:
+        pygame.draw.rect(screen, SELECTION_BOX_COLOR[:3], get_selection_box_rect(pygame.mouse.get_pos()), 1)
+
+    # 绘制UI
+    if not is_judging:
+        draw_slider()
+        draw_buttons()
+        draw_integrity_indicator()
+        if not draw_delete_button():
+            draw_create_button()
+    
+    # 绘制提示信息
+    draw_notification()
+    
+    # 如果正在判定，绘制结果
+    if is_judging:
+        draw_result()
+
+# 只重绘并提交被标记为脏的区域；什么都没变化时这一帧不做任何绘制
+def render_frame():
+    global full_redraw
+    
+    if full_redraw:
+        screen.set_clip(None)
+        draw_scene()
+        pygame.display.flip()
+    elif dirty_rects:
+        screen_rect = screen.get_rect()
+        rects = [rect.clip(screen_rect) for rect in dirty_rects]
+        rects = [rect for rect in rects if rect.width and rect.height]
+        if rects:
+            # 把所有脏矩形合并为一个裁剪区域，画面其余部分保持上一帧的内容
+            screen.set_clip(rects[0].unionall(rects[1:]))
+            draw_scene()
+            screen.set_clip(None)
+            pygame.display.update(rects)
+    else:
+        return
+    
+    full_redraw = False
+    dirty_rects.clear()
+    report_first_frame()
+
+# 视图参数，缓存的图层只在这些参数不变时可以复用
+def get_view_key():
+    return (grid_size, grid_offset_x, grid_offset_y, SCREEN_WIDTH, SCREEN_HEIGHT)
+
+# 背景和网格图层，视图变化时重建
+def get_grid_layer():
+    global grid_layer, grid_layer_key
+    
+    key = get_view_key()
+    if grid_layer_key != key:
+        if grid_layer is None or grid_layer.get_size() != (SCREEN_WIDTH, SCREEN_HEIGHT):
+            grid_layer = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT)).convert()
+        grid_layer.fill(BG_COLOR)
+        draw_grid(grid_layer)
+        grid_layer_key = key
+    return grid_layer
+
+# 未选中拼图块的图层，视图、拼图块或选中状态变化时重建
+def get_piece_layer():
+    global piece_layer, piece_layer_key
+    
+    key = (get_view_key(), board.piece_version, get_selected_indices())
+    if piece_layer_key != key:
+        if piece_layer is None or piece_layer.get_size() != (SCREEN_WIDTH, SCREEN_HEIGHT):
+            piece_layer = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT)).convert()
+            piece_layer.set_colorkey(PIECE_LAYER_COLORKEY)
+        piece_layer.fill(PIECE_LAYER_COLORKEY)
+        draw_pieces(board.pieces, piece_layer)
+        piece_layer_key = key
+    return piece_layer
+
+# 选中拼图块可放置位置的图层及其左上角的屏幕坐标，视图或可放置位置变化时重建
+# 位置指拼图块第一个格子可以移动到的格子，整个视口一次算出（见polylok.placement.PlacementHeatmap）
+def get_placement_layer():
+    global placement_layer, placement_layer_key
+    
+    # 视口内的格子范围
+    x0 = math.floor(-grid_offset_x / grid_size)
+    y0 = math.floor(-grid_offset_y / grid_size)
+    x1 = math.floor((SCREEN_WIDTH - grid_offset_x) / grid_size)
+    y1 = math.floor((SCREEN_HEIGHT - grid_offset_y) / grid_size)
+    mask = placement_heatmap.update(get_selected_indices(), x0, y0, x1, y1)
+    
+    key = (get_view_key(), placement_heatmap.version)
+    if placement_layer_key != key:
+        # 每个位置一个像素的调色板图像，放大到格子大小；颜色0透明
+        width, height = x1 - x0 + 1, y1 - y0 + 1
+        image = pygame.image.frombuffer(mask, (width, height), 'P')
+        image.set_palette([(0, 0, 0), PLACEMENT_OVERLAY_COLOR[:3]])
+        placement_layer = pygame.transform.scale(image, (width * grid_size, height * grid_size))
+        placement_layer.set_colorkey(0)
+        placement_layer.set_alpha(PLACEMENT_OVERLAY_COLOR[3])
+        placement_layer_key = key
+    return placement_layer, bbox_screen_rect((x0, y0, x0, y0)).topleft
+
 # 绘制网格函数
-def draw_grid():
+def draw_grid(surface):
     # 计算网格起始位置（考虑偏移量）
     start_x = int(grid_offset_x % grid_size)
     start_y = int(grid_offset_y % grid_size)
     
     # 绘制垂直线
     for x in range(start_x, int(SCREEN_WIDTH), int(grid_size)):
-        pygame.draw.line(screen, GRID_COLOR, (x, 0), (x, SCREEN_HEIGHT))
+        pygame.draw.line(surface, GRID_COLOR, (x, 0), (x, SCREEN_HEIGHT))
     
     # 绘制水平线
     for y in range(start_y, int(SCREEN_HEIGHT), int(grid_size)):
-        pygame.draw.line(screen, GRID_COLOR, (0, y), (SCREEN_WIDTH, y))
+        pygame.draw.line(surface, GRID_COLOR, (0, y), (SCREEN_WIDTH, y))
 
 # 绘制缩放滑动条
 def draw_slider():
@@ -395,20 +726,59 @@ def draw_buttons():
     pygame.draw.rect(screen, complete_color, complete_button_rect)
     
     # 绘制按钮文本
-    font = pygame.font.SysFont(None, BUTTON_TEXT_SIZE)
-    
-    undo_text = font.render("Undo", True, BUTTON_TEXT_COLOR)
+    undo_text = render_text("Undo", BUTTON_TEXT_SIZE, BUTTON_TEXT_COLOR)
     undo_text_rect = undo_text.get_rect(center=undo_button_rect.center)
     screen.blit(undo_text, undo_text_rect)
     
-    restart_text = font.render("Restart", True, BUTTON_TEXT_COLOR)
+    restart_text = render_text("Restart", BUTTON_TEXT_SIZE, BUTTON_TEXT_COLOR)
     restart_text_rect = restart_text.get_rect(center=restart_button_rect.center)
     screen.blit(restart_text, restart_text_rect)
     
-    complete_text = font.render("Complete", True, BUTTON_TEXT_COLOR)
+    complete_text = render_text("Complete", BUTTON_TEXT_SIZE, BUTTON_TEXT_COLOR)
     complete_text_rect = complete_text.get_rect(center=complete_button_rect.center)
     screen.blit(complete_text, complete_text_rect)
 
+# 拼图块变化后增量更新实时完整性检测，返回检测器
+def get_live_integrity():
+    integrity_monitor.update()
+    return integrity_monitor
+
+# 完成按钮左侧的实时完整性指示：每个方向一个箭头，绿色为通过，红色为有拼图块会沿该方向脱离
+def draw_integrity_indicator():
+    global integrity_indicator_rect
+    if not show_live_integrity:
+        integrity_indicator_rect = None
+        return
+    monitor = get_live_integrity()
+    active = len(board.pieces) > 1
+    
+    arrow_count = len(DIRECTIONS)
+    panel_width = arrow_count * INTEGRITY_ARROW_SIZE + (arrow_count + 1) * INTEGRITY_ARROW_SPACING
+    panel_rect = pygame.Rect(
+        SCREEN_WIDTH - COMPLETE_BUTTON_WIDTH - 2 * BUTTON_PADDING - panel_width,
+        SCREEN_HEIGHT - BUTTON_HEIGHT - BUTTON_PADDING,
+        panel_width,
+        BUTTON_HEIGHT
+    )
+    pygame.draw.rect(screen, BUTTON_BG_COLOR, panel_rect)
+    integrity_indicator_rect = panel_rect
+    
+    # 箭头是指向移动方向的三角形
+    half = INTEGRITY_ARROW_SIZE // 2
+    for direction, (dx, dy) in enumerate(DIRECTIONS):
+        if not active:
+            color = INTEGRITY_IDLE_COLOR
+        elif monitor.passed[direction]:
+            color = INTEGRITY_PASS_COLOR
+        else:
+            color = INTEGRITY_FAIL_COLOR
+        center_x = panel_rect.x + INTEGRITY_ARROW_SPACING + half + direction * (INTEGRITY_ARROW_SIZE + INTEGRITY_ARROW_SPACING)
+        center_y = panel_rect.centery
+        tip = (center_x + dx * half, center_y + dy * half)
+        base_left = (center_x - dx * half + dy * half, center_y - dy * half - dx * half)
+        base_right = (center_x - dx * half - dy * half, center_y - dy * half + dx * half)
+        pygame.draw.polygon(screen, color, (tip, base_left, base_right))
+
 # 规则说明对话框
 def show_rules():
     # 规则内容 - 可以根据需要修改
@@ -419,7 +789,7 @@ def show_rules():
     contents = [
         ('text', "Welcome to "+GAME_NAME+"!"),
         
-        ('image', os.path.join(work_folder, 'pictures', 'rules_cover.png'), "center"),
+        ('image', RULES_COVER_PATH, "center"),
         
         ('text', "BASIC CONTROLS:"),
         ('text', "• Left click / hold & drag to select grid cells."),
@@ -455,12 +825,8 @@ def show_rules():
     )
     button_hover = False
     
-    # 创建字体
-    title_font = pygame.font.SysFont(None, RULES_TITLE_SIZE)
-    text_font = pygame.font.SysFont(None, RULES_TEXT_SIZE)
-    
     # 渲染标题
-    title_surface = title_font.render(title, True, RULES_TITLE_COLOR)
+    title_surface = render_text(title, RULES_TITLE_SIZE, RULES_TITLE_COLOR)
     title_rect = title_surface.get_rect(centerx=RULES_WIDTH // 2, top=RULES_PADDING)
     
     # 渲染内容
@@ -470,22 +836,11 @@ def show_rules():
             # 处理文本段落
             lines = item[1].split('\n')
             for line in lines:
-                text_surface = text_font.render(line, True, RULES_TEXT_COLOR)
+                text_surface = render_text(line, RULES_TEXT_SIZE, RULES_TEXT_COLOR)
                 content_items.append(('text', text_surface))
         elif item[0] == 'image':
-            # 处理图片
-            try:
-                img_path, position = item[1], item[2]
-                img = pygame.image.load(img_path)
-                # 调整图片大小，确保不超过对话框宽度的80%
-                max_width = int(RULES_WIDTH * 0.8) - 2 * RULES_PADDING
-                if img.get_width() > max_width:
-                    ratio = max_width / img.get_width()
-                    new_size = (max_width, int(img.get_height() * ratio))
-                    img = pygame.transform.scale(img, new_size)
-                content_items.append(('image', img, position))
-            except pygame.error:
-                print(f"Warning: Could not load image {img_path}")
+            # 处理图片（由资源管理器在后台加载并缩放，绘制时再取用）
+            content_items.append(('image', item[1], item[2]))
     
     # 计算规则窗口在屏幕上的位置（居中）
     rules_x = (SCREEN_WIDTH - RULES_WIDTH) // 2
@@ -549,7 +904,11 @@ def show_rules():
                 content_surface.blit(text_surface, (0, y_pos))
                 y_pos += text_surface.get_height() + 10
             elif item[0] == 'image':
-                img, position = item[1], item[2]
+                # 图片还没有加载完成时先跳过，加载完成后的下一帧再显示
+                img = assets.get_image(item[1], RULES_IMAGE_MAX_WIDTH, wait=False)
+                if img is None:
+                    continue
+                position = item[2]
                 if position == "left":
                     x = 0
                 elif position == "right":
@@ -579,7 +938,7 @@ def show_rules():
         pygame.draw.rect(rules_surface, RULES_BORDER_COLOR, button_rect, 2)
         
         # 绘制按钮文本
-        button_text = text_font.render("OK", True, RULES_BUTTON_TEXT_COLOR)
+        button_text = render_text("OK", RULES_TEXT_SIZE, RULES_BUTTON_TEXT_COLOR)
         button_text_rect = button_text.get_rect(center=button_rect.center)
         rules_surface.blit(button_text, button_text_rect)
         
@@ -587,6 +946,7 @@ def show_rules():
         screen.blit(rules_surface, (rules_x, rules_y))
         
         pygame.display.flip()
+        report_first_frame()
     
     return
 
@@ -598,76 +958,28 @@ def get_grid_pos(mouse_pos):
 
 # 检查位置是否在已有拼图块中
 def is_in_puzzle_piece(pos):
-    for piece in puzzle_pieces:
-        if pos in piece['cells']:
-            return True
-    return False
+    return board.is_in_piece(pos)
 
-# 检查连通性
-def check_connectivity(cells_list):
-    if not cells_list:
-        return False
-    
-    # 使用BFS检查连通性
-    visited = set()
-    queue = [cells_list[0]]
-    
-    while queue:
-        current = queue.pop(0)
-        if current in visited:
-            continue
-        
-        visited.add(current)
-        
-        # 检查四个方向的相邻格子
-        neighbors = [
-            (current[0] + 1, current[1]),
-            (current[0] - 1, current[1]),
-            (current[0], current[1] + 1),
-            (current[0], current[1] - 1)
-        ]
-        
-        for neighbor in neighbors:
-            if neighbor in cells_list and neighbor not in visited:
-                queue.append(neighbor)
-    
-    # 如果所有格子都被访问到，则连通
-    return len(visited) == len(cells_list)
-
-# 保存当前游戏状态
-def save_game_state():
-    global game_states
-    # 创建当前状态的深拷贝
-    state = {
-        'cells': cells.copy(),
-        'puzzle_pieces': [piece.copy() for piece in puzzle_pieces],
-        'available_colors': available_colors.copy(),
-        'current_color_index': current_color_index
-    }
-    game_states.append(state)
-    # 限制历史记录数量，防止内存占用过大
-    if len(game_states) > 50:
-        game_states.pop(0)
-
-# 撤销到上一个状态
+# 撤销上一步操作
 def undo():
-    global cells, puzzle_pieces, available_colors, current_color_index, game_states
-    
-    if len(game_states) > 0:
-        # 恢复到上一个状态
-        state = game_states.pop()
-        cells = state['cells']
-        puzzle_pieces = state['puzzle_pieces']
-        available_colors = state['available_colors']
-        current_color_index = state['current_color_index']
+    if board.undo():
+        # 拼图块可能被撤销掉或改变了索引，清除选择
+        select_piece(None)
         # 播放点击音效
-        SOUNDS['click_flip'].play()
+        play_sound('click_flip')
+        return True
+    return False
+
+# 重做上一步撤销的操作
+def redo():
+    if board.redo():
+        select_piece(None)
+        play_sound('click_flip')
         return True
     return False
 
 # 重置游戏
 def restart_game():
-    global cells, puzzle_pieces, available_colors, current_color_index, game_states
     global grid_size, grid_offset_x, grid_offset_y, slider_value
     global success_sound_played, fail_sound_played  # 添加fail_sound_played
     
@@ -676,11 +988,7 @@ def restart_game():
     fail_sound_played = False
     
     # 重置游戏状态
-    cells = {}
-    puzzle_pieces = []
-    available_colors = CELL_COLORS.copy()
-    current_color_index = 0
-    game_states = []
+    board.reset()
     
     # 重置网格状态
     grid_size = DEFAULT_GRID_SIZE
@@ -688,9 +996,34 @@ def restart_game():
     grid_offset_y = DEFAULT_GRID_OFFSET_Y
     slider_value = (DEFAULT_GRID_SIZE - MIN_GRID_SIZE) / (MAX_GRID_SIZE - MIN_GRID_SIZE)
     
-    save_game_state()  # 保存初始状态
     # 播放点击音效
-    SOUNDS['click_flip'].play()
+    play_sound('click_flip')
+
+# 保存盘面到存档文件
+def save_board():
+    pieces, cells = board.snapshot()
+    try:
+        save_solution_atomic(save_path, pieces, cells)
+    except (OSError, ValueError) as e:
+        show_notification(f"Save failed: {e}", NOTIFICATION_ERROR_COLOR)
+        return False
+    show_notification(f"Saved to {os.path.basename(save_path)}", NOTIFICATION_SUCCESS_COLOR)
+    return True
+
+# 从存档文件读取盘面（会清空撤销历史）
+def load_board(path=None):
+    path = path or save_path
+    try:
+        solution = load_solution(path)
+    except (OSError, ValueError) as e:
+        show_notification(f"Load failed: {e}", NOTIFICATION_ERROR_COLOR)
+        return False
+    board.load(solution['pieces'], solution['cells'], solution['cell_owner'])
+    select_piece(None)
+    fit_view_to_content()
+    play_sound('click_flip')
+    show_notification(f"Loaded {os.path.basename(path)}", NOTIFICATION_SUCCESS_COLOR)
+    return True
 
 # 显示提示信息
 def show_notification(text, color=NOTIFICATION_SUCCESS_COLOR):
@@ -699,44 +1032,29 @@ def show_notification(text, color=NOTIFICATION_SUCCESS_COLOR):
     end_time = pygame.time.get_ticks() + NOTIFICATION_DURATION
     notification = (text, color, end_time)
 
-# 创建拼图块
-def create_puzzle_piece():
-    global cells, puzzle_pieces, available_colors, current_color_index
-    
-    # 获取所有未在拼图块中的填色格子
-    colored_cells = [pos for pos in cells.keys() if not is_in_puzzle_piece(pos)]
-    
-    if not colored_cells:
-        show_notification("No cells to create puzzle piece", NOTIFICATION_ERROR_COLOR)
+# 批量创建拼图块：每组相连的填色格子各创建一个，整批作为一步撤销
+def create_puzzle_pieces():
+    try:
+        piece_indices = board.create_pieces()
+    except BoardError as e:
+        show_notification(str(e), NOTIFICATION_ERROR_COLOR)
         return False
     
-    # 检查连通性
-    if not check_connectivity(colored_cells):
-        show_notification("Cells are not connected", NOTIFICATION_ERROR_COLOR)
+    play_sound('put_down')
+    show_notification(f"{len(piece_indices)} puzzle piece(s) created", NOTIFICATION_SUCCESS_COLOR)
+    return True
+
+# 创建拼图块
+def create_puzzle_piece():
+    # 用所有未在拼图块中的填色格子创建拼图块
+    try:
+        board.create_piece()
+    except BoardError as e:
+        show_notification(str(e), NOTIFICATION_ERROR_COLOR)
         return False
     
-    # 保存当前状态
-    save_game_state()
-    
-    # 如果颜色用尽，重置颜色列表
-    if not available_colors:
-        available_colors = CELL_COLORS.copy()
-    
-    # 随机选择一个颜色
-    piece_color = random.choice(available_colors)
-    available_colors.remove(piece_color)
-    
-    # 创建新的拼图块，包含颜色信息
-    new_piece = {'cells': colored_cells, 'color': piece_color}
-    puzzle_pieces.append(new_piece)
-    
-    # 从cells中删除这些格子
-    for pos in colored_cells:
-        if pos in cells:
-            del cells[pos]
-    
     # 创建成功时播放音效
-    SOUNDS['put_down'].play()
+    play_sound('put_down')
     show_notification("Puzzle piece created successfully", NOTIFICATION_SUCCESS_COLOR)
     return True
 
@@ -754,18 +1072,20 @@ def draw_cells(cells_dict):
             pygame.draw.rect(screen, color[:3], (grid_x, grid_y, grid_size, grid_size))
 
 # 绘制单个拼图块
-def draw_single_piece(piece_dict, cell_color=None, border_color=None):
+def draw_single_piece(piece, cell_color=None, border_color=None, surface=None):
     # 处理空参数
+    if surface is None:
+        surface = screen
     if cell_color is None:
-        if 'color' in piece_dict:
-            cell_color = piece_dict['color']
+        if piece.color is not None:
+            cell_color = piece.color
         else:
             cell_color = DEFAULT_CELL_COLOR
     if border_color is None:
         border_color = CELL_BORDER_COLOR
 
     # 绘制拼图块的格子
-    for pos in piece_dict['cells']:
+    for pos in piece.cells:
         grid_x = int(pos[0] * grid_size + grid_offset_x)
         grid_y = int(pos[1] * grid_size + grid_offset_y)
         
@@ -775,71 +1095,68 @@ def draw_single_piece(piece_dict, cell_color=None, border_color=None):
             # 检查是否有透明度
             if cell_color[3] == 255:
                 # 完全不透明，直接绘制
-                pygame.draw.rect(screen, cell_color[:3], (grid_x, grid_y, grid_size, grid_size))
+                pygame.draw.rect(surface, cell_color[:3], (grid_x, grid_y, grid_size, grid_size))
             else:
                 # 有透明度，使用半透明表面
                 highlight_surface = pygame.Surface((grid_size, grid_size), pygame.SRCALPHA)
                 # 直接填充颜色（带透明度）（也可以用pygame.draw.rect指定范围绘制，但是没有必要）
                 highlight_surface.fill(cell_color)
                 # 绘制到屏幕上（屏幕直接绘制不支持透明度）
-                screen.blit(highlight_surface, (grid_x, grid_y))
+                surface.blit(highlight_surface, (grid_x, grid_y))
     
     # 绘制拼图块的边框（也可以考虑半透明，但是没有必要，以后再说吧）
-    draw_piece_border(piece_dict['cells'], border_color)
+    draw_piece_border(piece.outline, border_color, surface)
 
 # 绘制拼图块们
-def draw_pieces(pieces_list):
+def draw_pieces(pieces_list, surface=None):
     # 先绘制所有非选中拼图块
+    selected = get_selected_indices()
     for i, piece in enumerate(pieces_list):
-        if i != selected_piece_index:
-            draw_single_piece(piece, cell_color=piece['color'], border_color=CELL_BORDER_COLOR)
+        if i not in selected:
+            draw_single_piece(piece, cell_color=piece.color, border_color=CELL_BORDER_COLOR, surface=surface)
 
 # 绘制格子和拼图块
 def draw_all_cells():
     # 绘制填色的格子
-    draw_cells(cells)
+    draw_cells(board.cells)
+    
+    # 绘制未选中的拼图块（缓存的图层）
+    screen.blit(get_piece_layer(), (0, 0))
     
-    # 绘制拼图块
-    draw_pieces(puzzle_pieces)
+    # 标出选中拼图块可以放下的位置（拖动中旋转翻转过时不再适用，不显示）
+    if selected_piece_index is not None and show_placement_overlay and not is_judging and not drag_symmetry:
+        screen.blit(*get_placement_layer())
     
     # 最后绘制选中拼图块，确保它在最上层
-    if selected_piece_index is not None:
-        piece = puzzle_pieces[selected_piece_index]
+    for piece_index in get_selected_indices():
+        piece = board.pieces[piece_index]
         # 绘制选中拼图块
-        draw_single_piece(piece, cell_color=piece['color'], border_color=CELL_SELECTED_BORDER_COLOR)
+        draw_single_piece(piece, cell_color=piece.color, border_color=CELL_SELECTED_BORDER_COLOR)
         # 绘制选中拼图块的半透明覆盖
         draw_single_piece(piece, cell_color=CELL_SELECTED_OVERLAY_COLOR, border_color=CELL_SELECTED_BORDER_COLOR)
-        
+    
+    # 编辑时用橙色标出当前会脱离的拼图块（增量维护，见polylok.monitor）
+    if show_live_integrity and not is_judging:
+        separable = get_live_integrity().result
+        if separable is not None:
+            for piece_index in separable['pieces']:
+                draw_single_piece(board.pieces[piece_index], cell_color=CELL_WARNING_OVERLAY_COLOR, border_color=CELL_WARNING_OVERLAY_COLOR)
+    
+    # 判定失败时，用红色标出会脱离的拼图块
+    if is_judging and check_result is False:
+        for piece_index in failed_pieces:
+            draw_single_piece(board.pieces[piece_index], cell_color=CELL_ERROR_OVERLAY_COLOR, border_color=CELL_ERROR_OVERLAY_COLOR)
 
 # 添加绘制拼图块边框的辅助函数
-def draw_piece_border(piece, border_color):
-    # 找出拼图块的边缘
-    edges = set()
-    for pos in piece:
-        x, y = pos
-        
-        # 检查四个方向，如果相邻位置不在拼图块中，则这条边是边缘
-        neighbors = [
-            ((x+1, y), (1, 0), (1, 1)),  # 右边
-            ((x-1, y), (0, 0), (0, 1)),  # 左边
-            ((x, y+1), (0, 1), (1, 1)),  # 下边
-            ((x, y-1), (0, 0), (1, 0))   # 上边
-        ]
-        
-        for neighbor, start_offset, end_offset in neighbors:
-            if neighbor not in piece:
-                # 计算边的起点和终点
-                start_x = int((x + start_offset[0]) * grid_size + grid_offset_x)
-                start_y = int((y + start_offset[1]) * grid_size + grid_offset_y)
-                end_x = int((x + end_offset[0]) * grid_size + grid_offset_x)
-                end_y = int((y + end_offset[1]) * grid_size + grid_offset_y)
-                
-                # 添加到边缘列表
-                edges.add((start_x, start_y, end_x, end_y))
+def draw_piece_border(outline, border_color, surface=None):
+    if surface is None:
+        surface = screen
     
-    # 绘制所有边缘
-    for start_x, start_y, end_x, end_y in edges:
-        pygame.draw.line(screen, border_color[:3], (start_x, start_y), (end_x, end_y), CELL_BORDER_WIDTH)
+    # 轮廓线段已经预先算好并合并（见polylok.board.piece_outline），这里只做缩放和平移
+    for x1, y1, x2, y2 in outline:
+        start = (int(x1 * grid_size + grid_offset_x), int(y1 * grid_size + grid_offset_y))
+        end = (int(x2 * grid_size + grid_offset_x), int(y2 * grid_size + grid_offset_y))
+        pygame.draw.line(surface, border_color[:3], start, end, CELL_BORDER_WIDTH)
 
 # 绘制创建拼图块按钮
 def draw_create_button():
@@ -853,7 +1170,7 @@ def draw_create_button():
         return False
     
     # 检查是否有可以创建拼图块的格子
-    has_colored_cells = any(not is_in_puzzle_piece(pos) for pos in cells.keys())
+    has_colored_cells = board.has_loose_cells()
     
     if has_colored_cells:
         # 获取鼠标位置
@@ -875,8 +1192,7 @@ def draw_create_button():
         pygame.draw.rect(screen, CELL_BORDER_COLOR[:3], create_button_rect, 2)
         
         # 绘制按钮文本
-        font = pygame.font.SysFont(None, 28)
-        text = font.render("Create Puzzle Piece", True, CREATE_BUTTON_TEXT_COLOR[:3])
+        text = render_text("Create Puzzle Piece", CREATE_BUTTON_TEXT_SIZE, CREATE_BUTTON_TEXT_COLOR[:3])
         text_rect = text.get_rect(center=create_button_rect.center)
         screen.blit(text, text_rect)
         
@@ -887,16 +1203,12 @@ def draw_create_button():
 
 # 绘制提示信息
 def draw_notification():
+    # 过期的提示由主循环清除并标记重绘，这里不再检查时间，避免局部重绘时前后判断不一致
     if notification:
         text, color, end_time = notification
         
-        # 检查提示是否过期
-        if pygame.time.get_ticks() > end_time:
-            return None
-        
         # 创建半透明表面
-        font = pygame.font.SysFont(None, NOTIFICATION_FONT_SIZE)
-        text_surface = font.render(text, True, NOTIFICATION_TEXT_COLOR)
+        text_surface = render_text(text, NOTIFICATION_FONT_SIZE, NOTIFICATION_TEXT_COLOR)
         text_rect = text_surface.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2))
         
         # 创建背景矩形
@@ -912,21 +1224,20 @@ def draw_notification():
 
 # 添加删除拼图块函数
 def delete_selected_piece():
-    global selected_piece_index, puzzle_pieces
-    
-    if selected_piece_index is not None:
-        # 保存当前状态
-        save_game_state()
-        
-        # 删除选中的拼图块
-        del puzzle_pieces[selected_piece_index]
+    selected = get_selected_indices()
+    if selected:
+        # 删除选中的拼图块（多选时一起删除，作为一步撤销）
+        board.delete_pieces(selected)
         
         # 清除选择
-        selected_piece_index = None
+        select_piece(None)
         
         # 删除成功时播放音效
-        SOUNDS['delete'].play()
-        show_notification("Puzzle piece deleted", NOTIFICATION_SUCCESS_COLOR)
+        play_sound('delete')
+        if len(selected) == 1:
+            show_notification("Puzzle piece deleted", NOTIFICATION_SUCCESS_COLOR)
+        else:
+            show_notification(f"{len(selected)} puzzle pieces deleted", NOTIFICATION_SUCCESS_COLOR)
         return True
     return False
 
@@ -956,8 +1267,7 @@ def draw_delete_button():
         pygame.draw.rect(screen, CELL_BORDER_COLOR[:3], delete_button_rect, 2)
         
         # 绘制按钮文本
-        font = pygame.font.SysFont(None, 28)
-        text = font.render("Delete Puzzle Piece", True, CREATE_BUTTON_TEXT_COLOR[:3])
+        text = render_text("Delete Puzzle Piece", CREATE_BUTTON_TEXT_SIZE, CREATE_BUTTON_TEXT_COLOR[:3])
         text_rect = text.get_rect(center=delete_button_rect.center)
         screen.blit(text, text_rect)
         
@@ -968,39 +1278,21 @@ def draw_delete_button():
 
 # 检查点击位置是否在拼图块上
 def get_piece_at_pos(pos):
-    cell_pos = get_grid_pos(pos)
-    
-    for i, piece in enumerate(puzzle_pieces):
-        if cell_pos in piece['cells']:
-            return i
-    
-    return None
+    return board.piece_at(get_grid_pos(pos))
 
 # 添加显示恰当大小画面函数
 def fit_view_to_content():
     global grid_size, grid_offset_x, grid_offset_y, slider_value
     
-    # 获取所有有色格子（包括拼图中的格子）
-    all_cells = []
-    
-    # 添加未成为拼图的格子
-    for pos in cells.keys():
-        all_cells.append(pos)
-    
-    # 添加拼图中的格子
-    for piece in puzzle_pieces:
-        for pos in piece['cells']:
-            all_cells.append(pos)
+    # 获取所有有色格子（包括拼图中的格子）的范围
+    bounds = board.bounds()
     
     # 如果没有格子，不做任何调整
-    if not all_cells:
+    if bounds is None:
         return
     
     # 计算有效画面范围
-    min_x = min(pos[0] for pos in all_cells)
-    max_x = max(pos[0] for pos in all_cells)
-    min_y = min(pos[1] for pos in all_cells)
-    max_y = max(pos[1] for pos in all_cells)
+    min_x, min_y, max_x, max_y = bounds
     
     # 计算中心点（考虑格子的中心）
     center_x = (min_x + max_x) / 2 + 0.5
@@ -1027,95 +1319,119 @@ def fit_view_to_content():
     grid_offset_x = SCREEN_WIDTH / 2 - center_x * grid_size
     grid_offset_y = SCREEN_HEIGHT / 2 - center_y * grid_size
 
-# 检查拼图块是否可以放置在指定位置
-def can_place_piece_at(piece_index, offset_x, offset_y):
-    if piece_index is None:
+# 当前拖动的放置缓存，拖动的拼图块变化时重新建立
+def get_drag_placement():
+    global drag_placement
+    selected = get_selected_indices()
+    if drag_placement is None or drag_placement.piece_indices != selected or drag_placement.symmetry != drag_symmetry:
+        drag_placement = PlacementCache(board, selected, drag_symmetry)
+    return drag_placement
+
+# 旋转或翻转选中的拼图块；拖动中只改变预览，放下时与移动一起提交
+def transform_selected_piece(symmetry):
+    global drag_symmetry
+    selected = get_selected_indices()
+    if len(selected) != 1:
+        if selected:
+            show_notification("Select a single piece to rotate or flip", NOTIFICATION_ERROR_COLOR)
         return False
     
-    piece = puzzle_pieces[piece_index]
-    
-    # 计算新位置
-    new_positions = []
-    for pos in piece['cells']:
-        new_pos = (pos[0] + offset_x, pos[1] + offset_y)
-        new_positions.append(new_pos)
-    
-    # 检查是否与其他拼图块或填色格子重叠
-    for i, other_piece in enumerate(puzzle_pieces):
-        if i == piece_index:  # 跳过自身
-            continue
-        
-        for new_pos in new_positions:
-            if new_pos in other_piece['cells']:
-                return False  # 与其他拼图块重叠
-    
-    # 检查是否与填色格子重叠
-    for new_pos in new_positions:
-        if new_pos in cells:
-            return False  # 与填色格子重叠
-    
+    if dragging_piece:
+        drag_symmetry = compose_symmetries(drag_symmetry, symmetry)
+    elif not board.transform_piece(selected[0], symmetry):
+        show_notification("Not enough room to rotate or flip here", NOTIFICATION_ERROR_COLOR)
+        return False
+    play_sound('click_flip')
     return True
 
+# 所有选中拼图块的索引（升序元组），没有选中时为空元组
+def get_selected_indices():
+    if selected_piece_index is None:
+        return ()
+    return tuple(sorted(selected_group | {selected_piece_index}))
+
+# 只选中一块拼图块（piece_index为None时清除选择）
+def select_piece(piece_index):
+    global selected_piece_index, selected_group
+    selected_piece_index = piece_index
+    selected_group = {piece_index} if piece_index is not None else set()
+
+# Shift+点击：把拼图块加入选择，已选中时移出选择
+def toggle_piece_selection(piece_index):
+    global selected_piece_index, selected_group
+    selected = set(get_selected_indices())
+    if piece_index in selected:
+        selected.discard(piece_index)
+        if selected_piece_index == piece_index:
+            selected_piece_index = min(selected) if selected else None
+    else:
+        selected.add(piece_index)
+        selected_piece_index = piece_index
+    selected_group = selected
+
+# 框选矩形（屏幕坐标），从起点到当前鼠标位置
+def get_selection_box_rect(mouse_pos):
+    left, right = sorted((selection_box_start[0], mouse_pos[0]))
+    top, bottom = sorted((selection_box_start[1], mouse_pos[1]))
+    return pygame.Rect(left, top, right - left + 1, bottom - top + 1)
+
+# 结束框选：选中至少有一个格子落在框内的拼图块，加入到已有的选择中
+def finish_selection_box(mouse_pos):
+    global selection_box_start, selected_piece_index, selected_group
+    rect = get_selection_box_rect(mouse_pos)
+    selection_box_start = None
+    min_x, min_y = get_grid_pos(rect.topleft)
+    max_x, max_y = get_grid_pos((rect.right - 1, rect.bottom - 1))
+    indices = board.pieces_in_rect(min_x, min_y, max_x, max_y)
+    if not indices:
+        return
+    selected_group = set(get_selected_indices()) | set(indices)
+    if selected_piece_index is None:
+        selected_piece_index = indices[0]
+    play_sound('pick_up')
+
 # 检查拼图结构的完整性
 def check_puzzle_integrity():
-    global check_result, failure_reason
+    global check_result, failure_reason, failed_pieces, result_score
+    
+    failed_pieces = []
     
-    if not puzzle_pieces:
+    if not board.pieces:
         check_result = False
         failure_reason = "No puzzle pieces to check"
         return False
     
-    # 对每个方向进行检查
-    for direction_index, (dx, dy) in enumerate(DIRECTIONS):
-        # 使用队列进行广度优先搜索
-        from collections import deque
-        queue = deque([0])  # 从第一块拼图开始
-        visited = {0}  # 记录已访问的拼图
-        
-        # 广度优先搜索
-        while queue:
-            current_piece_index = queue.popleft()
-            current_piece = puzzle_pieces[current_piece_index]
-            
-            # 检查当前拼图块的每个格子
-            for cell in current_piece['cells']:
-                # 计算相邻格子的位置
-                neighbor_cell = (cell[0] + dx, cell[1] + dy)
-                
-                # 检查这个位置是否属于其他未访问的拼图块
-                for i, piece in enumerate(puzzle_pieces):
-                    if i not in visited and neighbor_cell in piece['cells']:
-                        queue.append(i)
-                        visited.add(i)
-        
-        # 如果有拼图块未被访问到，说明结构在这个方向上不完整
-        if len(visited) < len(puzzle_pieces):
-            direction_text = ['upward', 'rightward', 'downward', 'leftward'][direction_index]
-            check_result = False
-            failure_reason = f"Structure breaks when moving {direction_text}"
-            return False
+    # 基于各方向阻挡图的强连通分量，找出能整体平移脱离的最小拼图块子集
+    separable = board.find_separable_subset()
+    
+    # 如果存在这样的子集，说明结构在这个方向上不完整
+    if separable is not None:
+        direction_text = DIRECTION_TEXTS[separable['direction']]
+        check_result = False
+        failed_pieces = separable['pieces']
+        failure_reason = f"Structure breaks when moving {direction_text} ({len(failed_pieces)} highlighted piece(s) slide out)"
+        return False
     
     # 所有方向都通过检查
     check_result = True
+    result_score = calculate_score()
     return True
 
 # 完成拼图
 def complete_puzzle():
-    global selected_piece_index, is_judging, ui_alpha, cells
+    global is_judging, ui_alpha
     
     # 播放点击音效
-    SOUNDS['click_big'].play()
+    play_sound('click_big')
     
     # 清除选择状态
-    selected_piece_index = None
+    select_piece(None)
     
-    # 清除所有未形成拼图的格子
-    if cells:
-        save_game_state()  # 保存当前状态以便撤销
-        cells = {}  # 清空所有格子
+    # 清除所有未形成拼图的格子（会记录到撤销历史）
+    board.clear_cells()
     
     # 如果没有拼图块，直接返回
-    if not puzzle_pieces:
+    if not board.pieces:
         show_notification("No puzzle pieces to check", NOTIFICATION_ERROR_COLOR)
         return
     
@@ -1131,58 +1447,11 @@ def complete_puzzle():
 
 # 检查是否有被完全包围的区域
 def has_enclosed_area():
-    # 检查每一块拼图
-    for piece_index, piece in enumerate(puzzle_pieces):
-        # 收集这块拼图占据的格子
-        piece_cells = set(piece['cells'])
-        
-        # 找出这块拼图的边界范围
-        min_x = min(x for x, y in piece_cells)
-        max_x = max(x for x, y in piece_cells)
-        min_y = min(y for x, y in piece_cells)
-        max_y = max(y for x, y in piece_cells)
-        
-        # 检查边界内的每个空格子
-        for x in range(min_x, max_x + 1):
-            for y in range(min_y, max_y + 1):
-                if (x, y) not in piece_cells:  # 如果是空格子
-                    # 检查这个空格子的四个相邻位置是否都被当前拼图块占据
-                    neighbors = [(x+1, y), (x-1, y), (x, y+1), (x, y-1)]
-                    if all(neighbor in piece_cells for neighbor in neighbors):
-                        return True
-    return False
+    return board.has_enclosed_area()
 
-# 修改计算分数函数
+# 计算分数（计分规则见polylok.scoring）
 def calculate_score():
-    # 如果只有一块拼图，分数为0
-    if len(puzzle_pieces) == 1:
-        return 0
-    
-    # 检查是否有被完全包围的区域
-    if has_enclosed_area():
-        return 50
-    
-    # 计算所需的数据
-    total_pieces = len(puzzle_pieces)
-    
-    # 计算最大块的格子数和总格子数
-    max_piece_grids = 0
-    total_grids = 0
-    for piece in puzzle_pieces:
-        piece_size = len(piece['cells'])
-        max_piece_grids = max(max_piece_grids, piece_size)
-        total_grids += piece_size
-    
-    # 根据最大块的大小使用不同的计分公式
-    if max_piece_grids <= 6:
-        score = 8900 * total_pieces * max_piece_grids / total_grids / total_grids
-    elif max_piece_grids == 7:
-        score = 4250 * total_pieces * max_piece_grids / total_grids / total_grids
-    else:
-        score = 540 / total_grids
-    
-    # 取整
-    return int(score)
+    return board.score()
 
 # 修改绘制判定结果函数
 def draw_result():
@@ -1193,10 +1462,10 @@ def draw_result():
     
     # 播放音效
     if check_result and not success_sound_played:
-        SOUNDS['success'].play()
+        play_sound('success')
         success_sound_played = True
     elif not check_result and not fail_sound_played:
-        SOUNDS['fail'].play()
+        play_sound('fail')
         fail_sound_played = True
     
     # 创建半透明蒙版
@@ -1205,13 +1474,12 @@ def draw_result():
     screen.blit(overlay, (0, 0))
     
     # 绘制标题
-    title_font = pygame.font.SysFont(None, RESULT_TITLE_SIZE)
     if check_result:
-        title_text = title_font.render("PUZZLE COMPLETE!", True, RESULT_SUCCESS_COLOR)
-        detail_text = f"Score: {calculate_score()}"  # 使用计算出的分数
+        title_text = render_text("PUZZLE COMPLETE!", RESULT_TITLE_SIZE, RESULT_SUCCESS_COLOR)
+        detail_text = f"Score: {result_score}"  # 使用判定时计算出的分数
         text_color = RESULT_SUCCESS_COLOR
     else:
-        title_text = title_font.render("PUZZLE FAILED!", True, RESULT_FAILURE_COLOR)
+        title_text = render_text("PUZZLE FAILED!", RESULT_TITLE_SIZE, RESULT_FAILURE_COLOR)
         detail_text = failure_reason
         text_color = RESULT_FAILURE_COLOR
     
@@ -1220,8 +1488,7 @@ def draw_result():
     screen.blit(title_text, title_rect)
     
     # 绘制详细信息
-    detail_font = pygame.font.SysFont(None, RESULT_TEXT_SIZE)
-    detail_text = detail_font.render(detail_text, True, text_color)
+    detail_text = render_text(detail_text, RESULT_TEXT_SIZE, text_color)
     detail_rect = detail_text.get_rect(centerx=SCREEN_WIDTH//2, centery=SCREEN_HEIGHT//2 + 20)
     screen.blit(detail_text, detail_rect)
     
@@ -1243,25 +1510,75 @@ def draw_result():
     pygame.draw.rect(screen, button_color, result_button_rect)
     
     # 绘制按钮文字
-    button_font = pygame.font.SysFont(None, RESULT_BUTTON_TEXT_SIZE)
-    button_text = button_font.render("Restart", True, RESULT_BUTTON_TEXT_COLOR)
+    button_text = render_text("Restart", RESULT_BUTTON_TEXT_SIZE, RESULT_BUTTON_TEXT_COLOR)
     button_text_rect = button_text.get_rect(center=result_button_rect.center)
     screen.blit(button_text, button_text_rect)
 
+# 初始化pygame、音频系统与游戏窗口，并开始在后台加载资源
+# 放在函数中而不是模块顶层，这样导入本模块时不会打开窗口，核心逻辑见polylok包
+def init_game():
+    global screen
+    
+    # 初始化pygame
+    pygame.init()
+    
+    # 初始化pygame音频系统
+    pygame.mixer.init()
+    
+    # 创建游戏窗口
+    #screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.RESIZABLE)
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption(GAME_NAME)
+    
+    # 在后台加载音效与规则图片
+    assets.start([(RULES_COVER_PATH, RULES_IMAGE_MAX_WIDTH)])
+
 # 修改主循环
 def main():
     global grid_size, grid_offset_x, grid_offset_y, dragging, last_mouse_pos, slider_dragging, slider_value
-    global left_mouse_down, right_mouse_down, selected_piece_index, dragging_piece, dragging_piece_offset
+    global left_mouse_down, right_mouse_down, selected_piece_index, dragging_piece, dragging_piece_offset, drag_placement, show_placement_overlay, show_live_integrity
+    global selection_box_start, drag_symmetry
     global SCREEN_WIDTH, SCREEN_HEIGHT, screen, notification, create_button_rect, create_button_hover
-    global cells, puzzle_pieces, available_colors, current_color_index, delete_button_rect, delete_button_hover
+    global delete_button_rect, delete_button_hover
     global is_judging, check_result  # 添加这一行，声明判定相关的全局变量
     
+    # 初始化pygame与游戏窗口
+    init_game()
+    
     # 显示规则说明
     show_rules()
     
     # 初始化游戏状态
     restart_game()
     
+    # 回放编辑日志恢复上次的盘面，之后的每次编辑都写入日志
+    # 没有可用的日志（例如日志目录被清理过）时，退而读取自动存档
+    journal = Journal(journal_path)
+    replayed = replay(journal_path, board)
+    if replayed is None and os.path.exists(autosave_path):
+        try:
+            solution = load_solution(autosave_path)
+        except (OSError, ValueError) as e:
+            show_notification(f"Autosave could not be restored: {e}", NOTIFICATION_ERROR_COLOR)
+        else:
+            board.load(solution['pieces'], solution['cells'], solution['cell_owner'])
+            fit_view_to_content()
+            show_notification(f"Restored {AUTOSAVE_FILENAME}", NOTIFICATION_SUCCESS_COLOR)
+    journal.attach(board)
+    if replayed is not None and (board.pieces or board.cells):
+        fit_view_to_content()
+        show_notification(f"Last session restored ({replayed} edit(s) replayed)", NOTIFICATION_SUCCESS_COLOR)
+    
+    # 命令行指定了存档文件时读取它
+    if len(sys.argv) > 1 and os.path.exists(save_path):
+        load_board()
+    
+    # 后台自动保存，盘面变化后每隔AUTOSAVE_INTERVAL保存一次
+    autosaver = Autosaver(autosave_path)
+    last_autosave_time = pygame.time.get_ticks()
+    saved_version = (board.piece_version, board.cells_version)
+    reported_autosave_error = None  # 已经提示过的自动保存错误，同一个错误只提示一次
+    
     # 鼠标状态
     left_mouse_down = False
     right_mouse_down = False
@@ -1269,10 +1586,28 @@ def main():
     
     clock = pygame.time.Clock()
     
+    # 重绘状态
+    mark_dirty()
+    last_input_time = pygame.time.get_ticks()
+    last_hover_pos = pygame.mouse.get_pos()
+    last_preview_offset = None
+    last_ui_state = None
+    
     running = True
     while running:
         # 处理事件
         for event in pygame.event.get():
+            last_input_time = pygame.time.get_ticks()
+            
+            # 鼠标移动只重绘受影响的区域，其他事件（点击、按键、滚轮、窗口变化等）都整屏重绘
+            if event.type == MOUSEMOTION:
+                mark_hover_changes(last_hover_pos, event.pos)
+                last_hover_pos = event.pos
+                if dragging or slider_dragging or selection_box_start is not None:
+                    mark_dirty()
+            else:
+                mark_dirty()
+            
             if event.type == QUIT:
                 running = False
             
@@ -1292,23 +1627,39 @@ def main():
             
             # 处理其他事件
             elif event.type == KEYDOWN:
+                # 保存 / 读取
+                if event.mod & KMOD_CTRL and event.key == KEYBOARD_SHORTCUTS['save']:
+                    save_board()
+                
+                elif event.mod & KMOD_CTRL and event.key == KEYBOARD_SHORTCUTS['load']:
+                    load_board(autosave_path if event.mod & KMOD_SHIFT else None)
+                
                 # 撤销操作
-                if event.key == KEYBOARD_SHORTCUTS['undo']:
+                elif event.key == KEYBOARD_SHORTCUTS['undo']:
                     undo()
                 
+                # 重做操作
+                elif event.key == KEYBOARD_SHORTCUTS['redo']:
+                    redo()
+                
                 # 重新开始
                 elif event.key == KEYBOARD_SHORTCUTS['restart']:
                     restart_game()
                 
                 # 创建拼图
                 elif event.key == KEYBOARD_SHORTCUTS['create']:
-                    if not selected_piece_index:  # 如果没有选中拼图块
+                    if selected_piece_index is None:  # 如果没有选中拼图块
                         create_puzzle_piece()
                 
                 # 创建拼图（快捷键2）
                 elif event.key == KEYBOARD_SHORTCUTS['create2']:
-                    if not selected_piece_index:  # 如果没有选中拼图块
+                    if selected_piece_index is None:  # 如果没有选中拼图块
                         create_puzzle_piece()
+                
+                # 批量创建拼图
+                elif event.key == KEYBOARD_SHORTCUTS['create_all']:
+                    if selected_piece_index is None:  # 如果没有选中拼图块
+                        create_puzzle_pieces()
 
                 # 删除拼图
                 elif event.key == KEYBOARD_SHORTCUTS['delete']:
@@ -1350,6 +1701,18 @@ def main():
                 # 适应视图
                 elif event.key == KEYBOARD_SHORTCUTS['fit_view']:
                     fit_view_to_content()
+                
+                # 显示/隐藏可放置位置
+                elif event.key == KEYBOARD_SHORTCUTS['placement']:
+                    show_placement_overlay = not show_placement_overlay
+                
+                # 显示/隐藏实时完整性指示
+                elif event.key == KEYBOARD_SHORTCUTS['live_check']:
+                    show_live_integrity = not show_live_integrity
+                
+                # 旋转、翻转拼图
+                elif event.key in TRANSFORM_SHORTCUTS:
+                    transform_selected_piece(TRANSFORM_SHORTCUTS[event.key])
             
             elif event.type == VIDEORESIZE:
                 pass
@@ -1454,7 +1817,7 @@ def main():
                     # 检查是否点击了显示恰当大小画面按钮
                     elif fit_view_button_rect.collidepoint(event.pos):
                         # 播放点击音效
-                        SOUNDS['click_flip'].play()
+                        play_sound('click_flip')
                         fit_view_to_content()
                         click_handled = True
                     
@@ -1462,14 +1825,14 @@ def main():
                     elif undo_button_rect and undo_button_rect.collidepoint(event.pos):
                         undo()
                         # 清除选择
-                        selected_piece_index = None
+                        select_piece(None)
                         click_handled = True
                     
                     # 检查是否点击了重新开始按钮
                     elif restart_button_rect and restart_button_rect.collidepoint(event.pos):
                         restart_game()
                         # 清除选择
-                        selected_piece_index = None
+                        select_piece(None)
                         click_handled = True
                     
                     # 检查是否点击了删除拼图块按钮
@@ -1479,9 +1842,13 @@ def main():
                     
                     # 检查是否点击了创建拼图块按钮
                     elif create_button_rect and create_button_rect.collidepoint(event.pos):
-                        create_puzzle_piece()
+                        # 按住Shift点击时批量创建
+                        if pygame.key.get_mods() & KMOD_SHIFT:
+                            create_puzzle_pieces()
+                        else:
+                            create_puzzle_piece()
                         # 清除选择
-                        selected_piece_index = None
+                        select_piece(None)
                         click_handled = True
                     
                     # 检查是否点击了完成拼图按钮
@@ -1489,18 +1856,31 @@ def main():
                         complete_puzzle()
                         click_handled = True
                     
+                    # 点击实时完整性指示时不做任何操作，避免给背后的网格上色
+                    elif integrity_indicator_rect and integrity_indicator_rect.collidepoint(event.pos):
+                        click_handled = True
+                    
                     # 如果点击事件已处理，不进行填色操作
                     if click_handled:
                         continue
                     
                     # 检查是否点击了拼图块
                     piece_index = get_piece_at_pos(event.pos)
-                    if piece_index is not None:
+                    shift_held = pygame.key.get_mods() & KMOD_SHIFT
+                    if piece_index is not None and shift_held:
+                        # 按住Shift点击：加入或移出选择，不拖动
+                        play_sound('pick_up')
+                        toggle_piece_selection(piece_index)
+                        click_handled = True
+                    elif piece_index is not None:
                         # 播放选择音效
-                        SOUNDS['pick_up'].play()
+                        play_sound('pick_up')
                         
-                        # 选择拼图块
-                        selected_piece_index = piece_index
+                        # 点击已选中的一组拼图块中的一块时拖动整组，否则只选择这一块
+                        if piece_index in get_selected_indices():
+                            selected_piece_index = piece_index
+                        else:
+                            select_piece(piece_index)
                         
                         # 开始拖动拼图块
                         dragging_piece = True
@@ -1510,26 +1890,26 @@ def main():
                         grid_y = (event.pos[1] - grid_offset_y) / grid_size
                         
                         # 计算点击位置与拼图块第一个格子的偏移量
-                        first_cell = puzzle_pieces[piece_index]['cells'][0]
+                        first_cell = board.pieces[piece_index].anchor
                         dragging_piece_offset = (grid_x - first_cell[0], grid_y - first_cell[1])
                         
                         click_handled = True
+                    elif shift_held:
+                        # 按住Shift在空白处拖动：框选拼图块
+                        selection_box_start = event.pos
                     else:
                         # 清除选择
-                        selected_piece_index = None
+                        select_piece(None)
                         
-                        # 开始填色
+                        # 开始填色，整个拖动过程作为一步撤销
                         left_mouse_down = True
+                        board.begin_stroke()
                         cell_pos = get_grid_pos(event.pos)
                         
                         # 检查是否可以填色
                         if not is_in_puzzle_piece(cell_pos):
-                            # 如果是新的操作，保存当前状态
-                            if cell_pos not in cells:
-                                save_game_state()
-                            
                             # 填色（使用默认颜色）
-                            cells[cell_pos] = DEFAULT_CELL_COLOR
+                            board.paint(cell_pos, DEFAULT_CELL_COLOR)
                             last_cell_pos = cell_pos
                 
                 elif event.button == 2:  # 中键
@@ -1541,22 +1921,20 @@ def main():
                     piece_index = get_piece_at_pos(event.pos)
                     if piece_index is not None:
                         # 选择拼图块
-                        selected_piece_index = piece_index
+                        select_piece(piece_index)
                     else:
                         # 清除选择
-                        selected_piece_index = None
+                        select_piece(None)
                         
-                        # 开始清除颜色
+                        # 开始清除颜色，整个拖动过程作为一步撤销
                         right_mouse_down = True
+                        board.begin_stroke()
                         cell_pos = get_grid_pos(event.pos)
                         
                         # 检查是否可以清除颜色
-                        if cell_pos in cells and not is_in_puzzle_piece(cell_pos):
-                            # 保存当前状态
-                            save_game_state()
-                            
+                        if cell_pos in board.cells and not is_in_puzzle_piece(cell_pos):
                             # 清除颜色
-                            del cells[cell_pos]
+                            board.erase(cell_pos)
                             last_cell_pos = cell_pos
                 
                 elif event.button == 4:  # 滚轮上滚
@@ -1589,41 +1967,41 @@ def main():
             
             elif event.type == MOUSEBUTTONUP:
                 if event.button == 1:  # 左键
+                    if left_mouse_down:
+                        board.end_stroke()
                     left_mouse_down = False
                     slider_dragging = False
                     
+                    # 结束框选
+                    if selection_box_start is not None:
+                        finish_selection_box(event.pos)
+                    
                     # 如果正在拖动拼图块，尝试放置
                     if dragging_piece and selected_piece_index is not None:
-                        # 计算当前鼠标位置对应的网格坐标
-                        grid_x = (event.pos[0] - grid_offset_x) / grid_size
-                        grid_y = (event.pos[1] - grid_offset_y) / grid_size
-                        
                         # 计算拼图块应该移动的网格单位数（四舍五入到整数）
-                        offset_x = round(grid_x - dragging_piece_offset[0] - puzzle_pieces[selected_piece_index]['cells'][0][0])
-                        offset_y = round(grid_y - dragging_piece_offset[1] - puzzle_pieces[selected_piece_index]['cells'][0][1])
+                        offset_x, offset_y = get_drag_offset(event.pos)
                         
-                        # 如果有移动且可以放置
-                        if (offset_x != 0 or offset_y != 0) and can_place_piece_at(selected_piece_index, offset_x, offset_y):
-                            # 保存当前状态
-                            save_game_state()
-                            
-                            # 移动拼图块
-                            new_cells = []
-                            for pos in puzzle_pieces[selected_piece_index]['cells']:
-                                new_pos = (pos[0] + offset_x, pos[1] + offset_y)
-                                new_cells.append(new_pos)
-                            
-                            puzzle_pieces[selected_piece_index]['cells'] = new_cells
+                        # 如果有移动且可以放置（预览已经检测过这个偏移），移动选中的拼图块（整组作为一步撤销）
+                        # 拖动中旋转翻转过时，旋转翻转与移动作为一步撤销
+                        if get_drag_placement().can_place(offset_x, offset_y):
+                            if drag_symmetry:
+                                board.transform_piece(selected_piece_index, drag_symmetry, offset_x, offset_y)
+                            else:
+                                board.move_pieces(get_selected_indices(), offset_x, offset_y)
                     
                     # 重置拖动状态
                     dragging_piece = False
                     dragging_piece_offset = None
+                    drag_placement = None
+                    drag_symmetry = 0
                     last_cell_pos = None
                 
                 elif event.button == 2:  # 中键
                     dragging = False
                 
                 elif event.button == 3:  # 右键
+                    if right_mouse_down:
+                        board.end_stroke()
                     right_mouse_down = False
                     last_cell_pos = None
             
@@ -1669,71 +2047,72 @@ def main():
                     if cell_pos != last_cell_pos:
                         if left_mouse_down and not is_in_puzzle_piece(cell_pos):
                             # 填色（使用默认颜色）
-                            cells[cell_pos] = DEFAULT_CELL_COLOR
+                            board.paint(cell_pos, DEFAULT_CELL_COLOR)
+                            mark_dirty(bbox_screen_rect(cell_pos + cell_pos))
                             last_cell_pos = cell_pos
                         
-                        elif right_mouse_down and cell_pos in cells and not is_in_puzzle_piece(cell_pos):
+                        elif right_mouse_down and cell_pos in board.cells and not is_in_puzzle_piece(cell_pos):
                             # 清除颜色
-                            del cells[cell_pos]
+                            board.erase(cell_pos)
+                            mark_dirty(bbox_screen_rect(cell_pos + cell_pos))
                             last_cell_pos = cell_pos
         
-        # 绘制背景
-        screen.fill(BG_COLOR)
+        # 提示过期时清除它，并重绘它覆盖过的区域
+        if notification and pygame.time.get_ticks() > notification[2]:
+            notification = None
+            mark_dirty()
         
-        # 绘制网格
-        draw_grid()
+        # 拖动拼图块时，预览位置变化才需要重绘旧预览和新预览所在的区域
+        if not is_judging and dragging_piece and selected_piece_index is not None:
+            preview_offset = get_drag_offset(pygame.mouse.get_pos())
+            if preview_offset != last_preview_offset:
+                # 预览的拼图块（可能旋转翻转过）按偏移缓存，取它们的包围盒
+                placement = get_drag_placement()
+                for offset in (last_preview_offset, preview_offset):
+                    if offset is not None:
+                        for piece in placement.lookup(*offset)[1]:
+                            mark_dirty(bbox_screen_rect(piece.bbox))
+                last_preview_offset = preview_offset
+        else:
+            last_preview_offset = None
         
-        # 绘制格子和拼图块
-        draw_all_cells()
+        # 创建/删除按钮的显示与否取决于这些状态，变化时整屏重绘
+        ui_state = (get_selected_indices(), board.has_loose_cells(), is_judging)
+        if ui_state != last_ui_state:
+            last_ui_state = ui_state
+            mark_dirty()
         
-        # 如果正在拖动拼图块，绘制预览
-        if not is_judging and dragging_piece and selected_piece_index is not None:
-            # 获取鼠标位置
-            mouse_pos = pygame.mouse.get_pos()
-            
-            # 计算当前鼠标位置对应的网格坐标
-            grid_x = (mouse_pos[0] - grid_offset_x) / grid_size
-            grid_y = (mouse_pos[1] - grid_offset_y) / grid_size
-            
-            # 计算拼图块应该移动的网格单位数（四舍五入到整数）
-            offset_x = round(grid_x - dragging_piece_offset[0] - puzzle_pieces[selected_piece_index]['cells'][0][0])
-            offset_y = round(grid_y - dragging_piece_offset[1] - puzzle_pieces[selected_piece_index]['cells'][0][1])
-            
-            # 检查是否可以放置
-            can_place = can_place_piece_at(selected_piece_index, offset_x, offset_y)
-
-            # 创建新拼图块dict
-            new_piece = {}
-            new_piece['cells'] = [(pos[0] + offset_x, pos[1] + offset_y) for pos in puzzle_pieces[selected_piece_index]['cells']]
-            # 根据是否可以放置设置不同的颜色
-            if can_place:
-                new_piece['color'] = puzzle_pieces[selected_piece_index]['color'][:3] + (120,)
-                new_piece_border_color = CELL_SELECTED_BORDER_COLOR
-            else:
-                # 如果不能放置，使用红色
-                new_piece['color'] = (255, 0, 0, 120)
-                new_piece_border_color = (255, 0, 0, 255)
-            
-            # 绘制预览
-            draw_single_piece(new_piece, border_color=new_piece_border_color)
-
-        # 绘制UI
-        if not is_judging:
-            draw_slider()
-            draw_buttons()
-            if not draw_delete_button():
-                draw_create_button()
+        # 自动保存：界面线程只取快照，编码和写文件在后台线程完成
+        board_version = (board.piece_version, board.cells_version)
+        if board_version != saved_version and pygame.time.get_ticks() - last_autosave_time >= AUTOSAVE_INTERVAL:
+            autosaver.submit(board.snapshot())
+            saved_version = board_version
+            last_autosave_time = pygame.time.get_ticks()
         
-        # 绘制提示信息
-        draw_notification()
+        # 后台写入失败时提示（error由后台线程设置，成功写入后清除）
+        autosave_error = autosaver.error
+        if autosave_error is not None and autosave_error is not reported_autosave_error:
+            show_notification(f"Autosave failed: {autosave_error}", NOTIFICATION_ERROR_COLOR)
+            mark_dirty()
+        reported_autosave_error = autosave_error
         
-        # 如果正在判定，绘制结果
-        if is_judging:
-            draw_result()
+        # 编辑日志定期落盘
+        journal.sync()
         
         # 更新显示
-        pygame.display.flip()
-        clock.tick(120)
+        render_frame()
+        
+        # 最近有输入时保持高帧率，空闲后降低帧率以节省CPU
+        if pygame.time.get_ticks() - last_input_time < IDLE_DELAY:
+            clock.tick(ACTIVE_FPS)
+        else:
+            clock.tick(IDLE_FPS)
+    
+    # 退出前保存最后的改动
+    if (board.piece_version, board.cells_version) != saved_version:
+        autosaver.submit(board.snapshot())
+    autosaver.close(timeout=5)
+    journal.close()
     
     pygame.quit()
     sys.exit()
@@ -0,0 +1,15 @@
+# -*- coding:utf-8 -*-
+
+"""
+拼格锁 PolyLok 的核心逻辑（不依赖pygame）
+
+这里只导入盘面、判定与计分等轻量模块，保证导入耗时很小；
+解答文件读写（polylok.solution）、批量判定（polylok.judge）等模块按需单独导入
+"""
+
+from .board import Board, BoardError, Piece, check_connectivity, connected_components
+from .bitboard import BitBoard
+from .history import History
+from .integrity import DIRECTIONS, DIRECTION_TEXTS, build_cell_owner, build_contact_graph, check_integrity
+from .interlock import find_separable_subset, is_interlocked, separable_subsets, strongly_connected_components
+from .scoring import calculate_score, has_enclosed_area
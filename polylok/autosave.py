@@ -0,0 +1,81 @@
+# -*- coding:utf-8 -*-
+
+"""
+后台自动保存
+
+界面线程只取一份盘面快照（见board.Board.snapshot，耗时与拼图块数量有关，与格子总数无关），
+编码和写文件都在后台线程完成，不会卡住帧循环。
+写入时先写临时文件再替换，程序在写入中途退出也不会留下损坏的存档。
+"""
+
+import os
+import threading
+
+from .solution import save_solution
+
+AUTOSAVE_FILENAME = "autosave.plk"  # 自动存档文件名（二进制格式）
+
+# 存档目录：$XDG_DATA_HOME/polylok，未设置时为 ~/.local/share/polylok
+def user_data_dir():
+    base = os.environ.get('XDG_DATA_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'share')
+    return os.path.join(base, 'polylok')
+
+# 原子地保存解答：写入同目录的临时文件后替换目标文件
+def save_solution_atomic(path, pieces, cells=()):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    root, extension = os.path.splitext(path)
+    temp_path = f"{root}.{os.getpid()}.tmp{extension}"  # 保留扩展名，save_solution据此选择格式
+    try:
+        save_solution(temp_path, pieces, cells)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+# 后台自动保存线程
+# submit只记下最新的快照，线程空闲时写入；连续提交时只写最后一份
+class Autosaver:
+    def __init__(self, path):
+        self.path = path
+        self.error = None                  # 最近一次写入失败的异常，成功后清除
+        self._pending = None               # 等待写入的快照 (pieces, cells)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self.thread = threading.Thread(target=self._run, name="polylok-autosave", daemon=True)
+        self.thread.start()
+    
+    # 提交一份快照（见Board.snapshot），立即返回
+    def submit(self, snapshot):
+        with self._lock:
+            self._pending = snapshot
+        self._wakeup.set()
+    
+    # 写完等待中的快照后结束线程（退出程序前调用）
+    def close(self, timeout=None):
+        self._stopping = True
+        self._wakeup.set()
+        self.thread.join(timeout)
+    
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            with self._lock:
+                snapshot = self._pending
+                self._pending = None
+            if snapshot is not None:
+                pieces, cells = snapshot
+                try:
+                    save_solution_atomic(self.path, pieces, cells)
+                    self.error = None
+                except (OSError, ValueError) as e:
+                    self.error = e
+            # 写入期间又提交的快照会再次触发_wakeup，写完它再结束
+            if self._stopping and self._pending is None:
+                return
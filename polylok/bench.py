@@ -0,0 +1,316 @@
+# -*- coding:utf-8 -*-
+
+"""
+性能基准测试
+
+用法: python -m polylok.bench [基准名称 ...]
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from .bitboard import BitBoard
+from .board import Board, Piece
+from .integrity import build_cell_owner, piece_boundary, check_integrity
+from .interlock import find_separable_subset
+from .monitor import IntegrityMonitor
+from .placement import PlacementCache, PlacementHeatmap
+from .solution import load_solution, save_solution
+
+# 生成一个能通过完整性判定的大盘面：
+# 外圈是一块环形拼图，内部用2格高的长条拼图块铺满，推动外环时所有拼图块都会被推动
+def make_framed_board(size=100, strip_width=10):
+    ring = []
+    for i in range(size):
+        ring.append((i, 0))
+        ring.append((i, size - 1))
+    for i in range(1, size - 1):
+        ring.append((0, i))
+        ring.append((size - 1, i))
+    
+    pieces_cells = [ring]
+    for top in range(1, size - 1, 2):
+        for left in range(1, size - 1, strip_width):
+            right = min(left + strip_width, size - 1)
+            bottom = min(top + 2, size - 1)
+            pieces_cells.append([(x, y) for x in range(left, right) for y in range(top, bottom)])
+    return pieces_cells
+
+# 多次运行，返回最短与中位耗时（毫秒）
+def time_call(func, repeat=50):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return timings[0], timings[len(timings) // 2]
+
+# 完整性判定基准：约1万格、约500块
+# 分别测量边界探测点现算与已缓存两种情况（游戏中拼图块的边界在创建、移动时缓存）。
+# 从头判定（integrity.check_integrity）要逐个查询约6千个边界探测点并建立推动关系图，纯Python达不到1毫秒（约2～8毫秒，视机器而定）；
+# 盘面上的判定（Board.check_integrity）随编辑增量维护推动关系，编辑一块后只剩图上的可达性搜索，在1毫秒以内
+def bench_integrity():
+    pieces_cells = make_framed_board()
+    cell_owner = build_cell_owner(pieces_cells)
+    boundaries = [piece_boundary(piece_cells) for piece_cells in pieces_cells]
+    total_cells = sum(len(piece_cells) for piece_cells in pieces_cells)
+    assert check_integrity(pieces_cells, cell_owner) is None
+    
+    best, median = time_call(lambda: check_integrity(pieces_cells, cell_owner))
+    print(f"check_integrity (from scratch): {total_cells} cells / {len(pieces_cells)} pieces: "
+          f"best {best:.3f} ms, median {median:.3f} ms")
+    
+    best, median = time_call(lambda: check_integrity(pieces_cells, cell_owner, boundaries))
+    print(f"check_integrity (cached boundaries): {total_cells} cells / {len(pieces_cells)} pieces: "
+          f"best {best:.3f} ms, median {median:.3f} ms")
+    
+    # 去掉索引为2的一块，交替左移和撤销移动它右边的一块，每次编辑后判定
+    board = Board()
+    board.pieces = [Piece(piece_cells) for i, piece_cells in enumerate(pieces_cells) if i != 2]
+    board.rebuild_cell_owner()
+    board.check_integrity()
+    
+    def edit_and_check():
+        if not board.undo():
+            board.move_piece(2, -1, 0)
+        return board.check_integrity()
+    
+    best, median = time_call(edit_and_check)
+    print(f"Board.check_integrity (after a move, incremental): {len(board.pieces)} pieces: "
+          f"best {best:.3f} ms, median {median:.3f} ms (including the move itself)")
+
+# 互锁求解基准：完全互锁的盘面，以及去掉外环后会散开的盘面
+def bench_interlock():
+    pieces_cells = make_framed_board()
+    cell_owner = build_cell_owner(pieces_cells)
+    assert find_separable_subset(pieces_cells, cell_owner) is None
+    
+    best, median = time_call(lambda: find_separable_subset(pieces_cells, cell_owner))
+    print(f"find_separable_subset (interlocked): {len(pieces_cells)} pieces: "
+          f"best {best:.3f} ms, median {median:.3f} ms")
+    
+    loose_cells = pieces_cells[1:]
+    cell_owner = build_cell_owner(loose_cells)
+    result = find_separable_subset(loose_cells, cell_owner)
+    best, median = time_call(lambda: find_separable_subset(loose_cells, cell_owner))
+    print(f"find_separable_subset (separable, {len(result['pieces'])} free): {len(loose_cells)} pieces: "
+          f"best {best:.3f} ms, median {median:.3f} ms")
+
+# 实时完整性检测基准：约1万格、约500块的盘面上编辑后更新判定结果
+# 对比每次都完整判定（interlock.find_separable_subset）与IntegrityMonitor的增量更新，
+# 编辑分别为交替删除和撤销删除一块拼图块（拼图块顺序改变），以及在少一块的盘面上交替左移和撤销移动空位右边的一块
+def bench_monitor():
+    def make_board(skip=None):
+        board = Board()
+        board.pieces = [Piece(piece_cells) for i, piece_cells in enumerate(make_framed_board()) if i != skip]
+        board.rebuild_cell_owner()
+        return board
+    
+    board = make_board()
+    best, median = time_call(lambda: IntegrityMonitor(board).update(), repeat=10)
+    print(f"integrity monitor: {len(board.pieces)} pieces: build {best:.2f} ms")
+    
+    def edit_delete(board):
+        if not board.undo():
+            board.delete_piece(2)
+    
+    def edit_move(board):
+        if not board.undo():
+            board.move_piece(2, -1, 0)
+    
+    # 移动的盘面去掉了原来索引为2的一块，现在索引为2的是它右边的一块，可以向左移动
+    for label, edit, skip in (('delete', edit_delete, None), ('move', edit_move, 2)):
+        board = make_board(skip)
+        monitor = IntegrityMonitor(board)
+        monitor.update()
+        full_timings = []
+        live_timings = []
+        for _ in range(20):
+            version = board.piece_version
+            edit(board)
+            assert board.piece_version != version
+            start = time.perf_counter()
+            expected = find_separable_subset(board.pieces, board.cell_owner, [piece.boundary for piece in board.pieces])
+            full_timings.append((time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+            monitor.update()
+            live_timings.append((time.perf_counter() - start) * 1000)
+            assert monitor.result == expected
+        full_timings.sort()
+        live_timings.sort()
+        print(f"integrity monitor (after a {label}): {live_timings[len(live_timings) // 2]:.2f} ms, "
+              f"full check {full_timings[len(full_timings) // 2]:.2f} ms")
+
+# 一笔来回扫过size x size个格子的拖动填色路径
+def make_stroke_path(size=200):
+    path = []
+    for y in range(size):
+        xs = range(size) if y % 2 == 0 else range(size - 1, -1, -1)
+        path.extend((x, y) for x in xs)
+    return path
+
+# 在tracemalloc下执行一笔填色，返回 (耗时毫秒, 峰值字节数, 留存字节数, 留存内存块数)
+def measure_stroke(path, begin, paint, end):
+    tracemalloc.start()
+    start = time.perf_counter()
+    begin()
+    for pos in path:
+        paint(pos)
+    end()
+    elapsed = (time.perf_counter() - start) * 1000
+    current, peak = tracemalloc.get_traced_memory()
+    blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+    tracemalloc.stop()
+    return elapsed, peak, current, blocks
+
+# 拖动填色的撤销记录开销：200x200一笔（4万格）
+# 对比只写格子字典（没有撤销记录）、每格一条记录再合并为一组、整笔合并为一条记录三种做法
+def bench_stroke(size=200):
+    path = make_stroke_path(size)
+    
+    def plain():
+        cells = {}
+        def paint(pos):
+            cells[pos] = (180, 180, 180, 255)
+        return (lambda: None), paint, (lambda: None)
+    
+    def per_cell():
+        board = Board()
+        return board.begin_batch, board.paint, board.end_batch
+    
+    def coalesced():
+        board = Board()
+        return board.begin_stroke, board.paint, board.end_stroke
+    
+    for label, setup in (('no undo record', plain), ('per-cell records', per_cell), ('coalesced stroke', coalesced)):
+        elapsed, peak, current, blocks = measure_stroke(path, *setup())
+        print(f"stroke {size}x{size} ({label}): {elapsed:.1f} ms, peak {peak / 1024:.0f} KiB, "
+              f"retained {current / 1024:.0f} KiB in {blocks} blocks")
+
+# 放置检测基准：约1万格、约500块的盘面上，对一块长条（20格）和外环（396格）做拖动预览式的反复检测
+# 分别使用占用索引逐格查询与位棋盘两种方式，以及拖动预览的放置缓存、整个100x100视口的可放置位置图
+def bench_placement():
+    offsets = [(dx, dy) for dx in range(-5, 6) for dy in range(-5, 6)]
+    for use_bitboard in (False, True):
+        board = Board(use_bitboard=use_bitboard)
+        board.pieces = [Piece(piece_cells) for piece_cells in make_framed_board()]
+        board.rebuild_cell_owner()
+        label = 'bitboard' if use_bitboard else 'cell index'
+        
+        if use_bitboard:
+            best, median = time_call(lambda: BitBoard(board.cell_owner), repeat=10)
+            print(f"can_place_piece ({label}): build {best:.3f} ms")
+        
+        for piece_index in (1, 0):
+            board.can_place_piece(piece_index, 0, 0)
+            best, median = time_call(lambda: [board.can_place_piece(piece_index, dx, dy) for dx, dy in offsets])
+            print(f"can_place_piece ({label}): {len(board.pieces[piece_index])}-cell piece: "
+                  f"{median * 1000 / len(offsets):.2f} us per check")
+    
+    # 放置缓存：开始拖动时的建立（位棋盘已经建立，见上面的build）、第一次用到某个dy时建立禁止偏移行、
+    # 之后按已建立的行检测，以及按偏移缓存的命中分别计时
+    rows = sorted({dy for dx, dy in offsets})
+    for piece_index in (1, 0):
+        piece_indices = (piece_index,)
+        best, median = time_call(lambda: PlacementCache(board, piece_indices).is_forbidden(0, 0), repeat=10)
+        cache = PlacementCache(board, piece_indices)
+        best_rows, median_rows = time_call(lambda: (cache.forbidden.clear(), [cache.is_forbidden(0, dy) for dy in rows]))
+        best_check, median_check = time_call(lambda: [cache.is_forbidden(dx, dy) for dx, dy in offsets])
+        cache.can_place(0, 0)
+        best_lookup, median_lookup = time_call(lambda: [cache.can_place(dx, dy) for dx, dy in offsets])
+        print(f"placement cache: {len(board.pieces[piece_index])}-cell piece: build {best:.2f} ms, "
+              f"{median_rows * 1000 / len(rows):.2f} us per new row, {median_check * 1000 / len(offsets):.2f} us per check, "
+              f"{median_lookup * 1000 / len(offsets):.2f} us per memoized lookup")
+    
+    # 两块相距很远的拼图块：开始拖动的耗时（含建立位棋盘）不应随距离增长
+    for distance in (2000, 20000, 1000000):
+        far_board = Board(use_bitboard=True)
+        far_board.pieces = [Piece([(x, y) for x in range(5) for y in range(4)]),
+                            Piece([(distance + x, distance + y) for x in range(5) for y in range(4)])]
+        
+        # 重建占用索引会作废位棋盘，每次都从头建立
+        def start_drag():
+            far_board.rebuild_cell_owner()
+            return PlacementCache(far_board, (0,)).can_place(1, 0)
+        best, median = time_call(start_drag, repeat=10)
+        print(f"placement cache: two pieces {distance} cells apart: drag start {median * 1000:.1f} us")
+    
+    piece_indices = (1,)
+    
+    heatmap = PlacementHeatmap(board)
+    best, median = time_call(lambda: PlacementHeatmap(board).update(piece_indices, 0, 0, 99, 99), repeat=10)
+    heatmap.update(piece_indices, 0, 0, 99, 99)
+    
+    # 盘面已经铺满，改为交替删除和撤销删除另一块拼图块，只计时之后的增量更新
+    timings = []
+    for _ in range(20):
+        if not board.undo():
+            board.delete_piece(2)
+        start = time.perf_counter()
+        heatmap.update(piece_indices, 0, 0, 99, 99)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    print(f"placement heatmap (100x100 viewport): full {best:.2f} ms, after an edit {timings[len(timings) // 2]:.2f} ms")
+
+# 保存与读取大盘面：316x316的框架盘面（约10万格）分别用JSON和二进制格式保存，再读回盘面
+def bench_solution(size=316):
+    board = Board()
+    board.load([{'cells': piece_cells, 'color': None} for piece_cells in make_framed_board(size)])
+    pieces, cells = board.snapshot()
+    total_cells = sum(len(piece['cells']) for piece in pieces)
+    with tempfile.TemporaryDirectory() as directory:
+        for extension in ('.json', '.plk'):
+            path = os.path.join(directory, 'board' + extension)
+            best_save, _ = time_call(lambda: save_solution(path, pieces, cells), repeat=3)
+            
+            def load():
+                solution = load_solution(path)
+                Board().load(solution['pieces'], solution['cells'], solution['cell_owner'])
+            
+            best_load, _ = time_call(load, repeat=3)
+            print(f"solution ({extension}): {total_cells} cells / {len(pieces)} pieces: "
+                  f"{os.path.getsize(path) / 1024:.0f} KiB, save {best_save:.1f} ms, load into board {best_load:.1f} ms")
+
+# 核心逻辑导入耗时：在新进程中导入polylok，并确认没有引入pygame
+IMPORT_SNIPPET = (
+    "import sys, time; start = time.perf_counter(); import polylok; "
+    "print((time.perf_counter() - start) * 1000, 'pygame' in sys.modules)"
+)
+
+def bench_import(repeat=10):
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    timings = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', IMPORT_SNIPPET], cwd=package_root,
+                                capture_output=True, text=True, check=True).stdout.split()
+        timings.append(float(output[0]))
+        assert output[1] == 'False', "importing polylok must not import pygame"
+    timings.sort()
+    print(f"import polylok: best {timings[0]:.3f} ms, median {timings[len(timings) // 2]:.3f} ms")
+
+BENCHMARKS = {
+    'integrity': bench_integrity,
+    'interlock': bench_interlock,
+    'monitor': bench_monitor,
+    'stroke': bench_stroke,
+    'placement': bench_placement,
+    'solution': bench_solution,
+    'import': bench_import,
+}
+
+def main(argv=None):
+    names = sys.argv[1:] if argv is None else argv
+    for name in names or BENCHMARKS:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark: {name} (available: {', '.join(BENCHMARKS)})")
+            return 1
+        BENCHMARKS[name]()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+# -*- coding:utf-8 -*-
+
+"""
+位棋盘：每行已占用的格子用一个Python大整数表示，碰撞检测变成逐行的移位加按位与
+
+每行只覆盖这一行最左到最右的已占用格子（窗口随盘面内容变化，行之间互不影响）：
+行y的窗口从该行最左的格子x0开始，格子(x, y)对应这一行的第 x - x0 位，没有格子的行不保存。
+这样占用的内存只与各行的跨度之和有关，不随拼图块之间的距离整体放大
+（整个盘面共用一个矩形窗口时，相距很远的两块拼图块之间的空白也要占位，可能达到数百MB）。
+
+一次检测对移动的格子所在的每一行做一次移位和按位与，耗时与拼图块的行数及所在行的跨度有关，
+与盘面上的拼图块数量无关。
+"""
+
+# 占用位棋盘（盘面变化后需要重新创建）
+class BitBoard:
+    def __init__(self, cells):
+        self.rows = self.mask(cells)  # 所有已占用格子的位 {y: (x0, 位)}
+        self._piece_masks = {}        # 缓存 {键: (拼图块的位, 除它以外的占用位)}
+    
+    # 一组格子按行的位 {y: (该行最左的格子的x, 位)}
+    # 每行先写入bytearray再整体转换为整数，避免逐位或运算反复复制大整数
+    @staticmethod
+    def mask(cells):
+        columns = {}
+        for x, y in cells:
+            columns.setdefault(y, []).append(x)
+        rows = {}
+        for y, xs in columns.items():
+            x0 = min(xs)
+            bits = bytearray(((max(xs) - x0) >> 3) + 1)
+            for x in xs:
+                bit = x - x0
+                bits[bit >> 3] |= 1 << (bit & 7)
+            rows[y] = (x0, int.from_bytes(bits, 'little'))
+        return rows
+    
+    # 已占用的一组格子的位，以及除它们以外的占用位，按key缓存（如拼图块索引）
+    # 除它们以外的占用位只复制这组格子所在的行，其他行与盘面共用
+    def split(self, key, cells):
+        masks = self._piece_masks.get(key)
+        if masks is None:
+            mask = self.mask(cells)
+            obstacles = dict(self.rows)
+            for y, (x0, bits) in mask.items():
+                row_x0, row_bits = obstacles[y]
+                row_bits &= ~(bits << (x0 - row_x0))
+                if row_bits:
+                    obstacles[y] = (row_x0, row_bits)
+                else:
+                    del obstacles[y]
+            masks = (mask, obstacles)
+            self._piece_masks[key] = masks
+        return masks
+    
+    # 把mask表示的格子平移(dx, dy)后是否与obstacles中的格子重叠
+    @staticmethod
+    def collides(mask, obstacles, dx, dy):
+        for y, (x0, bits) in mask.items():
+            row = obstacles.get(y + dy)
+            if row is None:
+                continue
+            row_x0, row_bits = row
+            shift = x0 + dx - row_x0
+            if shift >= 0:
+                # 平移后整行都在这一行障碍的右侧时不必构造移位后的大整数
+                if shift < row_bits.bit_length() and (bits << shift) & row_bits:
+                    return True
+            elif (bits >> -shift) & row_bits:
+                return True
+        return False
@@ -0,0 +1,808 @@
+# -*- coding:utf-8 -*-
+
+"""
+拼图盘面模型（不依赖pygame）
+
+Board保存填色格子、拼图块、格子占用索引与撤销历史，界面只负责把它画出来
+"""
+
+import random
+from array import array
+from bisect import bisect_left
+from collections import deque
+
+from .integrity import piece_boundary
+from .monitor import IntegrityMonitor
+from .bitboard import BitBoard
+from .history import HISTORY_LIMIT, History, CELLS, CREATE, DELETE, MOVE, MOVE_GROUP, RESHAPE, BATCH
+from .polyomino import orientation_table
+from . import scoring
+
+# 默认的拼图块颜色
+DEFAULT_PIECE_COLORS = [
+    (0, 255, 0, 255),    # 绿色
+    (0, 0, 255, 255),    # 蓝色
+    (255, 255, 0, 255),  # 黄色
+    (255, 0, 255, 255),  # 紫色
+    (0, 255, 255, 255)   # 青色
+]
+DEFAULT_CELL_COLOR = (180, 180, 180, 255)  # 填色格子的默认颜色（灰色）
+
+# 格子坐标编码：code = (y + COORD_BIAS) * COORD_SPAN + (x + COORD_BIAS)
+# 坐标范围为 [-2^30, 2^30)，编码后是非负的64位整数，按编码排序即按先行后列排序
+# 平移(dx, dy)相当于每个编码加上同一个常数 dy * COORD_SPAN + dx，顺序保持不变
+COORD_BIAS = 1 << 30
+COORD_SPAN = 1 << 31
+
+_orientation_tables = {}  # 形状键 -> 8种朝向的格子（见polyomino.orientation_table），形状相同的拼图块共用
+
+# 盘面操作失败（如格子不连通），错误信息可以直接显示给玩家
+class BoardError(Exception):
+    pass
+
+# 把格子划分为四连通分量，返回各分量的格子列表（每个格子只访问一次，O(n)）
+def connected_components(cells):
+    remaining = set(cells)
+    components = []
+    
+    while remaining:
+        # 使用BFS找出包含起点的分量，访问过的格子从remaining中移除
+        start = remaining.pop()
+        component = [start]
+        queue = deque(component)
+        while queue:
+            x, y = queue.popleft()
+            for neighbor in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+                if neighbor in remaining:
+                    remaining.remove(neighbor)
+                    component.append(neighbor)
+                    queue.append(neighbor)
+        components.append(component)
+    
+    return components
+
+# 检查连通性
+def check_connectivity(cells_list):
+    if not cells_list:
+        return False
+    return len(connected_components(cells_list)) == 1
+
+# 把一组单位边的起点合并成连续区间 [(起点, 终点), ...]
+def _merge_runs(starts):
+    starts = sorted(starts)
+    runs = []
+    run_start = prev = starts[0]
+    for value in starts[1:]:
+        if value != prev + 1:
+            runs.append((run_start, prev + 1))
+            run_start = value
+        prev = value
+    runs.append((run_start, prev + 1))
+    return runs
+
+# 拼图块的轮廓：边框线段 (x1, y1, x2, y2) 的元组，单位为格子
+# 同一直线上相邻的单位边会合并成一条线段，大拼图块也只需要很少的绘制调用
+def piece_outline(cells):
+    own = set(cells)
+    horizontal = {}  # 横线所在的y -> 各单位边起点的x
+    vertical = {}    # 竖线所在的x -> 各单位边起点的y
+    for x, y in own:
+        if (x, y - 1) not in own:
+            horizontal.setdefault(y, []).append(x)
+        if (x, y + 1) not in own:
+            horizontal.setdefault(y + 1, []).append(x)
+        if (x - 1, y) not in own:
+            vertical.setdefault(x, []).append(y)
+        if (x + 1, y) not in own:
+            vertical.setdefault(x + 1, []).append(y)
+    
+    segments = []
+    for y, xs in horizontal.items():
+        for x1, x2 in _merge_runs(xs):
+            segments.append((x1, y, x2, y))
+    for x, ys in vertical.items():
+        for y1, y2 in _merge_runs(ys):
+            segments.append((x, y1, x, y2))
+    return tuple(segments)
+
+# 把格子坐标编码为一个整数
+def encode_cell(x, y):
+    return (y + COORD_BIAS) * COORD_SPAN + (x + COORD_BIAS)
+
+# 把编码还原为格子坐标 (x, y)
+def decode_cell(code):
+    y, x = divmod(code, COORD_SPAN)
+    return (x - COORD_BIAS, y - COORD_BIAS)
+
+# 拼图块
+# 格子以排好序的64位整数数组（array('q')）保存编码后的坐标，每格8字节；
+# 原来的 [(x, y), ...] 列表每格约64字节（小坐标）到117字节（坐标超出小整数缓存时），
+# 这对保存在撤销历史中的拼图块尤其明显。
+# 注意：盘面的占用索引Board.cell_owner仍以 (x, y) 元组为键，这部分内存不变。
+class Piece:
+    __slots__ = ('codes', 'color', '_bbox', '_shape_key', '_boundary', '_outline', '_orientations')
+    
+    def __init__(self, cells, color=None):
+        self.codes = array('q', sorted(encode_cell(x, y) for x, y in cells))  # 编码后的格子，升序
+        self.color = color       # 拼图块颜色 (r, g, b, a)
+        self._bbox = None        # 缓存的包围盒 (min_x, min_y, max_x, max_y)
+        self._shape_key = None   # 缓存的形状键，见shape_key
+        self._boundary = None    # 缓存的边界探测点，见integrity.piece_boundary
+        self._outline = None     # 缓存的轮廓线段，见piece_outline
+        self._orientations = None  # 缓存的8种朝向，见orientations
+    
+    def __len__(self):
+        return len(self.codes)
+    
+    # 逐个还原格子坐标，拼图块可以直接当作格子序列传给判定与计分函数
+    def __iter__(self):
+        return map(decode_cell, self.codes)
+    
+    def __repr__(self):
+        return f"Piece({self.cells!r}, color={self.color!r})"
+    
+    # 二分查找，O(log n)
+    def __contains__(self, pos):
+        x, y = pos
+        code = encode_cell(x, y)
+        codes = self.codes
+        i = bisect_left(codes, code)
+        return i < len(codes) and codes[i] == code
+    
+    # 拼图块占据的格子 [(x, y), ...]（每次调用都从编码还原，按先行后列排序）
+    @property
+    def cells(self):
+        return [decode_cell(code) for code in self.codes]
+    
+    # 格子数量
+    @property
+    def size(self):
+        return len(self.codes)
+    
+    # 排序后的第一个格子，拼图块平移时它仍是第一个，可作为拖动的参考点
+    @property
+    def anchor(self):
+        return decode_cell(self.codes[0])
+    
+    # 包围盒 (min_x, min_y, max_x, max_y)
+    @property
+    def bbox(self):
+        if self._bbox is None:
+            min_y = self.codes[0] // COORD_SPAN - COORD_BIAS
+            max_y = self.codes[-1] // COORD_SPAN - COORD_BIAS
+            xs = [code % COORD_SPAN for code in self.codes]
+            self._bbox = (min(xs) - COORD_BIAS, min_y, max(xs) - COORD_BIAS, max_y)
+        return self._bbox
+    
+    # 形状键：平移到包围盒左上角为原点后的编码，形状相同（不考虑旋转翻转）的拼图块形状键相同
+    @property
+    def shape_key(self):
+        if self._shape_key is None:
+            min_x, min_y = self.bbox[:2]
+            origin = encode_cell(min_x, min_y) - encode_cell(0, 0)
+            self._shape_key = array('q', [code - origin for code in self.codes]).tobytes()
+        return self._shape_key
+    
+    # 边界探测点（形状不变时缓存）
+    @property
+    def boundary(self):
+        if self._boundary is None:
+            self._boundary = piece_boundary(self.cells)
+        return self._boundary
+    
+    # 轮廓线段（形状不变时缓存）
+    @property
+    def outline(self):
+        if self._outline is None:
+            self._outline = piece_outline(self.cells)
+        return self._outline
+    
+    # 8种朝向的格子（按polyomino.SYMMETRIES的顺序，平移到最小x、最小y为0），形状不变时缓存
+    # 表按形状键在所有拼图块之间共享，同一形状只计算一次
+    @property
+    def orientations(self):
+        if self._orientations is None:
+            table = _orientation_tables.get(self.shape_key)
+            if table is None:
+                table = _orientation_tables[self.shape_key] = orientation_table(self.cells)
+            self._orientations = table
+        return self._orientations
+    
+    # 按SYMMETRIES[symmetry]旋转或翻转后的格子，包围盒中心保持不变
+    # 宽高奇偶不同的形状旋转90°后中心会差半格：原宽度为奇数时向右下取整，为偶数时向左上取整，
+    # 这样位置只取决于朝向，连续旋转、翻转回到原来的朝向时也回到原来的位置，不会越转越偏
+    def oriented_cells(self, symmetry):
+        shape = self.orientations[symmetry]
+        min_x, min_y, max_x, max_y = self.bbox
+        width = max(x for x, y in shape) + 1
+        height = shape[-1][1] + 1
+        odd = (max_x - min_x + 1) % 2
+        left = (min_x + max_x + 1 - width + odd) // 2
+        top = (min_y + max_y + 1 - height + odd) // 2
+        return [(x + left, y + top) for x, y in shape]
+    
+    # 平移后的格子列表
+    def translated_cells(self, dx, dy):
+        return [(x + dx, y + dy) for x, y in self.cells]
+    
+    # 平移拼图块：编码整体加上一个常数；包围盒、边界探测点和轮廓随之平移，形状键不变
+    def move(self, dx, dy):
+        delta = dy * COORD_SPAN + dx
+        self.codes = array('q', [code + delta for code in self.codes])
+        if self._bbox is not None:
+            min_x, min_y, max_x, max_y = self._bbox
+            self._bbox = (min_x + dx, min_y + dy, max_x + dx, max_y + dy)
+        if self._boundary is not None:
+            right_probes, down_probes = self._boundary
+            self._boundary = (
+                tuple((x + dx, y + dy) for x, y in right_probes),
+                tuple((x + dx, y + dy) for x, y in down_probes),
+            )
+        if self._outline is not None:
+            self._outline = tuple((x1 + dx, y1 + dy, x2 + dx, y2 + dy) for x1, y1, x2, y2 in self._outline)
+    
+    # 换成另一组格子（旋转、翻转），缓存的几何信息全部作废
+    def reshape(self, codes):
+        self.codes = codes
+        self._bbox = None
+        self._shape_key = None
+        self._boundary = None
+        self._outline = None
+        self._orientations = None
+    
+    # 浅拷贝（编码数组在移动时整体替换，可以共享）
+    def copy(self):
+        piece = Piece.__new__(Piece)
+        piece.codes = self.codes
+        piece.color = self.color
+        piece._bbox = self._bbox
+        piece._shape_key = self._shape_key
+        piece._boundary = self._boundary
+        piece._outline = self._outline
+        piece._orientations = self._orientations
+        return piece
+
+# 拼图盘面
+class Board:
+    # use_bitboard: 放置检测使用位棋盘（见polylok.bitboard），适合拖动预览这类对同一块反复检测的场景
+    def __init__(self, colors=None, history_limit=HISTORY_LIMIT, rng=random, use_bitboard=False):
+        self.colors = list(colors) if colors is not None else list(DEFAULT_PIECE_COLORS)
+        self.history_limit = history_limit
+        self.rng = rng
+        self.use_bitboard = use_bitboard
+        self.piece_version = 0  # 拼图块集合每次变化时加一，界面据此判断缓存的绘制结果是否过期
+        self.cells_version = 0  # 填色格子每次变化时加一，与piece_version一起可判断盘面是否需要重新保存
+        self.journal = None     # 编辑日志（见polylok.journal.Journal），为None时不写日志
+        self.integrity_monitor = IntegrityMonitor(self)  # 增量维护的推动关系，判定不需要逐格重建（见polylok.monitor）
+        self.reset()
+    
+    # 清空盘面与撤销历史
+    def reset(self):
+        self.cells = {}                           # 填色格子 {(x, y): color}
+        self.pieces = []                          # 拼图块列表 [Piece, ...]
+        self.cell_owner = {}                      # 格子占用索引 {(x, y): 拼图块索引}
+        self.available_colors = self.colors.copy()  # 可用颜色列表
+        self.current_color_index = 0              # 当前使用的颜色索引
+        self.history = History(self.history_limit, self._journal_record)  # 增量撤销/重做历史，见polylok.history
+        self._stroke = None                       # 进行中的笔画 {(x, y): 笔画开始前的颜色}，见begin_stroke
+        self._bitboard = None                     # 缓存的占用位棋盘，格子占用变化时作废
+        self.piece_version += 1
+        self.cells_version += 1
+        if self.journal is not None:
+            self.journal.checkpoint()
+    
+    # 新的撤销记录写入编辑日志
+    def _journal_record(self, record):
+        if self.journal is not None:
+            self.journal.write_record(record)
+    
+    # 重建格子占用索引（直接替换了pieces列表时调用）
+    def rebuild_cell_owner(self):
+        self.cell_owner = {}
+        for i, piece in enumerate(self.pieces):
+            for pos in piece.cells:
+                self.cell_owner[pos] = i
+        self.piece_version += 1
+        self._bitboard = None
+    
+    # 从index开始的拼图块索引发生了变化，更新它们的占用索引
+    def _reindex_from(self, index):
+        cell_owner = self.cell_owner
+        for i in range(index, len(self.pieces)):
+            for pos in self.pieces[i].cells:
+                cell_owner[pos] = i
+    
+    # 把拼图块插入到index处
+    def _insert_piece(self, index, piece):
+        self.pieces.insert(index, piece)
+        self._reindex_from(index)
+        self.piece_version += 1
+        self._bitboard = None
+    
+    # 移除index处的拼图块
+    def _remove_piece(self, index):
+        piece = self.pieces.pop(index)
+        for pos in piece.cells:
+            del self.cell_owner[pos]
+        self._reindex_from(index)
+        self.piece_version += 1
+        self._bitboard = None
+        return piece
+    
+    # 平移拼图块并更新占用索引
+    def _shift_piece(self, index, dx, dy):
+        piece = self.pieces[index]
+        for pos in piece.cells:
+            del self.cell_owner[pos]
+        piece.move(dx, dy)
+        for pos in piece.cells:
+            self.cell_owner[pos] = index
+        self.piece_version += 1
+        self._bitboard = None
+    
+    # 一起平移多块拼图块：先移除它们的全部占用再写入新位置，
+    # 平移后的格子可能是组内另一块原来的位置，逐块平移会互相覆盖占用索引
+    def _shift_pieces(self, indices, dx, dy):
+        cell_owner = self.cell_owner
+        for index in indices:
+            for pos in self.pieces[index].cells:
+                del cell_owner[pos]
+        for index in indices:
+            piece = self.pieces[index]
+            piece.move(dx, dy)
+            for pos in piece.cells:
+                cell_owner[pos] = index
+        self.piece_version += 1
+        self._bitboard = None
+    
+    # 把拼图块换成另一组格子（编码数组）并更新占用索引
+    def _reshape_piece(self, index, codes):
+        piece = self.pieces[index]
+        for pos in piece.cells:
+            del self.cell_owner[pos]
+        piece.reshape(codes)
+        for pos in piece.cells:
+            self.cell_owner[pos] = index
+        self.piece_version += 1
+        self._bitboard = None
+    
+    # ---------- 撤销 ----------
+    
+    # 开始合并操作：直到end_batch之前的所有操作作为一步撤销
+    def begin_batch(self):
+        self.history.begin_batch()
+    
+    def end_batch(self):
+        self.history.end_batch()
+    
+    # 开始一笔拖动填色/清除：期间每个格子只记下第一次被改动前的颜色，
+    # 到end_stroke时合并成一条记录，而不是每个格子一条
+    def begin_stroke(self):
+        self.end_stroke()
+        self._stroke = {}
+    
+    # 结束笔画，把整笔的净变化保存为一步撤销（没有净变化时不保存）
+    def end_stroke(self):
+        stroke = self._stroke
+        self._stroke = None
+        if not stroke:
+            return
+        # 按列保存（位置、旧颜色、新颜色各一个元组），整笔只新分配三个元组，
+        # 位置和颜色对象都与格子字典共享
+        get_color = self.cells.get
+        positions = tuple(pos for pos, old_color in stroke.items() if get_color(pos) != old_color)
+        if positions:
+            old_colors = tuple(map(stroke.__getitem__, positions))
+            self.history.record((CELLS, positions, old_colors, tuple(map(get_color, positions))))
+    
+    # 记录一个格子的颜色变化，笔画进行中时只记下第一次改动前的颜色
+    def _record_cell(self, pos, old_color, new_color):
+        stroke = self._stroke
+        if stroke is None:
+            self.history.record((CELLS, (pos,), (old_color,), (new_color,)))
+        elif pos not in stroke:
+            stroke[pos] = old_color
+    
+    # 正向（redo）或反向（undo）执行一条历史记录，耗时只与记录的大小有关
+    def _apply(self, record, reverse):
+        kind = record[0]
+        if kind == CELLS:
+            _, positions, old_colors, new_colors = record
+            self._bitboard = None
+            self.cells_version += 1
+            cells = self.cells
+            for pos, color in zip(positions, old_colors if reverse else new_colors):
+                if color is None:
+                    del cells[pos]
+                else:
+                    cells[pos] = color
+        elif kind == CREATE:
+            _, index, piece, piece_cells, colors_before, colors_after = record
+            self.cells_version += 1
+            if reverse:
+                self._remove_piece(index)
+                self.cells.update(piece_cells)
+                self.available_colors = list(colors_before)
+            else:
+                for pos, _color in piece_cells:
+                    del self.cells[pos]
+                self._insert_piece(index, piece)
+                self.available_colors = list(colors_after)
+        elif kind == DELETE:
+            _, index, piece = record
+            if reverse:
+                self._insert_piece(index, piece)
+            else:
+                self._remove_piece(index)
+        elif kind == MOVE:
+            _, index, dx, dy = record
+            if reverse:
+                self._shift_piece(index, -dx, -dy)
+            else:
+                self._shift_piece(index, dx, dy)
+        elif kind == MOVE_GROUP:
+            _, indices, dx, dy = record
+            if reverse:
+                self._shift_pieces(indices, -dx, -dy)
+            else:
+                self._shift_pieces(indices, dx, dy)
+        elif kind == RESHAPE:
+            _, index, old_codes, new_codes = record
+            self._reshape_piece(index, old_codes if reverse else new_codes)
+        elif kind == BATCH:
+            records = reversed(record[1]) if reverse else record[1]
+            for sub_record in records:
+                self._apply(sub_record, reverse)
+    
+    # 撤销上一步操作，没有可撤销的操作时返回False
+    def undo(self):
+        self.end_stroke()
+        record = self.history.pop_undo()
+        if record is None:
+            return False
+        self._apply(record, reverse=True)
+        if self.journal is not None:
+            self.journal.write_undo(record)
+        return True
+    
+    # 重做上一步撤销的操作，没有可重做的操作时返回False
+    def redo(self):
+        self.end_stroke()
+        record = self.history.pop_redo()
+        if record is None:
+            return False
+        self._apply(record, reverse=False)
+        if self.journal is not None:
+            self.journal.write_redo(record)
+        return True
+    
+    # 执行一条记录并保存到撤销历史，reverse为True时反向执行并放入重做历史（回放编辑日志时使用）
+    def apply_record(self, record, reverse=False):
+        self.end_stroke()
+        self._apply(record, reverse)
+        if reverse:
+            self.history.redo_stack.append(record)
+        else:
+            self.history.record(record)
+    
+    # ---------- 保存与读取 ----------
+    
+    # 用读取的解答替换整个盘面（清空撤销历史）
+    # pieces为 [{'cells': [(x, y), ...], 'color': 颜色或None}, ...]，cells为填色格子的位置列表
+    # 没有颜色的拼图块从可用颜色中分配，填色格子使用默认颜色
+    # cell_owner为与pieces对应的占用索引（solution读取时检查重叠顺便建立的），给出时直接使用，不再重新建立
+    def load(self, pieces, cells=(), cell_owner=None):
+        journal, self.journal = self.journal, None
+        self.reset()
+        used_colors = {piece['color'] for piece in pieces if piece.get('color') is not None}
+        self.available_colors = [color for color in self.colors if color not in used_colors]
+        self.pieces = [
+            Piece(piece['cells'], piece['color'] if piece.get('color') is not None else self._pick_color())
+            for piece in pieces
+        ]
+        if cell_owner is None:
+            self.rebuild_cell_owner()
+        else:
+            self.cell_owner = cell_owner
+            self.piece_version += 1
+            self._bitboard = None
+        self.cells = {pos: DEFAULT_CELL_COLOR for pos in cells if pos not in self.cell_owner}
+        self.journal = journal
+        if journal is not None:
+            journal.checkpoint()
+    
+    # 当前盘面的快照 (拼图块列表, 填色格子列表)，格式与load的参数相同，可直接传给solution.save_solution
+    # 拼图块的格子是Piece的浅拷贝（编码数组移动时整体替换，不会被之后的编辑改变），
+    # 所以快照的耗时只与拼图块数量和填色格子数量有关，可以交给后台线程慢慢写入
+    def snapshot(self):
+        pieces = [{'cells': piece.copy(), 'color': piece.color} for piece in self.pieces]
+        return pieces, list(self.cells)
+    
+    # ---------- 查询 ----------
+    
+    # 检查位置是否在已有拼图块中
+    def is_in_piece(self, pos):
+        return pos in self.cell_owner
+    
+    # 位置上的拼图块索引，没有时返回None
+    def piece_at(self, pos):
+        return self.cell_owner.get(pos)
+    
+    # 未组成拼图块的填色格子
+    def loose_cells(self):
+        return [pos for pos in self.cells if pos not in self.cell_owner]
+    
+    def has_loose_cells(self):
+        return any(pos not in self.cell_owner for pos in self.cells)
+    
+    # 至少有一个格子落在矩形 [min_x, max_x] × [min_y, max_y] 内的拼图块索引
+    def pieces_in_rect(self, min_x, min_y, max_x, max_y):
+        result = []
+        for i, piece in enumerate(self.pieces):
+            left, top, right, bottom = piece.bbox
+            if right < min_x or left > max_x or bottom < min_y or top > max_y:
+                continue
+            if any(min_x <= x <= max_x and min_y <= y <= max_y for x, y in piece):
+                result.append(i)
+        return result
+    
+    # 各拼图块的格子列表
+    def pieces_cells(self):
+        return [piece.cells for piece in self.pieces]
+    
+    # 所有格子（包括拼图块中的格子）的范围 (min_x, min_y, max_x, max_y)，盘面为空时返回None
+    def bounds(self):
+        # 拼图块直接用缓存的包围盒，不必展开所有格子
+        boxes = [piece.bbox for piece in self.pieces]
+        if self.cells:
+            xs = [pos[0] for pos in self.cells]
+            ys = [pos[1] for pos in self.cells]
+            boxes.append((min(xs), min(ys), max(xs), max(ys)))
+        if not boxes:
+            return None
+        return (min(box[0] for box in boxes), min(box[1] for box in boxes),
+                max(box[2] for box in boxes), max(box[3] for box in boxes))
+    
+    # ---------- 编辑 ----------
+    
+    # 填色，位置已被拼图块占据时返回False
+    def paint(self, pos, color=DEFAULT_CELL_COLOR):
+        if pos in self.cell_owner:
+            return False
+        old_color = self.cells.get(pos)
+        if old_color != color:
+            self.cells[pos] = color
+            self.cells_version += 1
+            self._record_cell(pos, old_color, color)
+            if old_color is None:
+                self._bitboard = None
+        return True
+    
+    # 清除颜色，位置上没有填色格子时返回False
+    def erase(self, pos):
+        if pos not in self.cells or pos in self.cell_owner:
+            return False
+        self._record_cell(pos, self.cells.pop(pos), None)
+        self.cells_version += 1
+        self._bitboard = None
+        return True
+    
+    # 清除所有未形成拼图的格子
+    def clear_cells(self):
+        self.end_stroke()
+        if self.cells:
+            self.history.record((CELLS, tuple(self.cells), tuple(self.cells.values()), (None,) * len(self.cells)))
+            self.cells = {}
+            self.cells_version += 1
+            self._bitboard = None
+    
+    # 用所有未组成拼图块的填色格子创建拼图块，返回新拼图块的索引
+    def create_piece(self):
+        self.end_stroke()
+        colored_cells = self.loose_cells()
+        
+        if not colored_cells:
+            raise BoardError("No cells to create puzzle piece")
+        
+        # 检查连通性
+        components = connected_components(colored_cells)
+        if len(components) > 1:
+            raise BoardError(f"Cells are not connected ({len(components)} separate groups)")
+        
+        return self._add_piece(colored_cells)
+    
+    # 批量创建：未组成拼图块的填色格子的每个连通分量各创建一个拼图块，返回新拼图块的索引列表
+    # 相邻的拼图块尽量使用不同的颜色；整批作为一步撤销
+    def create_pieces(self):
+        self.end_stroke()
+        colored_cells = self.loose_cells()
+        
+        if not colored_cells:
+            raise BoardError("No cells to create puzzle piece")
+        
+        # 一次遍历标出所有连通分量，按位置排序使创建顺序稳定
+        components = connected_components(colored_cells)
+        components.sort(key=min)
+        
+        self.begin_batch()
+        try:
+            return [self._add_piece(component, self._neighbor_colors(component)) for component in components]
+        finally:
+            self.end_batch()
+    
+    # 与这些格子相邻的拼图块使用的颜色
+    def _neighbor_colors(self, cells):
+        cell_owner = self.cell_owner
+        owners = set()
+        for x, y in cells:
+            for neighbor in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+                owner = cell_owner.get(neighbor)
+                if owner is not None:
+                    owners.add(owner)
+        return {self.pieces[owner].color for owner in owners}
+    
+    # 从可用颜色中随机取一个，尽量避开avoid中的颜色
+    def _pick_color(self, avoid=()):
+        # 如果颜色用尽，重置颜色列表
+        if not self.available_colors:
+            self.available_colors = self.colors.copy()
+        
+        candidates = [color for color in self.available_colors if color not in avoid]
+        if not candidates:
+            # 可用颜色都被相邻拼图块用了，优先从完整的颜色列表中找一个不冲突的
+            candidates = [color for color in self.colors if color not in avoid] or self.available_colors
+        
+        # 随机选择一个颜色
+        piece_color = self.rng.choice(candidates)
+        if piece_color in self.available_colors:
+            self.available_colors.remove(piece_color)
+        return piece_color
+    
+    # 用这些填色格子创建一个拼图块并记录到撤销历史，返回它的索引
+    def _add_piece(self, cells, avoid_colors=()):
+        colors_before = tuple(self.available_colors)
+        piece = Piece(cells, self._pick_color(avoid_colors))
+        piece_cells = tuple((pos, self.cells.pop(pos)) for pos in cells)
+        self.cells_version += 1
+        piece_index = len(self.pieces)
+        self._insert_piece(piece_index, piece)
+        self.history.record((CREATE, piece_index, piece, piece_cells, colors_before, tuple(self.available_colors)))
+        return piece_index
+    
+    # 删除拼图块
+    def delete_piece(self, piece_index):
+        # 后续拼图块的索引会前移，_remove_piece只更新它们的占用索引
+        piece = self._remove_piece(piece_index)
+        self.history.record((DELETE, piece_index, piece))
+    
+    # 删除多块拼图块，作为一步撤销；从索引大的开始删，前面的索引不受影响
+    def delete_pieces(self, piece_indices):
+        self.begin_batch()
+        for piece_index in sorted(set(piece_indices), reverse=True):
+            self.delete_piece(piece_index)
+        self.end_batch()
+    
+    # 所有已占用格子（填色格子和拼图块）的位棋盘，占用不变时复用
+    def bitboard(self):
+        if self._bitboard is None:
+            occupied = list(self.cells)
+            occupied.extend(self.cell_owner)
+            self._bitboard = BitBoard(occupied)
+        return self._bitboard
+    
+    # 检查拼图块平移(dx, dy)后是否与其他拼图块或填色格子重叠
+    def can_place_piece(self, piece_index, dx, dy):
+        if piece_index is None:
+            return False
+        
+        # 位棋盘：第一次检测时建立（O(格子数)），之后每次只是一次移位和按位与
+        if self.use_bitboard:
+            bitboard = self.bitboard()
+            mask, obstacles = bitboard.split(piece_index, self.pieces[piece_index])
+            return not bitboard.collides(mask, obstacles, dx, dy)
+        
+        cell_owner = self.cell_owner
+        cells = self.cells
+        for x, y in self.pieces[piece_index].cells:
+            new_pos = (x + dx, y + dy)
+            owner = cell_owner.get(new_pos)
+            if owner is not None and owner != piece_index:
+                return False
+            if new_pos in cells:
+                return False
+        return True
+    
+    # 检查多块拼图块一起平移(dx, dy)后是否与组外的拼图块或填色格子重叠
+    # 把整组格子当作一个整体检测，组内拼图块之间不会互相阻挡
+    def can_place_pieces(self, piece_indices, dx, dy):
+        indices = tuple(sorted(set(piece_indices)))
+        if not indices:
+            return False
+        if len(indices) == 1:
+            return self.can_place_piece(indices[0], dx, dy)
+        
+        # 位棋盘：整组的位按索引元组缓存，检测仍是一次移位和按位与
+        if self.use_bitboard:
+            bitboard = self.bitboard()
+            cells = [pos for index in indices for pos in self.pieces[index]]
+            mask, obstacles = bitboard.split(indices, cells)
+            return not bitboard.collides(mask, obstacles, dx, dy)
+        
+        cell_owner = self.cell_owner
+        cells = self.cells
+        group = set(indices)
+        for index in indices:
+            for x, y in self.pieces[index].cells:
+                new_pos = (x + dx, y + dy)
+                owner = cell_owner.get(new_pos)
+                if owner is not None and owner not in group:
+                    return False
+                if new_pos in cells:
+                    return False
+        return True
+    
+    # 平移拼图块，不能放置或没有移动时返回False
+    def move_piece(self, piece_index, dx, dy):
+        if (dx == 0 and dy == 0) or not self.can_place_piece(piece_index, dx, dy):
+            return False
+        
+        self._shift_piece(piece_index, dx, dy)
+        self.history.record((MOVE, piece_index, dx, dy))
+        return True
+    
+    # 检查一组格子是否与拼图块以外的拼图块或填色格子重叠（拼图块换成这组格子之前检测）
+    def can_place_cells(self, piece_index, cells):
+        cell_owner = self.cell_owner
+        for pos in cells:
+            owner = cell_owner.get(pos)
+            if owner is not None and owner != piece_index:
+                return False
+            if pos in self.cells:
+                return False
+        return True
+    
+    # 按SYMMETRIES[symmetry]旋转或翻转拼图块（见Piece.oriented_cells），再平移(dx, dy)，作为一条撤销记录
+    # 不能放置或形状与位置都没有变化时返回False
+    def transform_piece(self, piece_index, symmetry, dx=0, dy=0):
+        piece = self.pieces[piece_index]
+        cells = [(x + dx, y + dy) for x, y in piece.oriented_cells(symmetry)]
+        codes = array('q', sorted(encode_cell(x, y) for x, y in cells))
+        if codes == piece.codes or not self.can_place_cells(piece_index, cells):
+            return False
+        
+        old_codes = piece.codes
+        self._reshape_piece(piece_index, codes)
+        self.history.record((RESHAPE, piece_index, old_codes, codes))
+        return True
+    
+    # 一起平移多块拼图块，作为一条撤销记录；不能放置或没有移动时返回False
+    def move_pieces(self, piece_indices, dx, dy):
+        indices = tuple(sorted(set(piece_indices)))
+        if len(indices) == 1:
+            return self.move_piece(indices[0], dx, dy)
+        if (dx == 0 and dy == 0) or not self.can_place_pieces(indices, dx, dy):
+            return False
+        
+        self._shift_pieces(indices, dx, dy)
+        self.history.record((MOVE_GROUP, indices, dx, dy))
+        return True
+    
+    # ---------- 判定与计分 ----------
+    
+    # 检查结构完整性，返回第一个失败方向的索引，通过时返回None
+    # 推动关系由integrity_monitor随编辑增量维护，结果与integrity.check_integrity相同
+    def check_integrity(self):
+        return self.integrity_monitor.check_integrity()
+    
+    # 找出能整体平移脱离的最小拼图块子集，结果与interlock.find_separable_subset相同
+    def find_separable_subset(self):
+        self.integrity_monitor.update()
+        return self.integrity_monitor.result
+    
+    # 检查是否有被完全包围的区域
+    def has_enclosed_area(self):
+        return scoring.has_enclosed_area(self.pieces)
+    
+    # 计算分数
+    def score(self):
+        return scoring.calculate_score(self.pieces)
@@ -0,0 +1,104 @@
+# -*- coding:utf-8 -*-
+
+"""
+命令行入口
+
+用法: python -m polylok judge <解答文件或目录> ... [--format csv|json] [--jobs N] [--output 文件]
+      python -m polylok search --width W --height H --max-piece-size N [--min-pieces N] [--max-pieces N]
+                               [--max-cells N] [--jobs N] [--all] [--output 目录]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from . import judge, search
+from .solution import save_solution
+
+# 判定子命令
+def run_judge(args):
+    files = judge.find_solution_files(args.paths)
+    if not files:
+        print("No solution files found", file=sys.stderr)
+        return 1
+    
+    start = time.perf_counter()
+    results = judge.judge_files(files, args.jobs)
+    wall_ms = (time.perf_counter() - start) * 1000
+    summary = judge.summarize(results, wall_ms)
+    
+    output = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+    try:
+        if args.format == 'json':
+            judge.write_json(results, output, summary)
+        else:
+            judge.write_csv(results, output)
+    finally:
+        if args.output:
+            output.close()
+    
+    print(f"Judged {summary['files']} file(s) in {wall_ms:.1f} ms: "
+          f"{summary['passed']} passed, {summary['failed']} failed, {summary['errors']} error(s)",
+          file=sys.stderr)
+    return 0 if summary['errors'] == 0 else 2
+
+# 搜索子命令：每找到一个结构就输出一行JSON
+# 默认只输出不低于当前最高分的结构，--all时输出所有通过判定的结构
+def run_search(args):
+    limits = search.SearchLimits(args.width, args.height, args.max_piece_size,
+                                 args.min_pieces, args.max_pieces, args.max_cells)
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+    
+    start = time.perf_counter()
+    found = 0
+    best = None
+    for pieces_cells, score in search.search_structures(limits, args.jobs):
+        found += 1
+        if not args.all and best is not None and score < best:
+            continue
+        best = score if best is None else max(best, score)
+        
+        entry = {'score': score, 'pieces': [[list(pos) for pos in piece_cells] for piece_cells in pieces_cells]}
+        if args.output:
+            path = os.path.join(args.output, f"search_{found:05d}.json")
+            save_solution(path, [{'cells': piece_cells} for piece_cells in pieces_cells])
+            entry['file'] = path
+        print(json.dumps(entry), flush=True)
+    
+    wall_ms = (time.perf_counter() - start) * 1000
+    best_text = f", best score {best:.2f}" if best is not None else ""
+    print(f"Found {found} interlocking structure(s) in {wall_ms:.1f} ms{best_text}", file=sys.stderr)
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='polylok', description="PolyLok command line tools")
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+    
+    judge_parser = subparsers.add_parser('judge', help="judge solution files without opening the game window")
+    judge_parser.add_argument('paths', nargs='+', help="solution files or directories containing them")
+    judge_parser.add_argument('--format', choices=['csv', 'json'], default='csv', help="output format (default: csv)")
+    judge_parser.add_argument('--jobs', '-j', type=int, default=None, help="worker processes (default: CPU count)")
+    judge_parser.add_argument('--output', '-o', help="write results to this file instead of stdout")
+    judge_parser.set_defaults(func=run_judge)
+    
+    search_parser = subparsers.add_parser('search', help="search for interlocking structures with a high score")
+    search_parser.add_argument('--width', type=int, required=True, help="maximum width of the structure")
+    search_parser.add_argument('--height', type=int, required=True, help="maximum height of the structure")
+    search_parser.add_argument('--max-piece-size', type=int, required=True, help="maximum cells per piece")
+    search_parser.add_argument('--min-pieces', type=int, default=2, help="minimum number of pieces (default: 2)")
+    search_parser.add_argument('--max-pieces', type=int, default=None, help="maximum number of pieces")
+    search_parser.add_argument('--max-cells', type=int, default=None, help="maximum total cells")
+    search_parser.add_argument('--jobs', '-j', type=int, default=None, help="worker processes (default: CPU count)")
+    search_parser.add_argument('--all', action='store_true', help="report every structure, not only new best scores")
+    search_parser.add_argument('--output', '-o', help="also save each reported structure as a solution file in this directory")
+    search_parser.set_defaults(func=run_search)
+    
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
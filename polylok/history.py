@@ -0,0 +1,98 @@
+# -*- coding:utf-8 -*-
+
+"""
+基于增量记录的撤销/重做历史（不依赖pygame）
+
+每条记录只保存一次操作改变了什么，而不是整个盘面的快照，
+所以撤销、重做的耗时只与这次操作的大小有关，几千步历史占用的内存也很小。
+记录由Board生成和执行（见board.Board.undo / redo），这里只负责保存。
+
+记录格式（元组，第一项为类型）：
+    (CELLS, 位置元组, 旧颜色元组, 新颜色元组)    填色格子变化，颜色为None表示该位置没有格子
+    (CREATE, 索引, 拼图块, ((pos, 颜色), ...), 之前的可用颜色, 之后的可用颜色)
+    (DELETE, 索引, 拼图块)
+    (MOVE, 索引, dx, dy)
+    (MOVE_GROUP, 索引元组, dx, dy)            多块拼图块一起平移
+    (RESHAPE, 索引, 旧编码数组, 新编码数组)   旋转或翻转拼图块（见board.Piece.codes）
+    (BATCH, (记录, ...))                      作为一步撤销的一组记录
+"""
+
+from collections import deque
+
+HISTORY_LIMIT = 5000  # 撤销历史的最大步数，超出时丢弃最早的记录
+
+# 记录类型
+CELLS = 'cells'
+CREATE = 'create'
+DELETE = 'delete'
+MOVE = 'move'
+MOVE_GROUP = 'move_group'
+RESHAPE = 'reshape'
+BATCH = 'batch'
+
+# 撤销/重做栈
+class History:
+    # listener: 每条新记录保存后调用listener(record)（合并中的记录在end_batch时作为一条调用），用于写编辑日志
+    def __init__(self, limit=HISTORY_LIMIT, listener=None):
+        self.undo_stack = deque(maxlen=limit)  # deque在满时自动丢弃最早的记录，不需要O(n)的pop(0)
+        self.redo_stack = deque(maxlen=limit)
+        self.listener = listener
+        self._batch = None                     # 正在合并的一组记录，见begin_batch
+    
+    def __len__(self):
+        return len(self.undo_stack)
+    
+    def can_undo(self):
+        return bool(self.undo_stack)
+    
+    def can_redo(self):
+        return bool(self.redo_stack)
+    
+    # 保存一条新记录，新的操作会使重做历史失效
+    def record(self, record):
+        if self._batch is not None:
+            self._batch.append(record)
+            return
+        self.undo_stack.append(record)
+        self.redo_stack.clear()
+        if self.listener is not None:
+            self.listener(record)
+    
+    # 开始合并记录：直到end_batch之前的记录作为一步撤销
+    def begin_batch(self):
+        self.end_batch()
+        self._batch = []
+    
+    # 结束合并，把这一组记录保存为一条
+    def end_batch(self):
+        records = self._batch
+        self._batch = None
+        if not records:
+            return
+        if len(records) == 1:
+            self.record(records[0])
+        else:
+            self.record((BATCH, tuple(records)))
+    
+    # 取出要撤销的记录并移到重做栈，没有时返回None
+    def pop_undo(self):
+        self.end_batch()
+        if not self.undo_stack:
+            return None
+        record = self.undo_stack.pop()
+        self.redo_stack.append(record)
+        return record
+    
+    # 取出要重做的记录并移回撤销栈，没有时返回None
+    def pop_redo(self):
+        self.end_batch()
+        if not self.redo_stack:
+            return None
+        record = self.redo_stack.pop()
+        self.undo_stack.append(record)
+        return record
+    
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self._batch = None
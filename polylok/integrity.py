@@ -0,0 +1,109 @@
+# -*- coding:utf-8 -*-
+
+"""
+拼图结构完整性判定
+
+先借助格子占用索引一次性求出每个方向上的推动关系（拼图块i沿该方向移动时会直接推动哪些拼图块），
+再在拼图块组成的图上做可达性搜索，整体复杂度为O(总格子数)
+
+这里的check_integrity每次从头建立推动关系图，约1万格、500块的盘面上需要几毫秒；
+编辑时1毫秒以内的判定来自Board.check_integrity，它由monitor.IntegrityMonitor随编辑增量维护推动关系
+"""
+
+# 四个移动方向，顺序与界面中的方向名称一致
+DIRECTIONS = [
+    (0, -1),  # 上
+    (1, 0),   # 右
+    (0, 1),   # 下
+    (-1, 0)   # 左
+]
+DIRECTION_TEXTS = ['upward', 'rightward', 'downward', 'leftward']
+
+# 建立格子占用索引 {(x, y): 拼图块索引}
+def build_cell_owner(pieces_cells):
+    cell_owner = {}
+    for i, piece_cells in enumerate(pieces_cells):
+        for pos in piece_cells:
+            cell_owner[pos] = i
+    return cell_owner
+
+# 计算拼图块的边界探测点：右侧、下侧紧邻且不属于该拼图块的格子
+# 只与拼图块自身形状有关，拼图块不变时可以缓存复用
+def piece_boundary(piece_cells):
+    own = set(piece_cells)
+    right_probes = tuple((x + 1, y) for x, y in own if (x + 1, y) not in own)
+    down_probes = tuple((x, y + 1) for x, y in own if (x, y + 1) not in own)
+    return right_probes, down_probes
+
+# 建立每个方向上的推动关系图
+# 返回 graph[方向索引][i] = 拼图块i沿该方向移动时直接推动的拼图块集合
+def build_contact_graph(pieces_cells, cell_owner=None, boundaries=None):
+    if cell_owner is None:
+        cell_owner = build_cell_owner(pieces_cells)
+    get_owner = cell_owner.get
+    
+    piece_count = len(pieces_cells)
+    push_right = [None] * piece_count
+    push_down = [None] * piece_count
+    
+    # 只需要查询右、下两个方向，左、上方向是它们的反向图
+    if boundaries is None:
+        # 没有缓存的边界时逐格查询
+        for i, piece_cells in enumerate(pieces_cells):
+            pushed_right = set()
+            pushed_down = set()
+            for x, y in piece_cells:
+                pushed_right.add(get_owner((x + 1, y)))
+                pushed_down.add(get_owner((x, y + 1)))
+            pushed_right.discard(None)
+            pushed_right.discard(i)
+            pushed_down.discard(None)
+            pushed_down.discard(i)
+            push_right[i] = pushed_right
+            push_down[i] = pushed_down
+    else:
+        for i, (right_probes, down_probes) in enumerate(boundaries):
+            pushed = set(map(get_owner, right_probes))
+            pushed.discard(None)
+            push_right[i] = pushed
+            
+            pushed = set(map(get_owner, down_probes))
+            pushed.discard(None)
+            push_down[i] = pushed
+    
+    push_left = [set() for _ in range(piece_count)]
+    push_up = [set() for _ in range(piece_count)]
+    for i in range(piece_count):
+        for j in push_right[i]:
+            push_left[j].add(i)
+        for j in push_down[i]:
+            push_up[j].add(i)
+    
+    return [push_up, push_right, push_down, push_left]
+
+# 统计从拼图块start出发沿推动关系能到达的拼图块数量
+def count_reachable(push, start=0):
+    visited = [False] * len(push)
+    visited[start] = True
+    stack = [start]
+    count = 1
+    while stack:
+        for j in push[stack.pop()]:
+            if not visited[j]:
+                visited[j] = True
+                stack.append(j)
+                count += 1
+    return count
+
+# 检查拼图结构的完整性
+# 从第一块拼图出发，沿每个方向推动，若有拼图块推不到，则结构会在该方向上散开
+# 返回第一个失败方向的索引，全部通过时返回None
+def check_integrity(pieces_cells, cell_owner=None, boundaries=None):
+    piece_count = len(pieces_cells)
+    graph = build_contact_graph(pieces_cells, cell_owner, boundaries)
+    
+    for direction_index, push in enumerate(graph):
+        if count_reachable(push) < piece_count:
+            return direction_index
+    
+    return None
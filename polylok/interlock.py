@@ -0,0 +1,137 @@
+# -*- coding:utf-8 -*-
+
+"""
+互锁求解：找出可以整体平移脱离的拼图块子集
+
+在每个方向上，拼图块i沿该方向移动时会被j挡住（即i推动j），就连一条边i→j。
+某个真子集能沿该方向平移脱离，当且仅当子集内没有指向子集外的边，
+这样的子集存在当且仅当该方向的阻挡图不是强连通的，而最小的可脱离子集就是缩点图中的汇点分量。
+相反方向的阻挡图恰好是反向图，强连通分量相同，所以每条坐标轴只需计算一次强连通分量。
+整体复杂度为O(总格子数)，不需要枚举子集。
+"""
+
+from .integrity import build_contact_graph
+
+# 每条坐标轴：(正方向索引, 反方向索引)，索引含义见integrity.DIRECTIONS
+AXES = [
+    (0, 2),  # 上、下
+    (1, 3),  # 右、左
+]
+
+# 计算有向图的强连通分量（迭代版Tarjan算法，避免递归深度限制）
+# graph[i]为节点i的后继集合
+# 返回 (分量列表, 每个节点所属分量的编号)
+def strongly_connected_components(graph):
+    node_count = len(graph)
+    index_of = [-1] * node_count
+    low_link = [0] * node_count
+    on_stack = [False] * node_count
+    component_of = [-1] * node_count
+    components = []
+    stack = []
+    next_index = 0
+    
+    for root in range(node_count):
+        if index_of[root] != -1:
+            continue
+        
+        # 用显式栈模拟递归，每一帧为 (节点, 后继迭代器)
+        index_of[root] = low_link[root] = next_index
+        next_index += 1
+        stack.append(root)
+        on_stack[root] = True
+        call_stack = [(root, iter(graph[root]))]
+        
+        while call_stack:
+            node, successors = call_stack[-1]
+            advanced = False
+            for successor in successors:
+                if index_of[successor] == -1:
+                    index_of[successor] = low_link[successor] = next_index
+                    next_index += 1
+                    stack.append(successor)
+                    on_stack[successor] = True
+                    call_stack.append((successor, iter(graph[successor])))
+                    advanced = True
+                    break
+                elif on_stack[successor] and index_of[successor] < low_link[node]:
+                    low_link[node] = index_of[successor]
+            if advanced:
+                continue
+            
+            # 节点的所有后继都已处理完
+            call_stack.pop()
+            if call_stack:
+                parent = call_stack[-1][0]
+                if low_link[node] < low_link[parent]:
+                    low_link[parent] = low_link[node]
+            
+            if low_link[node] == index_of[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    component_of[member] = len(components)
+                    component.append(member)
+                    if member == node:
+                        break
+                components.append(component)
+    
+    return components, component_of
+
+# 在推动关系图上求每个方向最小的可脱离子集
+# graph为build_contact_graph的结果，返回长度为4的列表，按方向索引排列，
+# 每项为该方向上可以整体平移脱离的最小拼图块索引列表（升序），该方向不能脱离时为None
+# 同样大小的子集取最小索引较小的一个，结果不受推动关系集合遍历顺序的影响
+# labels[i]为节点i对应的拼图块索引（节点编号与拼图块索引不同时使用，如IntegrityMonitor），结果与比较都按它进行
+def separable_subsets(graph, labels=None):
+    best = [None] * len(graph)
+    for forward, backward in AXES:
+        push = graph[forward]
+        components, component_of = strongly_connected_components(push)
+        if len(components) == 1:
+            continue
+        
+        # 缩点图中没有出边的分量可沿正方向脱离，没有入边的分量可沿反方向脱离
+        has_out = [False] * len(components)
+        has_in = [False] * len(components)
+        for i, pushed in enumerate(push):
+            source = component_of[i]
+            for j in pushed:
+                target = component_of[j]
+                if target != source:
+                    has_out[source] = True
+                    has_in[target] = True
+        
+        for c, component in enumerate(components):
+            if labels is not None:
+                component = [labels[i] for i in component]
+            for direction, free in ((forward, not has_out[c]), (backward, not has_in[c])):
+                if free and (best[direction] is None
+                             or (len(component), min(component)) < (len(best[direction]), min(best[direction]))):
+                    best[direction] = component
+    
+    return [sorted(component) if component is not None else None for component in best]
+
+# 各方向的可脱离子集中最小的一个（长度相同时取方向索引小的）
+# 返回 {'direction': 方向索引, 'pieces': 拼图块索引列表}，都不能脱离时返回None
+def smallest_separable(subsets):
+    best = None
+    for direction, pieces in enumerate(subsets):
+        if pieces is not None and (best is None or len(pieces) < len(best['pieces'])):
+            best = {'direction': direction, 'pieces': pieces}
+    return best
+
+# 找出可以整体平移脱离的拼图块子集
+# 返回 {'direction': 方向索引, 'pieces': 拼图块索引列表}，结构完全互锁时返回None
+# 返回的是所有方向中最小的可脱离子集，方便高亮显示
+def find_separable_subset(pieces_cells, cell_owner=None, boundaries=None):
+    if len(pieces_cells) <= 1:
+        return None
+    
+    graph = build_contact_graph(pieces_cells, cell_owner, boundaries)
+    return smallest_separable(separable_subsets(graph))
+
+# 检查拼图结构是否完全互锁（没有任何真子集可以平移脱离）
+def is_interlocked(pieces_cells, cell_owner=None, boundaries=None):
+    return find_separable_subset(pieces_cells, cell_owner, boundaries) is None
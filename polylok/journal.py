@@ -0,0 +1,347 @@
+# -*- coding:utf-8 -*-
+
+"""
+崩溃安全的编辑日志
+
+每次提交到撤销历史的记录（填色、清除、创建、删除、移动、整组移动、旋转翻转，见polylok.history）以及每次撤销、重做，
+都追加一行JSON到日志文件。写入经过缓冲，每隔SYNC_INTERVAL秒flush并fsync一次，
+所以窗口意外关闭或程序崩溃时最多丢失这段时间内的编辑。
+
+日志文件的第一行是盘面快照（二进制解答格式的base64，见polylok.solution），之后每行一条编辑：
+    ["snapshot", "<base64>"]
+    ["record", <记录>]
+    ["undo", <记录>] / ["redo", <记录>]
+启动时读取快照，再依次执行后面的编辑即可恢复上次的盘面（连同这段时间的撤销历史）。
+撤销、重做也带上记录本身：撤销的可能是快照之前的操作，回放时的撤销历史里没有它。
+崩溃时最后一行可能只写了一半，回放到第一个无法解析的行为止。
+
+压缩：日志超过COMPACT_ENTRIES条时，把当前盘面写成新的快照，另起一个以快照开头的日志文件。
+界面线程只取一份盘面快照（见board.Board.snapshot），编码和写临时文件在后台线程完成，不会卡住帧循环；
+这期间的编辑照常追加到旧日志，同时记在内存里。后台写完后，下一次sync把这些编辑补写到新文件、fsync，
+再原子地替换旧文件，任何时刻崩溃都能得到完整的旧日志或新日志。
+清空、读取盘面时的快照（checkpoint）仍然同步写入：之后的编辑必须接在这份快照后面。
+快照之前的撤销历史不会保存在日志里。
+"""
+
+import base64
+import json
+import os
+import threading
+import time
+from array import array
+
+from .board import Piece, decode_cell, encode_cell
+from .history import CELLS, CREATE, DELETE, MOVE, MOVE_GROUP, RESHAPE, BATCH
+from .solution import solution_from_bytes, solution_to_bytes
+
+JOURNAL_FILENAME = "journal.log"  # 日志文件名
+SYNC_INTERVAL = 1.0               # 两次fsync之间的最长间隔(秒)
+COMPACT_ENTRIES = 1000            # 日志超过这么多条编辑时压缩为快照
+
+# ---------- 记录的编码 ----------
+
+def _color(color):
+    return list(color) if color is not None else None
+
+def _tuple_color(color):
+    return tuple(color) if color is not None else None
+
+# 把撤销记录转换为可写入JSON的列表
+def encode_record(record):
+    kind = record[0]
+    if kind == CELLS:
+        _, positions, old_colors, new_colors = record
+        return [CELLS, [list(pos) for pos in positions], [_color(c) for c in old_colors], [_color(c) for c in new_colors]]
+    if kind == CREATE:
+        _, index, piece, piece_cells, colors_before, colors_after = record
+        return [CREATE, index, [list(pos) for pos in piece], _color(piece.color),
+                [[pos[0], pos[1], _color(color)] for pos, color in piece_cells],
+                [list(c) for c in colors_before], [list(c) for c in colors_after]]
+    if kind == DELETE:
+        _, index, piece = record
+        return [DELETE, index, [list(pos) for pos in piece], _color(piece.color)]
+    if kind == MOVE:
+        return list(record)
+    if kind == MOVE_GROUP:
+        _, indices, dx, dy = record
+        return [MOVE_GROUP, list(indices), dx, dy]
+    if kind == RESHAPE:
+        _, index, old_codes, new_codes = record
+        return [RESHAPE, index, [list(decode_cell(code)) for code in old_codes],
+                [list(decode_cell(code)) for code in new_codes]]
+    if kind == BATCH:
+        return [BATCH, [encode_record(sub_record) for sub_record in record[1]]]
+    raise ValueError(f"Unknown record kind: {kind!r}")
+
+# 把JSON列表还原为撤销记录
+# pieces为执行这条记录之前盘面上的拼图块列表，reverse表示记录将被反向执行（撤销）
+# 记录里的拼图块必须与盘面上的是同一个对象：之后的移动会平移盘面上的对象，
+# 撤销、重做时插回的也必须是这个对象。所以正向的DELETE、反向的CREATE直接取盘面上的拼图块，
+# 只有将要插入盘面的拼图块才按日志中的格子新建
+def decode_record(data, pieces, reverse=False):
+    kind = data[0]
+    if kind == CELLS:
+        _, positions, old_colors, new_colors = data
+        return (CELLS, tuple(tuple(pos) for pos in positions),
+                tuple(map(_tuple_color, old_colors)), tuple(map(_tuple_color, new_colors)))
+    if kind == CREATE:
+        _, index, cells, color, piece_cells, colors_before, colors_after = data
+        piece = pieces[index] if reverse else Piece([tuple(pos) for pos in cells], _tuple_color(color))
+        return (CREATE, index, piece,
+                tuple(((x, y), _tuple_color(c)) for x, y, c in piece_cells),
+                tuple(map(tuple, colors_before)), tuple(map(tuple, colors_after)))
+    if kind == DELETE:
+        _, index, cells, color = data
+        piece = Piece([tuple(pos) for pos in cells], _tuple_color(color)) if reverse else pieces[index]
+        return (DELETE, index, piece)
+    if kind == MOVE:
+        _, index, dx, dy = data
+        return (MOVE, index, dx, dy)
+    if kind == MOVE_GROUP:
+        _, indices, dx, dy = data
+        return (MOVE_GROUP, tuple(indices), dx, dy)
+    if kind == RESHAPE:
+        _, index, old_cells, new_cells = data
+        return (RESHAPE, index, array('q', sorted(encode_cell(x, y) for x, y in old_cells)),
+                array('q', sorted(encode_cell(x, y) for x, y in new_cells)))
+    if kind == BATCH:
+        # 子记录按执行顺序（反向时从后往前）模拟插入和删除，得到每条子记录执行前的拼图块列表
+        simulated = list(pieces)
+        records = []
+        for sub_data in (reversed(data[1]) if reverse else data[1]):
+            sub_record = decode_record(sub_data, simulated, reverse)
+            records.append(sub_record)
+            if sub_record[0] in (CREATE, DELETE):
+                # 正向的CREATE、反向的DELETE插入拼图块，其余情况移除
+                if (sub_record[0] == CREATE) != reverse:
+                    simulated.insert(sub_record[1], sub_record[2])
+                else:
+                    simulated.pop(sub_record[1])
+        if reverse:
+            records.reverse()
+        return (BATCH, tuple(records))
+    raise ValueError(f"Unknown record kind: {kind!r}")
+
+# ---------- 日志 ----------
+
+# 快照编码为日志的第一行
+def _snapshot_line(pieces, cells):
+    snapshot = base64.b64encode(solution_to_bytes(pieces, cells)).decode('ascii')
+    return json.dumps(['snapshot', snapshot]) + '\n'
+
+# 一次后台压缩：后台线程把快照写入临时文件，lines记下这期间追加到旧日志的编辑
+class _Compaction:
+    def __init__(self, temp_path, pieces, cells):
+        self.temp_path = temp_path
+        self.lines = []          # 快照之后追加的编辑（已编码的行）
+        self.error = None        # 后台写入失败时的异常
+        self.thread = threading.Thread(target=self._run, args=(pieces, cells), name="polylok-journal", daemon=True)
+        self.thread.start()
+    
+    def _run(self, pieces, cells):
+        try:
+            with open(self.temp_path, 'w', encoding='utf-8', newline='\n') as f:
+                f.write(_snapshot_line(pieces, cells))
+                f.flush()
+                os.fsync(f.fileno())
+        except (OSError, ValueError) as e:
+            self.error = e
+
+# 编辑日志：attach到盘面后，盘面的每次编辑都会写入日志
+class Journal:
+    def __init__(self, path):
+        self.path = path
+        self.board = None
+        self.error = None        # 写入失败时的异常，之后不再写日志
+        self.entries = 0         # 快照之后的编辑条数
+        self._file = None
+        self._dirty = False      # 有尚未fsync的写入
+        self._last_sync = time.monotonic()
+        self._compaction = None  # 进行中的后台压缩
+    
+    # 开始记录盘面的编辑：立即把当前盘面写成快照
+    def attach(self, board):
+        self.board = board
+        board.journal = self
+        self.checkpoint()
+    
+    def write_record(self, record):
+        self._write(['record', encode_record(record)])
+    
+    def write_undo(self, record):
+        self._write(['undo', encode_record(record)])
+    
+    def write_redo(self, record):
+        self._write(['redo', encode_record(record)])
+    
+    def _write(self, entry):
+        if self._file is None:
+            return
+        line = json.dumps(entry, separators=(',', ':')) + '\n'
+        try:
+            self._file.write(line)
+        except (OSError, ValueError) as e:
+            self._fail(e)
+            return
+        if self._compaction is not None:
+            self._compaction.lines.append(line)
+        self.entries += 1
+        self._dirty = True
+    
+    # 定期调用（例如每帧）：距上次fsync超过SYNC_INTERVAL时落盘，编辑过多时开始后台压缩，压缩写完时换用新文件
+    # 压缩不在写入记录时开始，因为那时盘面可能还在修改中（记录先于修改写入的情况）
+    def sync(self, force=False):
+        if self._file is None:
+            return
+        self._finish_compaction(wait=force)
+        if self._file is None:
+            return
+        if self._compaction is None and self.entries >= COMPACT_ENTRIES:
+            pieces, cells = self.board.snapshot()
+            self._compaction = _Compaction(f"{self.path}.compact.tmp", pieces, cells)
+        if self._dirty and (force or time.monotonic() - self._last_sync >= SYNC_INTERVAL):
+            try:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            except (OSError, ValueError) as e:
+                self._fail(e)
+                return
+            self._dirty = False
+            self._last_sync = time.monotonic()
+    
+    # 后台压缩写完快照时：补写这期间的编辑，fsync后原子地替换旧日志，之后追加到新文件
+    # wait为False且后台还没写完时直接返回
+    def _finish_compaction(self, wait=False):
+        compaction = self._compaction
+        if compaction is None or (compaction.thread.is_alive() and not wait):
+            return
+        compaction.thread.join()
+        self._compaction = None
+        if compaction.error is not None:
+            self._remove_temp(compaction.temp_path)
+            self._fail(compaction.error)
+            return
+        try:
+            new_file = open(compaction.temp_path, 'a', encoding='utf-8', newline='\n')
+            try:
+                new_file.writelines(compaction.lines)
+                new_file.flush()
+                os.fsync(new_file.fileno())
+                os.replace(compaction.temp_path, self.path)
+            except BaseException:
+                new_file.close()
+                raise
+        except OSError as e:
+            self._remove_temp(compaction.temp_path)
+            self._fail(e)
+            return
+        self._file.close()
+        self._file = new_file
+        self.entries = len(compaction.lines)
+        self._dirty = False
+        self._last_sync = time.monotonic()
+    
+    # 放弃进行中的后台压缩（之后会同步写入更新的快照）
+    def _cancel_compaction(self):
+        compaction = self._compaction
+        if compaction is not None:
+            compaction.thread.join()
+            self._compaction = None
+            self._remove_temp(compaction.temp_path)
+    
+    @staticmethod
+    def _remove_temp(temp_path):
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+    
+    # 同步写入快照：用当前盘面的快照开始一个新的日志文件，原子地替换旧文件
+    def checkpoint(self):
+        if self.board is None or self.error is not None:
+            return
+        self._cancel_compaction()
+        pieces, cells = self.board.snapshot()
+        temp_path = f"{self.path}.tmp"
+        try:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(temp_path, 'w', encoding='utf-8', newline='\n') as f:
+                f.write(_snapshot_line(pieces, cells))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+            self._file = open(self.path, 'a', encoding='utf-8', newline='\n')
+        except OSError as e:
+            self._fail(e)
+            return
+        self.entries = 0
+        self._dirty = False
+        self._last_sync = time.monotonic()
+    
+    # 等进行中的后台压缩写完，落盘并关闭（退出程序前调用）
+    def close(self):
+        self.sync(force=True)
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self.board is not None and self.board.journal is self:
+            self.board.journal = None
+    
+    def _fail(self, error):
+        self.error = error
+        self._cancel_compaction()
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+
+# 从日志恢复盘面：读取快照并回放之后的编辑，返回回放的编辑条数
+# 日志不存在或快照无法读取时返回None，盘面保持不变
+def replay(path, board):
+    try:
+        with open(path, 'r', encoding='utf-8', newline='\n') as f:
+            lines = f.read().split('\n')
+    except (OSError, UnicodeDecodeError):
+        return None
+    
+    try:
+        kind, snapshot = json.loads(lines[0])
+        if kind != 'snapshot':
+            return None
+        solution = solution_from_bytes(base64.b64decode(snapshot))
+    except (ValueError, TypeError):
+        return None
+    
+    # 回放期间不写日志
+    journal, board.journal = board.journal, None
+    try:
+        board.load(solution['pieces'], solution['cells'], solution['cell_owner'])
+        replayed = 0
+        for line in lines[1:]:
+            try:
+                kind, record = json.loads(line)
+                if kind == 'record':
+                    board.apply_record(decode_record(record, board.pieces))
+                elif kind == 'undo':
+                    # 撤销历史里没有这条记录（快照之前的操作）时直接反向执行
+                    if not board.undo():
+                        board.apply_record(decode_record(record, board.pieces, reverse=True), reverse=True)
+                elif kind == 'redo':
+                    if not board.redo():
+                        board.apply_record(decode_record(record, board.pieces))
+                else:
+                    break
+            except (ValueError, TypeError, IndexError, KeyError):
+                # 最后一行可能只写了一半
+                break
+            replayed += 1
+    finally:
+        board.journal = journal
+    return replayed
@@ -0,0 +1,124 @@
+# -*- coding:utf-8 -*-
+
+"""
+无界面批量判定解答文件
+
+判定规则与游戏中按下 Complete 时一致：忽略未组成拼图块的格子，检查结构完整性，通过时计算分数
+"""
+
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .integrity import DIRECTION_TEXTS, build_cell_owner
+from .interlock import find_separable_subset
+from .scoring import calculate_score
+from .solution import SOLUTION_EXTENSIONS, load_solution
+
+# 输出表格的列
+RESULT_FIELDS = [
+    'file', 'status', 'score', 'pieces', 'cells', 'max_piece_size',
+    'direction', 'free_pieces', 'reason', 'load_ms', 'judge_ms', 'total_ms',
+]
+
+# 判定一组拼图块，返回判定结果字典
+# cell_owner为已经建立的占用索引（如load_solution的结果中的），没有时现建
+def judge_pieces(pieces_cells, cell_owner=None):
+    result = {
+        'pieces': len(pieces_cells),
+        'cells': sum(len(piece_cells) for piece_cells in pieces_cells),
+        'max_piece_size': max((len(piece_cells) for piece_cells in pieces_cells), default=0),
+        'direction': '',
+        'free_pieces': '',
+        'score': '',
+        'reason': '',
+    }
+    
+    if not pieces_cells:
+        result['status'] = 'fail'
+        result['reason'] = "No puzzle pieces to check"
+        return result
+    
+    if cell_owner is None:
+        cell_owner = build_cell_owner(pieces_cells)
+    separable = find_separable_subset(pieces_cells, cell_owner)
+    if separable is not None:
+        direction_text = DIRECTION_TEXTS[separable['direction']]
+        result['status'] = 'fail'
+        result['direction'] = direction_text
+        result['free_pieces'] = ' '.join(str(i) for i in separable['pieces'])
+        result['reason'] = f"Structure breaks when moving {direction_text}"
+        return result
+    
+    result['status'] = 'pass'
+    result['score'] = calculate_score(pieces_cells)
+    return result
+
+# 判定单个解答文件，附带各阶段耗时（毫秒）
+def judge_file(path):
+    start = time.perf_counter()
+    try:
+        solution = load_solution(path)
+    except (OSError, ValueError) as e:
+        elapsed = (time.perf_counter() - start) * 1000
+        result = {field: '' for field in RESULT_FIELDS}
+        result.update(file=path, status='error', reason=str(e), load_ms=round(elapsed, 3), total_ms=round(elapsed, 3))
+        return result
+    loaded = time.perf_counter()
+    
+    result = judge_pieces([piece['cells'] for piece in solution['pieces']], solution['cell_owner'])
+    judged = time.perf_counter()
+    
+    result['file'] = path
+    result['load_ms'] = round((loaded - start) * 1000, 3)
+    result['judge_ms'] = round((judged - loaded) * 1000, 3)
+    result['total_ms'] = round((judged - start) * 1000, 3)
+    return {field: result[field] for field in RESULT_FIELDS}
+
+# 展开命令行给出的路径：目录中的解答文件按文件名排序
+def find_solution_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith(SOLUTION_EXTENSIONS):
+                    files.append(os.path.join(path, name))
+        else:
+            files.append(path)
+    return files
+
+# 批量判定，jobs > 1 时使用进程池并行处理，结果顺序与输入一致
+def judge_files(files, jobs=None):
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    if jobs <= 1 or len(files) <= 1:
+        return [judge_file(path) for path in files]
+    
+    # 每个进程一次领取若干文件，减少进程间通信的开销
+    chunk_size = max(1, len(files) // (jobs * 4))
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(judge_file, files, chunksize=chunk_size))
+
+# 判定结果汇总
+def summarize(results, wall_ms):
+    return {
+        'files': len(results),
+        'passed': sum(1 for r in results if r['status'] == 'pass'),
+        'failed': sum(1 for r in results if r['status'] == 'fail'),
+        'errors': sum(1 for r in results if r['status'] == 'error'),
+        'wall_ms': round(wall_ms, 3),
+    }
+
+# 写出CSV格式的判定结果
+def write_csv(results, stream):
+    writer = csv.DictWriter(stream, fieldnames=RESULT_FIELDS, lineterminator='\n')
+    writer.writeheader()
+    for result in results:
+        writer.writerow({field: result.get(field, '') for field in RESULT_FIELDS})
+
+# 写出JSON格式的判定结果
+def write_json(results, stream, summary):
+    json.dump({'summary': summary, 'results': results}, stream, ensure_ascii=False, indent=2)
+    stream.write('\n')
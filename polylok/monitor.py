@@ -0,0 +1,195 @@
+# -*- coding:utf-8 -*-
+
+"""
+编辑时的实时完整性检测
+
+IntegrityMonitor维护盘面上拼图块之间的推动关系（右、下两个方向，左、上是它们的反向图），
+盘面变化后只重新计算变化的拼图块及与它相邻的拼图块之间的关系：
+    - 移除：删除、移动或旋转翻转前的拼图块的所有出边和入边
+    - 加入：按变化后的格子，用它的边界探测点查出它推动的拼图块，
+      再查它每个格子左侧、上侧的格子得到推动它的拼图块
+其余拼图块之间的关系不受影响，不需要逐格重新建立推动关系图。
+推动关系图的节点用监视器自己的编号，不随盘面上的拼图块索引变化：新建的拼图块追加一个节点，
+删除拼图块时把最后一个节点移到空出的编号上，图中只改写受影响的拼图块及其相邻拼图块那几行。
+求解时再按各节点对应的拼图块索引给出结果（见interlock.separable_subsets的labels）。
+之后在拼图块组成的图上求每个方向可以整体脱离的子集（见interlock.separable_subsets），
+这一步只与拼图块数量和接触关系数量有关，而且只在拼图块变化后做一次，不是每帧都做。
+check_integrity在同一张图上做integrity.check_integrity的可达性判定，不需要逐格建立推动关系图。
+
+拼图块以对象标识区分（与PlacementHeatmap相同）：移动、旋转翻转后编码数组整体替换，比较对象即可知道哪些拼图块变化了。
+"""
+
+from .integrity import count_reachable
+from .interlock import separable_subsets, smallest_separable
+
+# 盘面的实时完整性检测；每帧调用update，拼图块没有变化时立即返回
+class IntegrityMonitor:
+    def __init__(self, board):
+        self.board = board
+        self.version = 0                  # 结果每次变化时加一，界面据此判断缓存的绘制结果是否过期
+        self.subsets = [None] * 4         # 每个方向上可以整体脱离的最小拼图块索引列表，不能脱离时为None
+        self.result = None                # 所有方向中最小的可脱离子集 {'direction', 'pieces'}，见interlock.smallest_separable
+        self._piece_version = None        # 求可脱离子集时盘面的piece_version
+        self._graph_version = None        # 更新推动关系时盘面的piece_version
+        self._pieces = {}                 # 计算时的拼图块 {id(拼图块): (拼图块, 编码数组)}
+        self._push_right = {}             # {id(拼图块): 它向右移动时直接推动的拼图块id集合}
+        self._push_down = {}              # {id(拼图块): 它向下移动时直接推动的拼图块id集合}
+        self._pushed_right = {}           # 反向边：{id(拼图块): 向右移动时会推动它的拼图块id集合}
+        self._pushed_down = {}            # 反向边：{id(拼图块): 向下移动时会推动它的拼图块id集合}
+        self._slots = {}                  # {id(拼图块): 节点编号}
+        self._keys = []                   # 各节点对应的拼图块id
+        self._labels = []                 # 各节点对应的拼图块在盘面上的索引
+        self._graph = [[], [], [], []]    # 按节点编号的推动关系图 [上, 右, 下, 左]，见integrity.build_contact_graph
+        self._touched = set()             # 之后推动关系有变化的拼图块id
+    
+    # 各方向是否通过（没有可以沿该方向脱离的子集），顺序与integrity.DIRECTIONS相同
+    @property
+    def passed(self):
+        return [subset is None for subset in self.subsets]
+    
+    # 拼图块变化时增量更新推动关系并重新求可脱离子集，结果变化时返回True
+    def update(self):
+        graph = self.contact_graph()
+        if self.board.piece_version == self._piece_version:
+            return False
+        self._piece_version = self.board.piece_version
+        
+        subsets = separable_subsets(graph, self._labels) if len(graph[0]) > 1 else [None] * 4
+        if subsets == self.subsets:
+            return False
+        self.subsets = subsets
+        self.result = smallest_separable(subsets)
+        self.version += 1
+        return True
+    
+    # 与integrity.check_integrity相同的判定：返回第一个失败方向的索引，全部通过时返回None
+    # 推动关系已经增量维护，只需在拼图块组成的图上从第一块拼图出发做可达性搜索
+    def check_integrity(self):
+        graph = self.contact_graph()
+        piece_count = len(graph[0])
+        if piece_count <= 1:
+            return None
+        start = self._slots[id(self.board.pieces[0])]
+        for direction_index, push in enumerate(graph):
+            if count_reachable(push, start) < piece_count:
+                return direction_index
+        return None
+    
+    # 按节点编号的推动关系图 [上, 右, 下, 左]（格式同integrity.build_contact_graph，节点i对应索引为_labels[i]的拼图块），
+    # 拼图块变化时只重新计算变化的拼图块及与它相邻的拼图块；返回的图会被之后的更新原地修改
+    def contact_graph(self):
+        board = self.board
+        if board.piece_version == self._graph_version:
+            return self._graph
+        self._graph_version = board.piece_version
+        
+        current = {}
+        changed = []
+        for piece in board.pieces:
+            key = id(piece)
+            current[key] = (piece, piece.codes)
+            previous = self._pieces.get(key)
+            if previous is None or previous[1] is not piece.codes:
+                changed.append(piece)
+        removed = [key for key in self._pieces if key not in current]
+        # 先摘除所有变化的拼图块，再按新位置接回，两块同时变化时它们之间的关系也能正确建立
+        for key in removed:
+            self._detach(key)
+            self._remove_node(key)
+        for piece in changed:
+            self._detach(id(piece))
+        self._pieces = current
+        for piece in changed:
+            if id(piece) not in self._slots:
+                self._add_node(id(piece))
+            self._attach(piece)
+        
+        self._update_rows()
+        labels = self._labels = [0] * len(self._keys)
+        slots = self._slots
+        for i, piece in enumerate(board.pieces):
+            labels[slots[id(piece)]] = i
+        return self._graph
+    
+    # 删除拼图块的所有出边和入边
+    def _detach(self, key):
+        touched = self._touched
+        touched.add(key)
+        for push, pushed in ((self._push_right, self._pushed_right), (self._push_down, self._pushed_down)):
+            for other in push.pop(key, ()):
+                pushed[other].discard(key)
+                touched.add(other)
+            for other in pushed.pop(key, ()):
+                push[other].discard(key)
+                touched.add(other)
+    
+    # 按拼图块当前的格子建立它的出边和入边
+    def _attach(self, piece):
+        key = id(piece)
+        pieces = self.board.pieces
+        get_owner = self.board.cell_owner.get
+        touched = self._touched
+        touched.add(key)
+        right_probes, down_probes = piece.boundary
+        for push, pushed, probes in ((self._push_right, self._pushed_right, right_probes),
+                                     (self._push_down, self._pushed_down, down_probes)):
+            targets = push.setdefault(key, set())
+            for pos in probes:
+                owner = get_owner(pos)
+                if owner is not None:
+                    other = id(pieces[owner])
+                    targets.add(other)
+                    pushed.setdefault(other, set()).add(key)
+                    touched.add(other)
+        
+        # 左侧、上侧紧邻的其他拼图块向右、向下移动时会推动它
+        pushers_right = self._pushed_right.setdefault(key, set())
+        pushers_down = self._pushed_down.setdefault(key, set())
+        for x, y in piece:
+            owner = get_owner((x - 1, y))
+            if owner is not None and pieces[owner] is not piece:
+                other = id(pieces[owner])
+                pushers_right.add(other)
+                self._push_right.setdefault(other, set()).add(key)
+                touched.add(other)
+            owner = get_owner((x, y - 1))
+            if owner is not None and pieces[owner] is not piece:
+                other = id(pieces[owner])
+                pushers_down.add(other)
+                self._push_down.setdefault(other, set()).add(key)
+                touched.add(other)
+    
+    # 新建的拼图块：追加一个没有边的节点
+    def _add_node(self, key):
+        self._slots[key] = len(self._keys)
+        self._keys.append(key)
+        for rows in self._graph:
+            rows.append(set())
+    
+    # 删除的拼图块（已摘除所有边）：把最后一个节点移到它的编号上
+    # 指向最后一个节点的行要改用新编号，记为受影响，与其他变化一起在_update_rows中改写
+    def _remove_node(self, key):
+        slot = self._slots.pop(key)
+        last_key = self._keys.pop()
+        last_rows = [rows.pop() for rows in self._graph]
+        if last_key == key:
+            return
+        self._keys[slot] = last_key
+        self._slots[last_key] = slot
+        for rows, row in zip(self._graph, last_rows):
+            rows[slot] = row
+        touched = self._touched
+        for edges in (self._push_right, self._pushed_right, self._push_down, self._pushed_down):
+            touched.update(edges.get(last_key, ()))
+    
+    # 改写受影响的拼图块在图中的那几行
+    def _update_rows(self):
+        slots = self._slots
+        # 与图中各方向对应的按id的推动关系
+        edges = (self._pushed_down, self._push_right, self._push_down, self._pushed_right)
+        for key in self._touched:
+            slot = slots.get(key)
+            if slot is not None:
+                for rows, push in zip(self._graph, edges):
+                    rows[slot] = {slots[other] for other in push.get(key, ())}
+        self._touched = set()
@@ -0,0 +1,284 @@
+# -*- coding:utf-8 -*-
+
+"""
+拖动预览的放置缓存
+
+拖动拼图块（或选中的一组拼图块）时，每一帧都要知道它平移(dx, dy)后能否放下，以及平移后的格子（用于绘制预览）。
+同一次拖动期间盘面不变，所以：
+    - "禁止偏移"集合：组外的拼图块与填色格子减去被拖动格子的闵可夫斯基差
+      { o - p : o 为已占用格子, p 为被拖动的格子 }，偏移在集合里就会重叠
+    - 每个偏移的检测结果和平移后的拼图块按偏移缓存，鼠标在同一格内移动时直接复用
+拖动中旋转、翻转单块拼图块时，按旋转翻转后的格子（见Piece.oriented_cells）建立同样的缓存。
+
+禁止偏移集合按竖直偏移dy逐行建立：第一次用到某个dy时，从盘面的位棋盘（见Board.bitboard）取出组外占用格子的各行，
+按被拖动的每个格子p左移后相或，得到这一行所有禁止的dx（一个大整数），耗时只与被拖动的格子数有关。
+拖动时鼠标只经过少数几行，不需要预先算出整个集合（大盘面上约 被拖动的格子数 × 已占用格子数 个偏移）；
+之后同一行的每次检测只是一次移位和按位与。
+
+PlacementHeatmap一次算出选中拼图块在一个矩形区域（如当前视口）内所有可以放下的位置，
+用选中格子组成的形状与占用格子做互相关：位置a的冲突数 = 形状中满足 a + p 已被占用的格子p的个数，冲突数为0即可以放置。
+之后其他拼图块移动、增删或填色格子变化时，只对变化的格子更新冲突数，不重新计算整个区域。
+安装了NumPy时用数组运算，否则用纯Python计数（结果相同，大区域时较慢）。
+"""
+
+from .board import COORD_BIAS, COORD_SPAN, Piece, decode_cell
+
+try:
+    import numpy as np
+except ImportError:  # NumPy是可选依赖
+    np = None
+
+MEMO_LIMIT = 4096  # 按偏移缓存的最多条数，超过时清空重新缓存
+
+# 一次拖动的放置缓存；盘面变化（拼图块或填色格子改变）后自动重新建立
+# piece_indices为一起拖动的拼图块索引；symmetry不为0时拖动的是按SYMMETRIES[symmetry]旋转翻转后的单块拼图块
+class PlacementCache:
+    def __init__(self, board, piece_indices, symmetry=0):
+        self.board = board
+        self.piece_indices = tuple(piece_indices)
+        self.symmetry = symmetry
+        if symmetry and len(self.piece_indices) != 1:
+            raise ValueError("Only a single piece can be rotated or flipped")
+        self._version = None    # 建立缓存时盘面的 (piece_version, cells_version)
+        self.forbidden = {}     # 已建立的禁止偏移行 {dy: (base, 位)}，第 dx - base 位为1时不能放置
+        self._pieces = ()       # 拖动的拼图块（旋转翻转时为变换后的副本）
+        self._rows = {}         # 被拖动的格子按行分组 {py: [px, ...]}
+        self._obstacles = {}    # 位棋盘上组外的占用位 {y: (x0, 位)}，见BitBoard.mask
+        self._memo = {}         # {(dx, dy): (能否放置, 平移后的拼图块元组)}
+    
+    # 盘面变化时清空已建立的禁止偏移行和按偏移的缓存
+    def _refresh(self):
+        board = self.board
+        version = (board.piece_version, board.cells_version)
+        if version == self._version:
+            return
+        self._version = version
+        self._memo = {}
+        self.forbidden = {}
+        
+        if self.symmetry:
+            piece = board.pieces[self.piece_indices[0]]
+            self._pieces = (Piece(piece.oriented_cells(self.symmetry), piece.color),)
+        else:
+            self._pieces = tuple(board.pieces[index] for index in self.piece_indices)
+        
+        # 组外的占用位与Board.can_place_pieces使用同一个键，位棋盘上的缓存可以共用
+        bitboard = board.bitboard()
+        indices = tuple(sorted(set(self.piece_indices)))
+        key = indices[0] if len(indices) == 1 else indices
+        self._obstacles = bitboard.split(key, [pos for index in indices for pos in board.pieces[index]])[1]
+        
+        rows = {}
+        for piece in self._pieces:
+            for px, py in piece.cells:
+                rows.setdefault(py, []).append(px)
+        self._rows = rows
+    
+    # 竖直偏移为dy时所有禁止的dx的位 (base, 位)（第一次用到时建立）
+    # 只取被拖动的格子平移dy后所在的那几行障碍：行的第k位（格子x0 + k）挡住格子px的偏移 dx = x0 + k - px
+    def _forbidden_row(self, dy):
+        row = self.forbidden.get(dy)
+        if row is None:
+            parts = []
+            for py, pxs in self._rows.items():
+                obstacles = self._obstacles.get(py + dy)
+                if obstacles is not None:
+                    x0, bits = obstacles
+                    parts.extend((x0 - px, bits) for px in pxs)
+            base = min((start for start, bits in parts), default=0)
+            bits = 0
+            for start, part in parts:
+                bits |= part << (start - base)
+            row = self.forbidden[dy] = (base, bits)
+        return row
+    
+    # 平移(dx, dy)后是否与组外的拼图块或填色格子重叠（不经过按偏移的缓存）
+    def is_forbidden(self, dx, dy):
+        self._refresh()
+        base, bits = self._forbidden_row(dy)
+        bit = dx - base
+        return bit >= 0 and (bits >> bit) & 1 == 1
+    
+    # 平移(dx, dy)后能否放置
+    def can_place(self, dx, dy):
+        return self.lookup(dx, dy)[0]
+    
+    # 平移(dx, dy)后能否放置，以及平移后的拼图块元组（副本，沿用已缓存的轮廓）
+    def lookup(self, dx, dy):
+        self._refresh()
+        offset = (dx, dy)
+        entry = self._memo.get(offset)
+        if entry is None:
+            can_place = not self.is_forbidden(dx, dy)
+            moved = tuple(piece.copy() for piece in self._pieces)
+            for piece in moved:
+                piece.move(dx, dy)
+            if len(self._memo) >= MEMO_LIMIT:
+                self._memo.clear()
+            entry = self._memo[offset] = (can_place, moved)
+        return entry
+
+# 选中拼图块在矩形区域内的可放置位置图
+# 位置指选中格子中按先行后列排序的第一个格子（单块时即Piece.anchor）平移后所在的格子
+class PlacementHeatmap:
+    def __init__(self, board):
+        self.board = board
+        self.version = 0            # 结果每次变化时加一，界面据此判断缓存的绘制结果是否过期
+        self.region = None          # 当前区域 (x0, y0, width, height)
+        self._selection = ()        # 计算时选中的拼图块
+        self._layout = None         # 计算时它们的形状与相对位置，见_layout_key
+        self._offsets = ()          # 形状中各格子相对第一个格子的偏移 [(px, py), ...]
+        self._extent = None         # 会影响区域内位置的占用格子所在的范围 (ex0, ey0, ex1, ey1)
+        self._board_version = None  # 计算时盘面的 (piece_version, cells_version)
+        self._pieces = {}           # 计算时其他拼图块的格子 {id(拼图块): (拼图块, 编码数组)}
+        self._loose = set()         # 计算时的填色格子
+        self._hits = None           # 各位置的冲突数（NumPy数组或列表，按行优先）
+        self._mask = b''            # 各位置能否放置，每个位置一个字节（1为可以放置），按行优先
+    
+    # 计算选中拼图块（一块或一组）在区域 [x0, x1] × [y0, y1] 内的可放置位置，
+    # 返回按行优先的字节串，每个位置一个字节，1为可以放置
+    # 选中的拼图块、它们的形状与相对位置以及区域不变时，只按盘面的变化增量更新
+    def update(self, piece_indices, x0, y0, x1, y1):
+        board = self.board
+        selection = tuple(board.pieces[index] for index in piece_indices)
+        region = (x0, y0, x1 - x0 + 1, y1 - y0 + 1)
+        board_version = (board.piece_version, board.cells_version)
+        
+        if (len(selection) != len(self._selection) or any(a is not b for a, b in zip(selection, self._selection))
+                or self._layout_key(selection) != self._layout or region != self.region):
+            self._rebuild(selection, region)
+        elif board_version != self._board_version:
+            if not self._update_changes(selection):
+                self._board_version = board_version
+                return self._mask
+        else:
+            return self._mask
+        
+        self._board_version = board_version
+        if np is not None:
+            self._mask = (self._hits == 0).astype(np.uint8).tobytes()
+        else:
+            self._mask = bytes([hits == 0 for hits in self._hits])
+        self.version += 1
+        return self._mask
+    
+    # 一组拼图块的形状与相对位置：各块的形状键与包围盒左上角相对组内第一个格子的位置
+    @staticmethod
+    def _layout_key(selection):
+        anchor_x, anchor_y = decode_cell(min(piece.codes[0] for piece in selection))
+        return tuple((piece.shape_key, piece.bbox[0] - anchor_x, piece.bbox[1] - anchor_y) for piece in selection)
+    
+    # 选中的拼图块、形状或区域变化：重新计算整个区域
+    def _rebuild(self, selection, region):
+        self._selection = selection
+        self._layout = self._layout_key(selection)
+        self.region = region
+        anchor_x, anchor_y = decode_cell(min(piece.codes[0] for piece in selection))
+        self._offsets = [(x - anchor_x, y - anchor_y) for piece in selection for x, y in piece]
+        x0, y0, width, height = region
+        offsets_x = [px for px, py in self._offsets]
+        offsets_y = [py for px, py in self._offsets]
+        self._extent = (x0 + min(offsets_x), y0 + min(offsets_y),
+                        x0 + width - 1 + max(offsets_x), y0 + height - 1 + max(offsets_y))
+        selected = set(map(id, selection))
+        self._pieces = {id(other): (other, other.codes) for other in self.board.pieces if id(other) not in selected}
+        self._loose = set(self.board.cells)
+        
+        codes = [entry[1] for entry in self._pieces.values()]
+        if np is None:
+            self._hits = [0] * (width * height)
+            self._add_codes(codes, 1)
+            self._add_cells(self._loose, 1)
+            return
+        
+        # 互相关：把扩展区域的占用网格按形状中的每个偏移平移后相加
+        xs, ys = self._coords(codes, self._loose)
+        ex0, ey0, ex1, ey1 = self._extent
+        keep = (xs >= ex0) & (xs <= ex1) & (ys >= ey0) & (ys <= ey1)
+        occupied = np.zeros((ey1 - ey0 + 1, ex1 - ex0 + 1), dtype=np.int32)
+        occupied[ys[keep] - ey0, xs[keep] - ex0] = 1
+        hits = np.zeros((height, width), dtype=np.int32)
+        for px, py in self._offsets:
+            left = x0 + px - ex0
+            top = y0 + py - ey0
+            hits += occupied[top:top + height, left:left + width]
+        self._hits = hits
+    
+    # 盘面变化：找出新增和移除的占用格子，只更新受它们影响的位置；没有影响时返回False
+    def _update_changes(self, selection):
+        added, removed = [], []
+        current = {}
+        selected = set(map(id, selection))
+        for other in self.board.pieces:
+            key = id(other)
+            if key in selected:
+                continue
+            current[key] = (other, other.codes)
+            previous = self._pieces.get(key)
+            if previous is None:
+                added.append(other.codes)
+            elif previous[1] is not other.codes:
+                # 移动后编码数组整体替换，比较对象即可
+                removed.append(previous[1])
+                added.append(other.codes)
+        for key, (other, codes) in self._pieces.items():
+            if key not in current:
+                removed.append(codes)
+        self._pieces = current
+        
+        loose = set(self.board.cells)
+        added_cells = loose - self._loose
+        removed_cells = self._loose - loose
+        self._loose = loose
+        
+        if not (added or removed or added_cells or removed_cells):
+            return False
+        self._add_codes(removed, -1)
+        self._add_cells(removed_cells, -1)
+        self._add_codes(added, 1)
+        self._add_cells(added_cells, 1)
+        return True
+    
+    # 格子编码数组与格子集合转换为坐标数组
+    def _coords(self, codes, cells):
+        parts = [np.frombuffer(piece_codes, dtype=np.int64) for piece_codes in codes]
+        all_codes = np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+        cells = np.array(list(cells), dtype=np.int64).reshape(-1, 2)
+        xs = np.concatenate((all_codes % COORD_SPAN - COORD_BIAS, cells[:, 0]))
+        ys = np.concatenate((all_codes // COORD_SPAN - COORD_BIAS, cells[:, 1]))
+        return xs, ys
+    
+    def _add_codes(self, codes, delta):
+        if np is not None:
+            self._add_coords(*self._coords(codes, ()), delta)
+        else:
+            for piece_codes in codes:
+                self._add_cells(map(decode_cell, piece_codes), delta)
+    
+    # 占用格子c使所有 c - p 位置的冲突数增加delta（p为形状中的偏移）
+    def _add_cells(self, cells, delta):
+        if np is not None:
+            if cells:
+                xs, ys = self._coords((), cells)
+                self._add_coords(xs, ys, delta)
+            return
+        x0, y0, width, height = self.region
+        hits = self._hits
+        offsets = self._offsets
+        for x, y in cells:
+            for px, py in offsets:
+                ax = x - px - x0
+                ay = y - py - y0
+                if 0 <= ax < width and 0 <= ay < height:
+                    hits[ay * width + ax] += delta
+    
+    def _add_coords(self, xs, ys, delta):
+        ex0, ey0, ex1, ey1 = self._extent
+        keep = (xs >= ex0) & (xs <= ex1) & (ys >= ey0) & (ys <= ey1)
+        xs, ys = xs[keep], ys[keep]
+        x0, y0, width, height = self.region
+        offsets = np.array(self._offsets, dtype=np.int64)
+        ax = (xs[:, None] - offsets[None, :, 0] - x0).ravel()
+        ay = (ys[:, None] - offsets[None, :, 1] - y0).ravel()
+        keep = (ax >= 0) & (ax < width) & (ay >= 0) & (ay < height)
+        np.add.at(self._hits, (ay[keep], ax[keep]), delta)
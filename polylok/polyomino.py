@@ -0,0 +1,176 @@
+# -*- coding:utf-8 -*-
+
+"""
+多联骨牌的枚举与规范形式
+
+形状用 (x, y) 元组表示，按行优先（先y后x）排序，并平移到最小x、最小y均为0。
+    - 固定多联骨牌：只允许平移，旋转、翻转后不同的形状算作不同的形状
+    - 自由多联骨牌：旋转、翻转后相同的形状算作同一个，用规范形式（8种朝向中最小的一个）表示
+
+固定多联骨牌用Redelmeier算法枚举：每个形状恰好生成一次，不需要用集合去重。
+枚举出的自由多联骨牌保存在磁盘缓存里（$XDG_CACHE_HOME/polylok 或 ~/.cache/polylok），
+之后的运行直接读取，形状查找、对称去重和搜索的形状表都不需要重新枚举。
+"""
+
+import json
+import os
+
+CACHE_FORMAT = "polylok-polyominoes"  # 缓存文件格式标识
+CACHE_VERSION = 1                     # 缓存文件格式版本，规范形式的定义改变时需要增加
+CACHE_FILENAME = "polyominoes.json"
+MAX_LOOKUP_SIZE = 10                  # shape_id查找的最大格子数（10格的自由多联骨牌有4655种，更大时枚举太慢）
+
+# 二维的8种对称变换（旋转与翻转），第一个为恒等变换
+# 屏幕坐标的y轴向下，第二个为顺时针旋转90°，第四个为逆时针旋转90°，第五个为左右翻转，第七个为上下翻转
+SYMMETRIES = [
+    lambda x, y: (x, y),
+    lambda x, y: (-y, x),
+    lambda x, y: (-x, -y),
+    lambda x, y: (y, -x),
+    lambda x, y: (-x, y),
+    lambda x, y: (y, x),
+    lambda x, y: (x, -y),
+    lambda x, y: (-y, -x),
+]
+
+_free_cache = {}  # 已读取或枚举的自由多联骨牌：{格子数: [规范形式, ...]}
+_shape_ids = {}   # 规范形式 -> (格子数, 在该尺寸列表中的序号)
+
+# 平移到最小x、最小y均为0，并按行优先排序
+def normalize(cells):
+    min_x = min(x for x, y in cells)
+    min_y = min(y for x, y in cells)
+    return tuple(sorted(((x - min_x, y - min_y) for x, y in cells), key=lambda pos: (pos[1], pos[0])))
+
+# 形状的所有不同朝向（最多8个），每个都已规范化
+def orientations(cells):
+    result = []
+    for transform in SYMMETRIES:
+        shape = normalize([transform(x, y) for x, y in cells])
+        if shape not in result:
+            result.append(shape)
+    return result
+
+# 形状在8种对称变换下的朝向，按SYMMETRIES的顺序，每个都已规范化（可能有重复）
+def orientation_table(cells):
+    return tuple(normalize([transform(x, y) for x, y in cells]) for transform in SYMMETRIES)
+
+# 先做first再做second两个对称变换，等价于哪一个变换（SYMMETRIES中的序号）
+# (1, 2)在8种变换下的像互不相同，用它即可识别
+def compose_symmetries(first, second):
+    image = SYMMETRIES[second](*SYMMETRIES[first](1, 2))
+    return next(i for i, transform in enumerate(SYMMETRIES) if transform(1, 2) == image)
+
+# 规范形式：旋转、翻转、平移后相同的形状规范形式相同
+def canonical_form(cells):
+    return min(normalize([transform(x, y) for x, y in cells]) for transform in SYMMETRIES)
+
+# 用Redelmeier算法枚举不超过max_size个格子的所有固定多联骨牌
+# 逐个产出形状的格子列表（产出后会被修改，需要保存时请复制）
+# 只在 y > 0 或 (y == 0 且 x >= 0) 的半平面里生长，(0, 0) 是每个形状的行优先第一个格子
+def enumerate_fixed(max_size):
+    if max_size < 1:
+        return
+    polyomino = []
+    reached = {(0, 0)}  # 已经加入过候选的格子（包括形状本身），同一分支里不再重复加入
+    
+    # untried为当前可以加入的候选格子，弹出一个加入后，剩下的候选与它带来的新候选进入下一层
+    def grow(untried):
+        while untried:
+            cell = untried.pop()
+            polyomino.append(cell)
+            yield polyomino
+            if len(polyomino) < max_size:
+                x, y = cell
+                new = [
+                    (nx, ny) for nx, ny in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1))
+                    if (ny > 0 or (ny == 0 and nx >= 0)) and (nx, ny) not in reached
+                ]
+                reached.update(new)
+                yield from grow(untried + new)
+                reached.difference_update(new)
+            polyomino.pop()
+    
+    yield from grow([(0, 0)])
+
+# 直接枚举（不读取缓存）不超过max_size个格子的自由多联骨牌：{格子数: [规范形式, ...]}
+def enumerate_free(max_size):
+    shapes = {size: set() for size in range(1, max_size + 1)}
+    for polyomino in enumerate_fixed(max_size):
+        shapes[len(polyomino)].add(canonical_form(polyomino))
+    return {size: sorted(forms) for size, forms in shapes.items()}
+
+# 缓存文件的路径
+def cache_path():
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'polylok', CACHE_FILENAME)
+
+# 读取缓存，文件不存在或格式不对时返回None
+def _load_cache(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get('format') != CACHE_FORMAT or data.get('version') != CACHE_VERSION:
+        return None
+    try:
+        return {int(size): [tuple(tuple(pos) for pos in shape) for shape in shapes]
+                for size, shapes in data['shapes'].items()}
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return None
+
+# 写入缓存：先写临时文件再替换，避免并发运行时读到写了一半的文件；目录不可写时忽略
+def _save_cache(path, shapes):
+    data = {
+        'format': CACHE_FORMAT,
+        'version': CACHE_VERSION,
+        'shapes': {str(size): [[list(pos) for pos in shape] for shape in forms] for size, forms in shapes.items()},
+    }
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(temp_path, path)
+    except OSError:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+
+# 不超过max_size个格子的自由多联骨牌：{格子数: [规范形式, ...]}
+# 依次查找内存、磁盘缓存，都没有时枚举并写回缓存；use_cache为False时不读写磁盘
+def free_polyominoes(max_size, use_cache=True):
+    if all(size in _free_cache for size in range(1, max_size + 1)):
+        return {size: _free_cache[size] for size in range(1, max_size + 1)}
+    
+    shapes = _load_cache(cache_path()) if use_cache else None
+    if shapes is None or any(size not in shapes for size in range(1, max_size + 1)):
+        shapes = enumerate_free(max_size)
+        if use_cache:
+            _save_cache(cache_path(), shapes)
+    
+    for size, forms in shapes.items():
+        if size not in _free_cache:
+            _free_cache[size] = forms
+            for index, form in enumerate(forms):
+                _shape_ids[form] = (size, index)
+    return {size: _free_cache[size] for size in range(1, max_size + 1)}
+
+# 不超过max_size个格子的固定多联骨牌（由自由多联骨牌展开所有朝向）：{格子数: [形状, ...]}
+def fixed_polyominoes(max_size, use_cache=True):
+    return {
+        size: sorted(shape for form in forms for shape in orientations(form))
+        for size, forms in free_polyominoes(max_size, use_cache).items()
+    }
+
+# 查找形状属于哪个自由多联骨牌，返回 (格子数, 序号)
+# 不连通或超过MAX_LOOKUP_SIZE个格子时返回None
+def shape_id(cells):
+    if len(cells) > MAX_LOOKUP_SIZE:
+        return None
+    form = canonical_form(cells)
+    if form not in _shape_ids:
+        free_polyominoes(len(form))
+    return _shape_ids.get(form)
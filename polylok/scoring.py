@@ -0,0 +1,63 @@
+# -*- coding:utf-8 -*-
+
+"""
+拼图结构的计分
+
+分数与拼图结构的优雅程度有关（最大拼图格子数、拼图总格子数、拼图块数、是否存在过于简单的结构）
+分数计算方法目前非常不严谨，有待进一步研究，可能需要涉及到更本质的数学
+"""
+
+# 检查是否有被完全包围的区域
+def has_enclosed_area(pieces_cells):
+    # 检查每一块拼图
+    for piece_cells in pieces_cells:
+        # 收集这块拼图占据的格子
+        piece_set = set(piece_cells)
+        
+        # 找出这块拼图的边界范围
+        min_x = min(x for x, y in piece_set)
+        max_x = max(x for x, y in piece_set)
+        min_y = min(y for x, y in piece_set)
+        max_y = max(y for x, y in piece_set)
+        
+        # 检查边界内的每个空格子
+        for x in range(min_x, max_x + 1):
+            for y in range(min_y, max_y + 1):
+                if (x, y) not in piece_set:  # 如果是空格子
+                    # 检查这个空格子的四个相邻位置是否都被当前拼图块占据
+                    neighbors = [(x+1, y), (x-1, y), (x, y+1), (x, y-1)]
+                    if all(neighbor in piece_set for neighbor in neighbors):
+                        return True
+    return False
+
+# 计算分数（pieces_cells为各拼图块的格子列表）
+def calculate_score(pieces_cells):
+    # 如果只有一块拼图，分数为0
+    if len(pieces_cells) == 1:
+        return 0
+    
+    # 检查是否有被完全包围的区域
+    if has_enclosed_area(pieces_cells):
+        return 50
+    
+    # 计算所需的数据
+    total_pieces = len(pieces_cells)
+    
+    # 计算最大块的格子数和总格子数
+    max_piece_grids = 0
+    total_grids = 0
+    for piece_cells in pieces_cells:
+        piece_size = len(piece_cells)
+        max_piece_grids = max(max_piece_grids, piece_size)
+        total_grids += piece_size
+    
+    # 根据最大块的大小使用不同的计分公式
+    if max_piece_grids <= 6:
+        score = 8900 * total_pieces * max_piece_grids / total_grids / total_grids
+    elif max_piece_grids == 7:
+        score = 4250 * total_pieces * max_piece_grids / total_grids / total_grids
+    else:
+        score = 540 / total_grids
+    
+    # 取整
+    return int(score)
@@ -0,0 +1,370 @@
+# -*- coding:utf-8 -*-
+
+"""
+互锁结构自动搜索
+
+在给定约束（最大拼图块格子数、拼图块数量、总格子数、包围盒大小）下，
+搜索能通过完整性判定的结构，并按calculate_score的分数从高到低报告。
+
+搜索方法：在宽为w、高不超过h的盒子里按行优先顺序逐格决定，
+每个格子要么留空，要么作为某个拼图块（固定朝向的多联骨牌）的第一个格子放下整块。
+剪枝：
+    - 平移：第一行必须有格子，且结构恰好占满w列（左右两列都有格子）；遇到整行为空时结构到此结束
+    - 夹持：拼图块在某个方向上没有接触其他拼图块时可以单独沿该方向滑出；
+      每行结束时，若某个拼图块在某个方向上的相邻格子都已确定且没有其他拼图块，整个分支作废
+    - 连通：互锁结构必定连通；每行结束时，已经不可能再向下延伸的连通部分若不是唯一的一部分，整个分支作废
+    - 对称：每行结束时比较已决定的各行与其左右镜像，只保留编码较小的一个，镜像分支由另一侧搜索
+    - 记忆：同一结构（在旋转、翻转、平移下等价）的判定结果只计算一次
+第一行的所有部分状态作为独立任务分给多个进程，完成一个任务就立即报告其中找到的结构。
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .interlock import find_separable_subset
+from .polyomino import SYMMETRIES, fixed_polyominoes
+from .scoring import calculate_score
+
+EMPTY = -1            # 格子已决定留空
+CHUNKS_PER_WORKER = 32  # 多进程时每个进程分到的任务组数，任务组越多报告越及时，但进程间通信越多
+
+# 按行优先排序，并平移使第一个格子为 (0, 0)
+def _anchor_first(cells):
+    ordered = sorted(cells, key=lambda pos: (pos[1], pos[0]))
+    ax, ay = ordered[0]
+    return tuple((x - ax, y - ay) for x, y in ordered)
+
+# 形状在上、右、下、左四个方向上相邻（不属于形状本身）的格子
+def _shape_sides(shape):
+    cells = set(shape)
+    return tuple(
+        tuple(sorted({(x + dx, y + dy) for x, y in shape} - cells))
+        for dx, dy in ((0, -1), (1, 0), (0, 1), (-1, 0))
+    )
+
+# 结构的规范键：在8种对称变换与平移下等价的结构键相同
+def structure_key(pieces_cells):
+    best = None
+    for transform in SYMMETRIES:
+        pieces = [[transform(x, y) for x, y in piece_cells] for piece_cells in pieces_cells]
+        min_x = min(x for piece in pieces for x, y in piece)
+        min_y = min(y for piece in pieces for x, y in piece)
+        key = tuple(sorted(tuple(sorted((x - min_x, y - min_y) for x, y in piece)) for piece in pieces))
+        if best is None or key < best:
+            best = key
+    return best
+
+# 搜索约束
+class SearchLimits:
+    def __init__(self, width, height, max_piece_size, min_pieces=2, max_pieces=None, max_cells=None):
+        self.width = width                    # 包围盒的最大宽度
+        self.height = height                  # 包围盒的最大高度
+        self.max_piece_size = max_piece_size  # 单个拼图块的最大格子数
+        self.min_pieces = max(2, min_pieces)  # 最少拼图块数（一块拼图没有意义）
+        self.max_pieces = max_pieces if max_pieces is not None else width * height
+        self.max_cells = max_cells if max_cells is not None else width * height
+
+# 固定宽度盒子里的回溯搜索
+class BoxSearch:
+    def __init__(self, limits, width, shapes):
+        self.limits = limits
+        self.width = width
+        self.height = limits.height
+        self.size = width * limits.height
+        self.grid = [None] * self.size  # None=未决定，EMPTY=留空，其他为拼图块编号
+        self.pieces = []                # 各拼图块占据的格子下标
+        self.piece_bottom = []          # 各拼图块的最后一行
+        self.piece_sides = []           # 各拼图块在上、右、下、左四个方向上相邻的（盒子内的）格子下标
+        self.cells_used = 0
+        self.judged = {}                # 记忆：结构键 -> 判定通过时的分数，不通过时为None
+        self.on_solution = None         # 找到结构时的回调 on_solution(pieces_cells, score)
+        self.on_split = None            # 设置时，第一行结束的部分状态交给它而不再继续搜索
+        
+        # 每一列可以放置的形状：(相对第一个格子的下标偏移, 形状占据的行数, 四个方向上相邻格子的(dx, dy))
+        self.placements = []
+        for column in range(width):
+            column_placements = []
+            for shape in shapes:
+                if all(0 <= column + x < width for x, y in shape):
+                    offsets = tuple(y * width + x for x, y in shape)
+                    column_placements.append((offsets, shape[-1][1] + 1, _shape_sides(shape)))
+            self.placements.append(column_placements)
+    
+    # 从第一个格子开始搜索
+    def run(self):
+        self._search(0)
+    
+    # 从保存的部分状态继续搜索（多进程任务）
+    def resume(self, state):
+        self.grid, self.pieces, self.cells_used, start = state
+        self.grid = list(self.grid)
+        self.pieces = [list(piece) for piece in self.pieces]
+        self.piece_bottom = [piece[-1] // self.width for piece in self.pieces]
+        self.piece_sides = [self._sides_of(piece) for piece in self.pieces]
+        self._search(start)
+    
+    def _search(self, index):
+        width = self.width
+        grid = self.grid
+        
+        # 每行结束时检查
+        if index % width == 0 and index > 0:
+            row = index // width - 1
+            row_filled = any(grid[i] != EMPTY for i in range(index - width, index))
+            if not row_filled:
+                # 整行为空：结构到上一行为止（第一行为空时不是规范位置）
+                if row > 0:
+                    self._finish()
+                return
+            if not self._can_connect(row):
+                return
+            if not self._mirror_ok(index):
+                return
+            if row == 0 and self.on_split is not None:
+                self.on_split((tuple(grid), tuple(tuple(piece) for piece in self.pieces), self.cells_used, index))
+                return
+        
+        if index == self.size:
+            self._finish()
+            return
+        
+        if grid[index] is not None:
+            # 已被上方的拼图块占据
+            self._search(index + 1)
+            return
+        
+        limits = self.limits
+        row = index // width
+        
+        # 放置拼图块（先尝试大的形状，较早找到高分结构）
+        if len(self.pieces) < limits.max_pieces:
+            piece_id = len(self.pieces)
+            budget = limits.max_cells - self.cells_used
+            column = index % width
+            for offsets, rows, sides in self.placements[column]:
+                if len(offsets) > budget or row + rows > self.height:
+                    continue
+                cells = [index + offset for offset in offsets]
+                if any(grid[i] is not None for i in cells):
+                    continue
+                for i in cells:
+                    grid[i] = piece_id
+                self.pieces.append(cells)
+                self.piece_bottom.append(row + rows - 1)
+                self.piece_sides.append(self._place_sides(column, row, sides))
+                self.cells_used += len(cells)
+                
+                if self._gripped(piece_id):
+                    self._search(index + 1)
+                
+                self.cells_used -= len(cells)
+                self.piece_sides.pop()
+                self.piece_bottom.pop()
+                self.pieces.pop()
+                for i in cells:
+                    grid[i] = None
+        
+        # 留空（相邻的拼图块少了一个可能接触的格子）
+        grid[index] = EMPTY
+        if all(self._gripped(piece_id) for piece_id in self._neighbor_pieces(index)):
+            self._search(index + 1)
+        grid[index] = None
+    
+    # 形状放在(column, row)时四个方向上相邻的盒子内格子的下标
+    def _place_sides(self, column, row, sides):
+        width = self.width
+        height = self.height
+        return tuple(
+            tuple((row + y) * width + column + x for x, y in side
+                  if 0 <= column + x < width and 0 <= row + y < height)
+            for side in sides
+        )
+    
+    # 已放置的格子下标对应的四个方向上的相邻格子（从保存的状态恢复时使用）
+    def _sides_of(self, piece):
+        width = self.width
+        shape = [(i % width, i // width) for i in piece]
+        ax, ay = shape[0]
+        sides = _shape_sides([(x - ax, y - ay) for x, y in shape])
+        return self._place_sides(ax, ay, sides)
+    
+    # 拼图块piece_id在四个方向上是否都接触到其他拼图块
+    # final为False时，相邻格子里还有未决定的格子也算作可能接触
+    def _gripped(self, piece_id, final=False):
+        grid = self.grid
+        for side in self.piece_sides[piece_id]:
+            for i in side:
+                value = grid[i]
+                if value is None:
+                    if not final:
+                        break
+                elif value != EMPTY and value != piece_id:
+                    break
+            else:
+                return False
+        return True
+    
+    # 所有拼图块是否都被夹住（结构结束时使用）
+    def _all_gripped(self):
+        return all(self._gripped(piece_id, final=True) for piece_id in range(len(self.pieces)))
+    
+    # 与格子index相邻的拼图块编号
+    def _neighbor_pieces(self, index):
+        width = self.width
+        grid = self.grid
+        neighbors = set()
+        column = index % width
+        for i in (index - width, index + width, index - 1 if column > 0 else -1, index + 1 if column + 1 < width else -1):
+            if 0 <= i < self.size:
+                value = grid[i]
+                if value is not None and value >= 0:
+                    neighbors.add(value)
+        return neighbors
+    
+    # 第row行结束后，结构是否还有可能连通：
+    # 不再向下延伸的连通部分（没有拼图块到达第row行或更下面）只允许是唯一的一部分
+    def _can_connect(self, row):
+        width = self.width
+        size = self.size
+        grid = self.grid
+        parent = list(range(len(self.pieces)))
+        
+        def find(a):
+            while parent[a] != a:
+                parent[a] = parent[parent[a]]
+                a = parent[a]
+            return a
+        
+        for piece_id, piece in enumerate(self.pieces):
+            for i in piece:
+                for j in (i + 1 if (i + 1) % width else -1, i + width if i + width < size else -1):
+                    if j >= 0:
+                        other = grid[j]
+                        if other is not None and other >= 0 and other != piece_id:
+                            parent[find(other)] = find(piece_id)
+        
+        roots = {find(piece_id) for piece_id in range(len(self.pieces))}
+        if len(roots) <= 1:
+            return True
+        alive = {find(piece_id) for piece_id, bottom in enumerate(self.piece_bottom) if bottom >= row}
+        return alive == roots
+    
+    # 已经全部决定的行（index之前的行）的编码不大于其左右镜像的编码（编号按首次出现的顺序重新编排）
+    # 下面的行还有未决定的格子，之后的填法会改变比较结果，不参与比较；已决定各行的编码是之后每行结束时编码的前缀，
+    # 所以结构与其镜像中恰好保留编码较小的一个
+    def _mirror_ok(self, index):
+        width = self.width
+        grid = self.grid
+        rows = index // width
+        
+        def encode(mirrored):
+            labels = {}
+            code = []
+            for row in range(rows):
+                base = row * width
+                for column in range(width):
+                    value = grid[base + (width - 1 - column if mirrored else column)]
+                    code.append(-1 if value == EMPTY else labels.setdefault(value, len(labels)))
+            return code
+        
+        return encode(False) <= encode(True)
+    
+    # 结构到此结束：检查夹持、约束与完整性，通过时报告
+    def _finish(self):
+        limits = self.limits
+        if len(self.pieces) < limits.min_pieces:
+            return
+        if not self._all_gripped():
+            return
+        
+        width = self.width
+        columns = {i % width for piece in self.pieces for i in piece}
+        if 0 not in columns or width - 1 not in columns:
+            return
+        
+        pieces_cells = [[(i % width, i // width) for i in piece] for piece in self.pieces]
+        key = structure_key(pieces_cells)
+        if key in self.judged:
+            return
+        
+        score = None
+        if find_separable_subset(pieces_cells) is None:
+            score = calculate_score(pieces_cells)
+        self.judged[key] = score
+        if score is not None and self.on_solution is not None:
+            self.on_solution(pieces_cells, score)
+
+_shapes_cache = {}  # 最大格子数 -> 形状列表
+
+# 按约束生成的所有固定朝向形状，大的在前
+def _shapes_for(limits):
+    shapes = _shapes_cache.get(limits.max_piece_size)
+    if shapes is None:
+        shapes_by_size = fixed_polyominoes(limits.max_piece_size)
+        shapes = [_anchor_first(shape) for size in sorted(shapes_by_size, reverse=True) for shape in shapes_by_size[size]]
+        _shapes_cache[limits.max_piece_size] = shapes
+    return shapes
+
+# 把第一行的每个部分状态作为一个任务
+def split_tasks(limits):
+    shapes = _shapes_for(limits)
+    tasks = []
+    for width in range(2, limits.width + 1):
+        search = BoxSearch(limits, width, shapes)
+        search.on_split = lambda state, width=width: tasks.append((width, state))
+        search.run()
+    return tasks
+
+# 执行一组任务，返回找到的 [(pieces_cells, score), ...]（在工作进程中运行）
+# searches缓存各宽度的BoxSearch，使判定结果的记忆在任务之间共享
+def run_tasks(limits, tasks, searches=None):
+    if searches is None:
+        searches = {}
+    found = []
+    for width, state in tasks:
+        search = searches.get(width)
+        if search is None:
+            search = searches[width] = BoxSearch(limits, width, _shapes_for(limits))
+        search.on_solution = lambda pieces_cells, score: found.append((pieces_cells, score))
+        search.resume(state)
+    return found
+
+_worker_limits = None  # 工作进程中的搜索约束与各宽度的BoxSearch，由_init_worker设置
+_worker_searches = {}
+
+def _init_worker(limits):
+    global _worker_limits
+    _worker_limits = limits
+    _worker_searches.clear()
+
+# 工作进程中执行一组任务，形状表与判定记忆在同一进程的各组任务之间复用
+def _run_chunk(tasks):
+    return run_tasks(_worker_limits, tasks, _worker_searches)
+
+# 搜索结构，找到后立即逐个产出 (pieces_cells, score)；不同任务中对称等价的结构只产出一次
+# jobs > 1 时使用进程池，产出顺序取决于任务完成的先后
+def search_structures(limits, jobs=None):
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    tasks = split_tasks(limits)
+    seen = set()
+    
+    def fresh(found):
+        for pieces_cells, score in found:
+            key = structure_key(pieces_cells)
+            if key not in seen:
+                seen.add(key)
+                yield pieces_cells, score
+    
+    if jobs <= 1:
+        searches = {}
+        for task in tasks:
+            yield from fresh(run_tasks(limits, [task], searches))
+        return
+    
+    # 隔一个取一个地分组，使每组的任务大小相近
+    chunk_count = min(len(tasks), jobs * CHUNKS_PER_WORKER)
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(limits,)) as executor:
+        futures = [executor.submit(_run_chunk, tasks[i::chunk_count]) for i in range(chunk_count)]
+        for future in as_completed(futures):
+            yield from fresh(future.result())
@@ -0,0 +1,316 @@
+# -*- coding:utf-8 -*-
+
+"""
+解答文件的读写
+
+JSON格式:
+{
+    "format": "polylok-solution",
+    "version": 1,
+    "pieces": [{"cells": [[x, y], ...], "color": [r, g, b, a]}, ...],
+    "cells": [[x, y], ...]
+}
+其中cells为尚未组成拼图块的填色格子，color可以省略
+
+二进制格式（扩展名.plk，体积约为JSON的五分之一，读写也快得多）:
+    "PLOK" 版本号 拼图块数 {标志 [r g b a] 格子块}... 格子块(未组成拼图块的格子)
+    格子块 = 格子数 格子...，格子按先行后列排序，第一个格子写zigzag(x) zigzag(y)，
+    之后每个格子写与上一个格子的行差dy，dy为0时再写列差减一（必定非负），否则写zigzag(列差)
+所有整数都是变长编码（varint，每字节7位，最高位表示后面还有字节），
+连续的一行格子每格只占2字节；标志的最低位表示后面有颜色
+"""
+
+import json
+
+SOLUTION_FORMAT = "polylok-solution"  # 文件格式标识
+SOLUTION_VERSION = 1                  # 当前文件格式版本
+JSON_EXTENSION = ".json"              # JSON格式扩展名
+BINARY_EXTENSION = ".plk"             # 二进制格式扩展名
+BINARY_MAGIC = b"PLOK"                # 二进制格式的文件头
+BINARY_VERSION = 1                    # 当前二进制格式版本
+SOLUTION_EXTENSIONS = (JSON_EXTENSION, BINARY_EXTENSION)
+
+# 把坐标列表转换为元组列表，并检查格式
+# 先整体转换并只检查出现过的类型，格式有误时再逐个检查找出出错的坐标
+def _parse_cells(raw_cells, what):
+    if not isinstance(raw_cells, list):
+        raise ValueError(f"{what} must be a list of [x, y] pairs")
+    try:
+        parsed = [(x, y) for x, y in raw_cells]
+    except (TypeError, ValueError):
+        parsed = None
+    if parsed is not None and {type(x) for x, y in parsed} | {type(y) for x, y in parsed} <= {int}:
+        return parsed
+    
+    parsed = []
+    for raw in raw_cells:
+        if (not isinstance(raw, (list, tuple)) or len(raw) != 2
+                or not all(isinstance(v, int) and not isinstance(v, bool) for v in raw)):
+            raise ValueError(f"{what} contains an invalid coordinate: {raw!r}")
+        parsed.append((raw[0], raw[1]))
+    return parsed
+
+# 检查版本号：必须是1到当前版本之间的整数
+def _check_version(version, supported):
+    if not isinstance(version, int) or isinstance(version, bool) or not 1 <= version <= supported:
+        raise ValueError(f"Unsupported solution version: {version!r}")
+
+# 把拼图块占据的格子记入占用索引 {(x, y): 拼图块索引}，格子已被占用或重复列出时抛出ValueError
+def _add_owner(cell_owner, piece_cells, piece_index):
+    overlap = cell_owner.keys() & piece_cells
+    if overlap:
+        raise ValueError(f"Cell {min(overlap)} is used by more than one piece")
+    size_before = len(cell_owner)
+    cell_owner.update(dict.fromkeys(piece_cells, piece_index))
+    if len(cell_owner) != size_before + len(piece_cells):
+        raise ValueError(f"Piece {piece_index} lists a cell more than once")
+
+# 拼图块的格子分成几个相连的部分
+# 按列排序后把每列连续的格子合并成竖直段，再用并查集合并相邻两列中上下范围重叠的段；
+# 每个格子只比较一次，不必像泛洪那样逐格查询四个邻居
+def _group_count(piece_cells):
+    runs = []  # 竖直段 (x, 上端y, 下端y)，按x、再按y排序
+    cells = sorted(piece_cells)
+    run_x, run_top = cells[0]
+    run_bottom = run_top
+    for x, y in cells:
+        if x != run_x or y > run_bottom + 1:
+            runs.append((run_x, run_top, run_bottom))
+            run_x, run_top = x, y
+        run_bottom = y
+    runs.append((run_x, run_top, run_bottom))
+    
+    parent = list(range(len(runs)))
+    
+    def find(a):
+        while parent[a] != a:
+            parent[a] = parent[parent[a]]
+            a = parent[a]
+        return a
+    
+    groups = len(runs)
+    column = None
+    previous = []  # 左边一列的段的下标
+    current = []   # 当前列的段的下标
+    for index, (x, top, bottom) in enumerate(runs):
+        if x != column:
+            previous = current if column is not None and x == column + 1 else []
+            current = []
+            column = x
+            k = 0
+        current.append(index)
+        # 左边一列的段也按y排序，跳过完全在上方的段，之后与范围重叠的段合并
+        while k < len(previous) and runs[previous[k]][2] < top:
+            k += 1
+        m = k
+        while m < len(previous) and runs[previous[m]][1] <= bottom:
+            a, b = find(index), find(previous[m])
+            if a != b:
+                parent[a] = b
+                groups -= 1
+            m += 1
+    return groups
+
+# 检查拼图块的格子必须相连（游戏中不能创建不相连的拼图块，判定时也不能接受）
+def _check_connected(piece_cells, piece_index):
+    groups = _group_count(piece_cells)
+    if groups > 1:
+        raise ValueError(f"Piece {piece_index} is not connected ({groups} separate groups)")
+
+# 把颜色列表转换为 (r, g, b, a) 元组，并检查每个分量是0到255的整数
+def _parse_color(color, piece_index):
+    if (not isinstance(color, list) or len(color) not in (3, 4)
+            or not all(isinstance(v, int) and not isinstance(v, bool) and 0 <= v <= 255 for v in color)):
+        raise ValueError(f"Piece {piece_index} has an invalid color: {color!r}")
+    return tuple(color) if len(color) == 4 else tuple(color) + (255,)
+
+# 把拼图块列表和填色格子转换为可写入JSON的字典
+# pieces为 [{'cells': [(x, y), ...], 'color': (r, g, b, a)}, ...]，与游戏中的puzzle_pieces一致
+def solution_to_dict(pieces, cells=()):
+    return {
+        'format': SOLUTION_FORMAT,
+        'version': SOLUTION_VERSION,
+        'pieces': [
+            {'cells': [list(pos) for pos in piece['cells']], 'color': list(piece['color'])}
+            if piece.get('color') is not None else
+            {'cells': [list(pos) for pos in piece['cells']]}
+            for piece in pieces
+        ],
+        'cells': [list(pos) for pos in cells],
+    }
+
+# 从字典中读取解答，返回 {'pieces': [...], 'cells': [...], 'cell_owner': {(x, y): 拼图块索引}}
+# cell_owner是检查重叠时顺便建立的占用索引，可以直接交给Board.load，不必再建立一次
+# 格式错误、版本不支持、颜色无效、拼图块不相连或互相重叠时抛出ValueError
+def solution_from_dict(data):
+    if not isinstance(data, dict) or data.get('format') != SOLUTION_FORMAT:
+        raise ValueError("Not a PolyLok solution file")
+    _check_version(data.get('version'), SOLUTION_VERSION)
+    
+    pieces = []
+    cell_owner = {}
+    for piece_index, raw_piece in enumerate(data.get('pieces', [])):
+        if not isinstance(raw_piece, dict):
+            raise ValueError(f"Piece {piece_index} is not an object")
+        piece_cells = _parse_cells(raw_piece.get('cells'), f"Piece {piece_index}")
+        if not piece_cells:
+            raise ValueError(f"Piece {piece_index} has no cells")
+        _add_owner(cell_owner, piece_cells, piece_index)
+        _check_connected(piece_cells, piece_index)
+        
+        color = raw_piece.get('color')
+        if color is not None:
+            color = _parse_color(color, piece_index)
+        pieces.append({'cells': piece_cells, 'color': color})
+    
+    cells = _parse_cells(data.get('cells', []), "Loose cells")
+    return {'pieces': pieces, 'cells': cells, 'cell_owner': cell_owner}
+
+# ---------- 二进制格式 ----------
+
+# 写入一个非负整数的变长编码
+def _write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+# 有符号整数映射为非负整数：0, -1, 1, -2, 2 ... -> 0, 1, 2, 3, 4 ...
+def _zigzag(value):
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+def _unzigzag(value):
+    return value >> 1 if not value & 1 else -(value >> 1) - 1
+
+# 写入一个格子块
+def _write_cells(out, cells):
+    cells = sorted(cells, key=lambda pos: (pos[1], pos[0]))
+    _write_varint(out, len(cells))
+    if not cells:
+        return
+    prev_x, prev_y = cells[0]
+    _write_varint(out, _zigzag(prev_x))
+    _write_varint(out, _zigzag(prev_y))
+    for x, y in cells[1:]:
+        dy = y - prev_y
+        _write_varint(out, dy)
+        _write_varint(out, x - prev_x - 1 if dy == 0 else _zigzag(x - prev_x))
+        prev_x, prev_y = x, y
+
+# 把拼图块列表和填色格子编码为二进制，参数与solution_to_dict相同
+def solution_to_bytes(pieces, cells=()):
+    out = bytearray(BINARY_MAGIC)
+    _write_varint(out, BINARY_VERSION)
+    _write_varint(out, len(pieces))
+    for piece in pieces:
+        color = piece.get('color')
+        if color is not None:
+            out.append(1)
+            out.extend(tuple(color) if len(color) == 4 else tuple(color) + (255,))
+        else:
+            out.append(0)
+        _write_cells(out, piece['cells'])
+    _write_cells(out, cells)
+    return bytes(out)
+
+# 二进制读取器，越界时抛出ValueError
+class _Reader:
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+    
+    def byte(self):
+        if self.pos >= len(self.data):
+            raise ValueError("Truncated solution data")
+        value = self.data[self.pos]
+        self.pos += 1
+        return value
+    
+    def varint(self):
+        data = self.data
+        pos = self.pos
+        value = 0
+        shift = 0
+        try:
+            while True:
+                b = data[pos]
+                pos += 1
+                value |= (b & 0x7F) << shift
+                if b < 0x80:
+                    break
+                shift += 7
+        except IndexError:
+            raise ValueError("Truncated solution data") from None
+        self.pos = pos
+        return value
+    
+    # 读取一个格子块，返回 [(x, y), ...]
+    def cells(self):
+        count = self.varint()
+        if count > len(self.data) - self.pos:
+            # 每个格子至少占2字节，数量不可能超过剩余字节数
+            raise ValueError("Truncated solution data")
+        if count == 0:
+            return []
+        varint = self.varint
+        x = _unzigzag(varint())
+        y = _unzigzag(varint())
+        cells = [(x, y)]
+        append = cells.append
+        for _ in range(count - 1):
+            dy = varint()
+            if dy == 0:
+                x += varint() + 1
+            else:
+                y += dy
+                x += _unzigzag(varint())
+            append((x, y))
+        return cells
+
+# 从二进制读取解答，返回值与solution_from_dict相同
+def solution_from_bytes(data):
+    if not data.startswith(BINARY_MAGIC):
+        raise ValueError("Not a PolyLok solution file")
+    reader = _Reader(data)
+    reader.pos = len(BINARY_MAGIC)
+    _check_version(reader.varint(), BINARY_VERSION)
+    
+    pieces = []
+    cell_owner = {}
+    for piece_index in range(reader.varint()):
+        flags = reader.byte()
+        color = tuple(reader.byte() for _ in range(4)) if flags & 1 else None
+        piece_cells = reader.cells()
+        if not piece_cells:
+            raise ValueError(f"Piece {piece_index} has no cells")
+        _add_owner(cell_owner, piece_cells, piece_index)
+        _check_connected(piece_cells, piece_index)
+        pieces.append({'cells': piece_cells, 'color': color})
+    
+    cells = reader.cells()
+    return {'pieces': pieces, 'cells': cells, 'cell_owner': cell_owner}
+
+# ---------- 文件 ----------
+
+# 保存解答，扩展名为.plk时使用二进制格式，否则使用JSON
+def save_solution(path, pieces, cells=()):
+    if path.lower().endswith(BINARY_EXTENSION):
+        with open(path, 'wb') as f:
+            f.write(solution_to_bytes(pieces, cells))
+        return
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(solution_to_dict(pieces, cells), f, separators=(',', ':'))
+
+# 读取解答，按文件头自动识别二进制格式和JSON
+def load_solution(path):
+    with open(path, 'rb') as f:
+        raw = f.read()
+    if raw.startswith(BINARY_MAGIC):
+        return solution_from_bytes(raw)
+    try:
+        data = json.loads(raw.decode('utf-8'))
+    except UnicodeDecodeError:
+        raise ValueError("Not a PolyLok solution file") from None
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON: {e}") from None
+    return solution_from_dict(data)
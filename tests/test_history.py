@@ -0,0 +1,111 @@
+# -*- coding:utf-8 -*-
+
+"""
+撤销与重做，以及拖动填色的笔画合并
+"""
+
+import random
+
+from polylok.board import Board
+from polylok.history import History
+
+def make_board(**options):
+    return Board(rng=random.Random(0), **options)
+
+def board_state(board):
+    return board.pieces_cells(), [piece.color for piece in board.pieces], dict(board.cells)
+
+# 每种操作都能撤销到操作前，再重做回到操作后
+def test_undo_then_redo_restores_board():
+    board = make_board()
+    edits = [
+        lambda: board.paint((5, 5)),
+        lambda: board.erase((5, 5)),
+        lambda: board.paint((0, 0)),
+        lambda: board.paint((1, 0)),
+        lambda: board.create_piece(),
+        lambda: board.paint((0, 2)),
+        lambda: board.create_piece(),
+        lambda: board.move_piece(1, 2, 0),
+        lambda: board.move_pieces([0, 1], 0, 3),
+        lambda: board.transform_piece(0, 1),
+        lambda: board.delete_piece(0),
+        lambda: board.paint((9, 9)),
+        lambda: board.clear_cells(),
+    ]
+    states = [board_state(board)]
+    for edit in edits:
+        edit()
+        states.append(board_state(board))
+    
+    for state in reversed(states[:-1]):
+        assert board.undo()
+        assert board_state(board) == state
+    assert not board.undo()
+    for state in states[1:]:
+        assert board.redo()
+        assert board_state(board) == state
+    assert not board.redo()
+
+# 撤销后新的操作使重做历史失效
+def test_new_edit_clears_redo():
+    board = make_board()
+    board.paint((0, 0))
+    board.paint((1, 0))
+    board.undo()
+    board.paint((2, 0))
+    assert not board.redo()
+    assert sorted(board.cells) == [(0, 0), (2, 0)]
+
+# 历史有上限，超出时丢弃最早的记录
+def test_history_limit():
+    history = History(limit=3)
+    for i in range(5):
+        history.record(('cells', i))
+    assert len(history) == 3
+    assert history.pop_undo() == ('cells', 4)
+    board = make_board(history_limit=10)
+    for x in range(20):
+        board.paint((x, 0))
+    undone = 0
+    while board.undo():
+        undone += 1
+    assert undone == 10
+    assert len(board.cells) == 10
+
+# 一笔拖动填色只算一步撤销，记录里只有这一笔的净变化
+def test_stroke_is_one_undo_step():
+    board = make_board()
+    board.paint((0, 0))
+    board.begin_stroke()
+    for x in range(1, 6):
+        board.paint((x, 0))
+    board.erase((0, 0))
+    board.end_stroke()
+    assert len(board.history) == 2
+    kind, positions, old_colors, new_colors = board.history.undo_stack[-1]
+    assert sorted(positions) == [(x, 0) for x in range(6)]
+    
+    assert board.undo()
+    assert sorted(board.cells) == [(0, 0)]
+    assert board.redo()
+    assert sorted(board.cells) == [(x, 0) for x in range(1, 6)]
+
+# 笔画中画上又擦掉的格子没有净变化，整笔没有变化时不保存记录
+def test_stroke_without_net_change_is_not_recorded():
+    board = make_board()
+    board.begin_stroke()
+    board.paint((0, 0))
+    board.erase((0, 0))
+    board.end_stroke()
+    assert not board.history.can_undo()
+
+# 笔画进行中撤销时先结束笔画，撤销的是这一笔
+def test_undo_closes_open_stroke():
+    board = make_board()
+    board.paint((9, 9))
+    board.begin_stroke()
+    board.paint((0, 0))
+    board.paint((1, 0))
+    assert board.undo()
+    assert sorted(board.cells) == [(9, 9)]
@@ -0,0 +1,32 @@
+# -*- coding:utf-8 -*-
+
+"""
+完整性判定的已知答案
+"""
+
+from polylok.bench import make_framed_board
+from polylok.integrity import build_contact_graph, check_integrity, piece_boundary
+
+# 一块拼图不会散开
+def test_single_piece_passes():
+    assert check_integrity([[(0, 0), (1, 0)]]) is None
+
+# 上下叠放的两块：第一块向上移动时第二块留在原地
+def test_stacked_pieces_fail_upward():
+    assert check_integrity([[(0, 0), (1, 0)], [(0, 1), (1, 1)]]) == 0
+
+# 左右并排的两块：向上移动时就会分开（第一个失败的方向）
+def test_side_by_side_pieces_fail_upward():
+    assert check_integrity([[(0, 0)], [(1, 0)]]) == 0
+
+# 外环包住内部所有拼图块，每个方向都能推动全部拼图块；去掉外环后会散开
+def test_framed_board():
+    pieces_cells = make_framed_board(size=20, strip_width=4)
+    assert check_integrity(pieces_cells) is None
+    assert check_integrity(pieces_cells[1:]) is not None
+
+# 用缓存的边界探测点与逐格查询建立的推动关系图相同
+def test_boundaries_give_same_graph():
+    pieces_cells = make_framed_board(size=12, strip_width=3)
+    boundaries = [piece_boundary(piece_cells) for piece_cells in pieces_cells]
+    assert build_contact_graph(pieces_cells, boundaries=boundaries) == build_contact_graph(pieces_cells)
@@ -0,0 +1,52 @@
+# -*- coding:utf-8 -*-
+
+"""
+互锁求解的已知答案
+"""
+
+from polylok.bench import make_framed_board
+from polylok.integrity import build_contact_graph
+from polylok.interlock import (find_separable_subset, is_interlocked, separable_subsets, smallest_separable,
+                               strongly_connected_components)
+
+# 3x3的环形拼图块包住中间一格：任何方向上两块都会互相推动
+RING = [(x, y) for x in range(3) for y in range(3) if (x, y) != (1, 1)]
+ENCLOSED = [RING, [(1, 1)]]
+
+def test_strongly_connected_components():
+    components, component_of = strongly_connected_components([{1}, {2}, {0}, {2}])
+    assert sorted(map(sorted, components)) == [[0, 1, 2], [3]]
+    assert component_of[0] == component_of[1] == component_of[2] != component_of[3]
+
+def test_enclosed_pair():
+    assert find_separable_subset(ENCLOSED) is None
+    assert is_interlocked(ENCLOSED)
+
+def test_single_piece_is_interlocked():
+    assert find_separable_subset([[(0, 0)]]) is None
+
+# 三块竖直叠放：向上只有最上面一块能脱离，向下只有最下面一块能脱离
+def test_loose_stack():
+    stack = [[(0, 1)], [(0, 0)], [(0, 2)]]
+    subsets = separable_subsets(build_contact_graph(stack))
+    assert subsets[0] == [1]
+    assert subsets[2] == [2]
+    # 左右方向上三块之间没有推动关系，每块都能单独脱离，同样大小时取索引最小的
+    assert subsets[1] == [0] and subsets[3] == [0]
+    assert smallest_separable(subsets) == {'direction': 0, 'pieces': [1]}
+    # 节点编号与拼图块索引不同时按labels给出结果并比较
+    labelled = separable_subsets(build_contact_graph(stack), labels=[7, 5, 6])
+    assert labelled == [[5], [5], [6], [5]]
+
+# 两组各自互锁的拼图块上下叠放：可脱离的是整组（缩点图的汇点或源点分量），不是单块
+def test_component_separates_as_a_whole():
+    upper = [list(piece) for piece in ENCLOSED]
+    lower = [[(x, y + 3) for x, y in piece] for piece in ENCLOSED]
+    result = find_separable_subset(upper + lower)
+    assert result == {'direction': 0, 'pieces': [0, 1]}
+
+# 框架盘面完全互锁，去掉外环后会散开
+def test_framed_board():
+    pieces_cells = make_framed_board(size=20, strip_width=4)
+    assert find_separable_subset(pieces_cells) is None
+    assert find_separable_subset(pieces_cells[1:]) is not None
@@ -0,0 +1,139 @@
+# -*- coding:utf-8 -*-
+
+"""
+编辑日志的回放：压缩、跨快照的撤销重做、写了一半的最后一行
+"""
+
+import json
+import random
+import threading
+import time
+
+from polylok import journal as journal_module
+from polylok.board import Board
+from polylok.journal import Journal, replay
+
+def make_board():
+    return Board(rng=random.Random(0))
+
+# 填色后创建一个拼图块
+def add_piece(board, cells):
+    for pos in cells:
+        board.paint(pos)
+    board.create_piece()
+
+def board_state(board):
+    return board.pieces_cells(), [piece.color for piece in board.pieces], sorted(board.cells)
+
+def replayed_state(path):
+    restored = make_board()
+    count = replay(path, restored)
+    return count, restored
+
+def read_lines(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read().splitlines()
+
+# 各种编辑（包括撤销、重做）回放后得到相同的盘面与撤销历史
+def test_replay_restores_board_and_history(tmp_path):
+    path = str(tmp_path / "journal.log")
+    board = make_board()
+    journal = Journal(path)
+    journal.attach(board)
+    add_piece(board, [(0, 0), (1, 0)])
+    add_piece(board, [(0, 2)])
+    board.move_piece(1, 2, 0)
+    board.paint((5, 5))
+    board.undo()
+    board.redo()
+    board.erase((5, 5))
+    journal.close()
+    
+    count, restored = replayed_state(path)
+    assert count == len(read_lines(path)) - 1
+    assert board_state(restored) == board_state(board)
+    assert len(restored.history) == len(board.history)
+
+# 压缩在后台写快照，期间的编辑照常写入，写完后补写到新日志
+def test_compaction_keeps_appending_while_snapshot_is_written(tmp_path, monkeypatch):
+    path = str(tmp_path / "journal.log")
+    board = make_board()
+    journal = Journal(path)
+    journal.attach(board)
+    monkeypatch.setattr(journal_module, 'COMPACT_ENTRIES', 4)
+    
+    # 让后台编码快照停住，直到测试放行
+    release = threading.Event()
+    encode = journal_module.solution_to_bytes
+    def slow_encode(*args):
+        release.wait(5)
+        return encode(*args)
+    monkeypatch.setattr(journal_module, 'solution_to_bytes', slow_encode)
+    
+    add_piece(board, [(0, 0), (1, 0)])
+    add_piece(board, [(3, 0), (3, 1)])
+    start = time.monotonic()
+    journal.sync()
+    assert time.monotonic() - start < 1, "sync must not wait for the snapshot"
+    old_snapshot = read_lines(path)[0]
+    
+    board.move_piece(0, 0, 2)
+    board.paint((6, 6))
+    board.undo()
+    journal.sync()
+    assert read_lines(path)[0] == old_snapshot  # 后台还没写完，仍然追加到旧日志
+    
+    release.set()
+    journal.close()
+    lines = read_lines(path)
+    assert lines[0] != old_snapshot
+    assert [json.loads(line)[0] for line in lines[1:]] == ['record', 'record', 'undo']
+    
+    count, restored = replayed_state(path)
+    assert count == 3
+    assert board_state(restored) == board_state(board)
+
+# 压缩后撤销快照之前的操作、再重做，回放结果与盘面一致
+def test_undo_redo_across_snapshot(tmp_path, monkeypatch):
+    path = str(tmp_path / "journal.log")
+    board = make_board()
+    journal = Journal(path)
+    journal.attach(board)
+    monkeypatch.setattr(journal_module, 'COMPACT_ENTRIES', 3)
+    
+    add_piece(board, [(0, 0), (0, 1)])
+    add_piece(board, [(2, 0)])
+    board.move_piece(1, 1, 0)
+    journal.sync(force=True)  # 开始压缩
+    journal.sync(force=True)  # 等后台写完并换用新日志
+    assert len(read_lines(path)) == 1
+    
+    board.undo()
+    board.undo()
+    board.redo()
+    board.paint((8, 8))
+    journal.close()
+    
+    count, restored = replayed_state(path)
+    assert count == 4
+    assert board_state(restored) == board_state(board)
+
+# 崩溃时最后一行只写了一半：回放到前一行为止
+def test_torn_last_line_is_ignored(tmp_path):
+    path = str(tmp_path / "journal.log")
+    board = make_board()
+    journal = Journal(path)
+    journal.attach(board)
+    add_piece(board, [(0, 0), (1, 0)])
+    add_piece(board, [(0, 1), (1, 1)])
+    expected = board_state(board)
+    board.move_piece(1, 0, 3)
+    journal.close()
+    
+    lines = read_lines(path)
+    with open(path, 'w', encoding='utf-8', newline='\n') as f:
+        f.write('\n'.join(lines[:-1]) + '\n' + lines[-1][:len(lines[-1]) // 2])
+    
+    count, restored = replayed_state(path)
+    assert count == len(lines) - 2
+    assert board_state(restored) == expected
@@ -0,0 +1,77 @@
+# -*- coding:utf-8 -*-
+
+"""
+实时完整性检测与从头判定的结果一致
+"""
+
+import random
+
+from polylok.board import Board, BoardError
+from polylok.integrity import check_integrity
+from polylok.interlock import find_separable_subset
+from polylok.monitor import IntegrityMonitor
+
+# 填色后创建一个拼图块
+def add_piece(board, cells):
+    board.clear_cells()
+    for pos in cells:
+        board.paint(pos)
+    board.create_piece()
+
+# 以(x, y)为起点随机长出的几个相连格子
+def random_cells(rng, x, y):
+    cells = {(x, y)}
+    for _ in range(rng.randrange(4)):
+        cx, cy = rng.choice(sorted(cells))
+        dx, dy = rng.choice(((1, 0), (0, 1), (-1, 0), (0, -1)))
+        cells.add((cx + dx, cy + dy))
+    return cells
+
+def assert_matches_full_check(board, monitor):
+    monitor.update()
+    expected = find_separable_subset(board.pieces)
+    assert monitor.result == expected
+    assert board.find_separable_subset() == expected
+    if board.pieces:
+        assert board.check_integrity() == check_integrity(board.pieces)
+
+# 新建、移动、删除、撤销各步之后都与从头判定比较
+def test_monitor_after_each_edit():
+    rng = random.Random(0)
+    for _ in range(20):
+        board = Board(rng=rng)
+        monitor = IntegrityMonitor(board)
+        for _ in range(80):
+            count = len(board.pieces)
+            action = rng.random()
+            try:
+                if action < 0.35 or count < 2:
+                    cells = random_cells(rng, rng.randrange(8), rng.randrange(8))
+                    if not any(board.is_in_piece(pos) for pos in cells):
+                        add_piece(board, cells)
+                elif action < 0.6:
+                    board.move_piece(rng.randrange(count), rng.randint(-2, 2), rng.randint(-2, 2))
+                elif action < 0.75:
+                    board.delete_piece(rng.randrange(count))
+                elif action < 0.9:
+                    board.undo()
+                else:
+                    board.redo()
+            except BoardError:
+                pass
+            assert_matches_full_check(board, monitor)
+
+# 删除前面的拼图块后，结果中的拼图块索引是删除后的索引
+def test_delete_renumbers_result():
+    board = Board(rng=random.Random(0))
+    monitor = IntegrityMonitor(board)
+    add_piece(board, [(5, 5)])
+    add_piece(board, [(0, 0), (1, 0)])
+    add_piece(board, [(0, 1), (1, 1), (2, 1), (2, 0)])
+    assert_matches_full_check(board, monitor)
+    board.delete_piece(0)
+    assert_matches_full_check(board, monitor)
+    # 剩下的两块中，原来索引为1的一块可以向上脱离
+    assert monitor.result == {'direction': 0, 'pieces': [0]}
+    board.undo()
+    assert_matches_full_check(board, monitor)
@@ -0,0 +1,95 @@
+# -*- coding:utf-8 -*-
+
+"""
+拖动预览的放置缓存、可放置位置图与盘面上的放置检测结果一致
+"""
+
+import random
+
+import pytest
+
+from polylok import placement
+from polylok.board import Board, Piece, decode_cell
+from polylok.placement import PlacementCache, PlacementHeatmap
+
+# 随机放几块互不重叠的小拼图块和几个填色格子
+def make_random_board(rng, use_bitboard):
+    board = Board(rng=rng, use_bitboard=use_bitboard)
+    used = set()
+    for _ in range(rng.randint(2, 7)):
+        x0, y0 = rng.randint(-8, 8), rng.randint(-8, 8)
+        cells = {(x0 + rng.randint(0, 2), y0 + rng.randint(0, 2)) for _ in range(rng.randint(1, 5))} - used
+        if cells:
+            used |= cells
+            board.pieces.append(Piece(sorted(cells)))
+    board.rebuild_cell_owner()
+    for _ in range(3):
+        pos = (rng.randint(-10, 10), rng.randint(-10, 10))
+        if pos not in board.cell_owner:
+            board.paint(pos)
+    return board
+
+OFFSETS = [(dx, dy) for dx in range(-10, 11) for dy in range(-10, 11)]
+
+@pytest.mark.parametrize('use_bitboard', [False, True])
+def test_cache_matches_board(use_bitboard):
+    rng = random.Random(1)
+    for _ in range(20):
+        board = make_random_board(rng, use_bitboard)
+        count = len(board.pieces)
+        single = PlacementCache(board, (0,))
+        group = PlacementCache(board, range(count))
+        rotated = PlacementCache(board, (0,), symmetry=rng.randint(1, 7))
+        for step in range(2):
+            for dx, dy in OFFSETS:
+                assert single.can_place(dx, dy) == board.can_place_pieces((0,), dx, dy)
+                assert group.can_place(dx, dy) == board.can_place_pieces(range(count), dx, dy)
+                cells = rotated.lookup(dx, dy)[1][0].cells
+                assert rotated.can_place(dx, dy) == board.can_place_cells(0, cells)
+            # 拖动中盘面变化后缓存重新建立
+            board.move_piece(count - 1, rng.randint(-2, 2), rng.randint(-2, 2))
+
+# 相距很远的拼图块不会让开始拖动时建立的位棋盘变大
+def test_far_apart_pieces():
+    board = Board(use_bitboard=True)
+    board.pieces = [Piece([(x, y) for x in range(5) for y in range(4)]),
+                    Piece([(10 ** 7 + x, 10 ** 7 + y) for x in range(5) for y in range(4)])]
+    board.rebuild_cell_owner()
+    cache = PlacementCache(board, (0,))
+    assert cache.can_place(1, 0)
+    assert not cache.can_place(10 ** 7 + 2, 10 ** 7 - 1)
+    assert cache.can_place(10 ** 7 + 5, 10 ** 7)
+    assert max(bits.bit_length() for x0, bits in board.bitboard().rows.values()) <= 5
+
+# 可放置位置图与逐个位置调用Board.can_place_pieces的结果相同
+def expected_mask(board, piece_indices, x0, y0, x1, y1):
+    anchor_x, anchor_y = decode_cell(min(board.pieces[index].codes[0] for index in piece_indices))
+    return bytes(
+        board.can_place_pieces(piece_indices, x - anchor_x, y - anchor_y)
+        for y in range(y0, y1 + 1) for x in range(x0, x1 + 1)
+    )
+
+# 有NumPy和没有NumPy时都与逐个检测一致，其他拼图块移动、删除或填色后增量更新的结果也一致
+@pytest.mark.parametrize('use_numpy', [True, False])
+def test_heatmap_matches_board(monkeypatch, use_numpy):
+    if not use_numpy:
+        monkeypatch.setattr(placement, 'np', None)
+    elif placement.np is None:
+        pytest.skip("NumPy is not installed")
+    rng = random.Random(2)
+    for _ in range(10):
+        board = make_random_board(rng, False)
+        heatmap = PlacementHeatmap(board)
+        selection = (0,) if rng.random() < 0.5 else (0, 1)
+        if len(board.pieces) < len(selection):
+            continue
+        for _ in range(4):
+            assert heatmap.update(selection, -6, -5, 7, 8) == expected_mask(board, selection, -6, -5, 7, 8)
+            action = rng.random()
+            count = len(board.pieces)
+            if action < 0.4 and count > len(selection):
+                board.move_piece(count - 1, rng.randint(-3, 3), rng.randint(-3, 3))
+            elif action < 0.6 and count > len(selection):
+                board.delete_piece(count - 1)
+            else:
+                board.paint((rng.randint(-8, 8), rng.randint(-8, 8)))
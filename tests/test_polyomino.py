@@ -0,0 +1,48 @@
+# -*- coding:utf-8 -*-
+
+"""
+多联骨牌枚举、规范形式与磁盘缓存
+"""
+
+import os
+
+from polylok import polyomino
+from polylok.polyomino import canonical_form, enumerate_fixed, enumerate_free, orientations, shape_id
+
+L_TETROMINO = [(0, 0), (0, 1), (0, 2), (1, 2)]
+
+# 自由多联骨牌与固定多联骨牌的个数（OEIS A000105、A001168）
+def test_enumeration_counts():
+    free = enumerate_free(6)
+    assert [len(free[size]) for size in range(1, 7)] == [1, 1, 2, 5, 12, 35]
+    fixed = [0] * 7
+    for shape in enumerate_fixed(6):
+        fixed[len(shape)] += 1
+    assert fixed[1:] == [1, 2, 6, 19, 63, 216]
+
+# 旋转、翻转、平移后规范形式不变
+def test_canonical_form_is_invariant():
+    form = canonical_form(L_TETROMINO)
+    for shape in orientations(L_TETROMINO):
+        assert canonical_form([(x + 7, y - 3) for x, y in shape]) == form
+    assert len(orientations(L_TETROMINO)) == 8
+    assert len(orientations([(0, 0), (1, 0), (0, 1), (1, 1)])) == 1
+
+# 第一次枚举后写入磁盘缓存，之后从缓存读取
+def test_disk_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    monkeypatch.setattr(polyomino, '_free_cache', {})
+    monkeypatch.setattr(polyomino, '_shape_ids', {})
+    shapes = polyomino.free_polyominoes(5)
+    assert os.path.exists(polyomino.cache_path())
+    
+    monkeypatch.setattr(polyomino, '_free_cache', {})
+    monkeypatch.setattr(polyomino, 'enumerate_free', None)  # 从缓存读取时不会再枚举
+    assert polyomino.free_polyominoes(5) == shapes
+
+def test_shape_id(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    rotated = [(y, -x) for x, y in L_TETROMINO]
+    assert shape_id(L_TETROMINO) == shape_id(rotated)
+    assert shape_id(L_TETROMINO)[0] == 4
+    assert shape_id([(0, 0), (2, 0)]) is None
@@ -0,0 +1,26 @@
+# -*- coding:utf-8 -*-
+
+"""
+结构搜索的剪枝不能丢掉结构
+"""
+
+import pytest
+
+from polylok.search import BoxSearch, SearchLimits, search_structures, structure_key
+
+def found_keys(limits):
+    return {structure_key(pieces_cells) for pieces_cells, score in search_structures(limits, jobs=1)}
+
+# 去掉对称剪枝后找到的结构（在8种对称变换下去重）必须与剪枝时相同
+@pytest.mark.parametrize('width, height', [(3, 4), (4, 3), (3, 5)])
+def test_mirror_pruning_keeps_every_structure(monkeypatch, width, height):
+    limits = SearchLimits(width, height, 8, max_pieces=3)
+    pruned = found_keys(limits)
+    monkeypatch.setattr(BoxSearch, '_mirror_ok', lambda self, index: True)
+    assert pruned == found_keys(limits)
+    assert pruned
+
+# 同一结构只报告一次
+def test_structures_are_reported_once():
+    found = [structure_key(pieces_cells) for pieces_cells, score in search_structures(SearchLimits(3, 5, 8, max_pieces=3), jobs=1)]
+    assert len(found) == len(set(found)) == 13
@@ -0,0 +1,87 @@
+# -*- coding:utf-8 -*-
+
+"""
+解答文件读取时的校验
+"""
+
+import random
+
+import pytest
+
+from polylok.board import Board, connected_components
+from polylok.judge import judge_file
+from polylok.solution import (SOLUTION_FORMAT, _group_count, solution_from_bytes, solution_from_dict, solution_to_bytes,
+                              solution_to_dict)
+
+CORNERS = [[0, 0], [2, 0], [0, 2], [2, 2]]  # 四个互不相连的角
+PLUS = [[1, 0], [0, 1], [1, 1], [2, 1], [1, 2]]
+
+def make_solution(pieces, version=1):
+    return {'format': SOLUTION_FORMAT, 'version': version, 'pieces': pieces, 'cells': []}
+
+# 不相连的"拼图块"在游戏中无法创建，JSON和二进制格式都要拒绝
+def test_disconnected_piece_is_rejected():
+    with pytest.raises(ValueError, match="not connected"):
+        solution_from_dict(make_solution([{'cells': CORNERS}, {'cells': [[x + 5, y] for x, y in PLUS]}]))
+    data = solution_to_bytes([{'cells': [tuple(pos) for pos in CORNERS], 'color': None}])
+    with pytest.raises(ValueError, match="not connected"):
+        solution_from_bytes(data)
+
+# 批量判定时不相连的拼图块报告为错误，不会得分
+def test_judge_reports_disconnected_piece(tmp_path):
+    path = tmp_path / "cheat.json"
+    data = solution_to_bytes([{'cells': [tuple(pos) for pos in CORNERS], 'color': None}])
+    path.write_bytes(data)
+    result = judge_file(str(path))
+    assert result['status'] == 'error'
+    assert result['score'] == ''
+
+@pytest.mark.parametrize('color', [[300, 0, 0], [0, 'x', 0, 255], [0, 0, None], [True, 0, 0], [0, 0], [-1, 0, 0]])
+def test_invalid_color_is_rejected(color):
+    with pytest.raises(ValueError, match="invalid color"):
+        solution_from_dict(make_solution([{'cells': PLUS, 'color': color}]))
+
+def test_valid_color_gets_alpha():
+    solution = solution_from_dict(make_solution([{'cells': PLUS, 'color': [0, 128, 255]}]))
+    assert solution['pieces'][0]['color'] == (0, 128, 255, 255)
+
+@pytest.mark.parametrize('version', [0, -1, 2, True, '1', 1.0, None])
+def test_invalid_version_is_rejected(version):
+    with pytest.raises(ValueError, match="Unsupported solution version"):
+        solution_from_dict(make_solution([{'cells': PLUS}], version=version))
+
+def test_binary_version_zero_is_rejected():
+    data = bytearray(solution_to_bytes([{'cells': [tuple(pos) for pos in PLUS], 'color': None}]))
+    data[4] = 0  # 文件头之后的版本号
+    with pytest.raises(ValueError, match="Unsupported solution version"):
+        solution_from_bytes(bytes(data))
+
+# 重叠或重复列出的格子在两种格式中都被拒绝
+def test_overlapping_cells_are_rejected():
+    with pytest.raises(ValueError, match="more than one piece"):
+        solution_from_dict(make_solution([{'cells': PLUS}, {'cells': [[1, 1], [1, 3]]}]))
+    with pytest.raises(ValueError, match="more than once"):
+        solution_from_dict(make_solution([{'cells': PLUS + [[0, 1]]}]))
+    data = solution_to_bytes([{'cells': [(0, 0), (1, 0)], 'color': None}, {'cells': [(1, 0), (2, 0)], 'color': None}])
+    with pytest.raises(ValueError, match="more than one piece"):
+        solution_from_bytes(data)
+
+# 读取时建立的占用索引与盘面自己建立的相同，可以直接交给Board.load
+def test_loaded_cell_owner_matches_board():
+    pieces = [{'cells': [tuple(pos) for pos in PLUS], 'color': None},
+              {'cells': [(3, 0), (3, 1), (4, 1)], 'color': (1, 2, 3, 255)}]
+    for solution in (solution_from_dict(solution_to_dict(pieces, [(9, 9)])),
+                     solution_from_bytes(solution_to_bytes(pieces, [(9, 9)]))):
+        board = Board()
+        board.load(solution['pieces'], solution['cells'], solution['cell_owner'])
+        expected = Board()
+        expected.load(solution['pieces'], solution['cells'])
+        assert board.cell_owner == expected.cell_owner
+        assert sorted(board.cells) == [(9, 9)]
+
+# 拼图块的连通部分数（按列分段合并）与逐格泛洪的结果相同
+def test_group_count_matches_connected_components():
+    rng = random.Random(0)
+    for _ in range(500):
+        cells = list({(rng.randint(-3, 5), rng.randint(-3, 5)) for _ in range(rng.randint(1, 30))})
+        assert _group_count(cells) == len(connected_components(cells))